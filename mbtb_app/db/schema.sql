@@ -21,6 +21,7 @@ CREATE TABLE users(
     suspend enum('Y',"N") DEFAULT 'N',
     suspend_reason text DEFAULT NULL,
     revert_reason text DEFAULT NULL,
+    token_version int unsigned NOT NULL DEFAULT 0,
     PRIMARY KEY (id),
     UNIQUE KEY email (email)
 ) ENGINE=InnoDB DEFAULT CHARSET=UTF8MB4;
@@ -32,6 +33,7 @@ CREATE TABLE admins(
     password_hash varchar(255) DEFAULT NULL,
     first_name varchar(255) DEFAULT NULL,
     last_name varchar(255) DEFAULT NULL,
+    token_version int unsigned NOT NULL DEFAULT 0,
     PRIMARY KEY (id),
     UNIQUE KEY email (email)
 ) ENGINE=InnoDB DEFAULT CHARSET=UTF8MB4;
@@ -41,6 +43,19 @@ INSERT INTO admins(email, password_hash, first_name) VALUE
     ('admin@mbtb.ca', 'asdfghjkl123', 'admin')
 
 
+-- Append-only feed of suspension/approval changes written by users api, polled by data api workers via change_id
+CREATE TABLE auth_revocations(
+    change_id bigint unsigned NOT NULL AUTO_INCREMENT,
+    principal_id int unsigned NOT NULL,
+    role enum('User', 'Admin') NOT NULL DEFAULT 'User',
+    suspend enum('Y', 'N') NOT NULL DEFAULT 'N',
+    pending_approval enum('Y', 'N') NOT NULL DEFAULT 'Y',
+    token_version int unsigned NOT NULL DEFAULT 0,
+    created_at timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (change_id)
+) ENGINE=InnoDB DEFAULT CHARSET=UTF8MB4;
+
+
 CREATE TABLE neuropathological_diagnosis(
     neuro_diagnosis_id int unsigned NOT NULL AUTO_INCREMENT,
     neuro_diagnosis_name varchar(255) NOT NULL,
@@ -102,6 +117,13 @@ CREATE TABLE prime_details(
     storage_year datetime NOT NULL,
     archive enum('Yes', 'No') DEFAULT 'No',
     PRIMARY KEY (prime_details_id),
+    -- brain_dataset filters: equality column first, prime_details_id last for keyset ordered pages
+    INDEX idx_prime_details_clinical_diagnosis (clinical_diagnosis, prime_details_id),
+    INDEX idx_prime_details_neuro_diagnosis (neuro_diagnosis_id, tissue_type_id, prime_details_id),
+    INDEX idx_prime_details_tissue_type (tissue_type_id, preservation_method, prime_details_id),
+    INDEX idx_prime_details_preservation_method (preservation_method, prime_details_id),
+    INDEX idx_prime_details_sex (sex, prime_details_id),
+    INDEX idx_prime_details_storage_year (storage_year, prime_details_id),
     FOREIGN KEY (neuro_diagnosis_id)
         REFERENCES neuropathological_diagnosis(neuro_diagnosis_id)
         ON DELETE no action,
@@ -165,6 +187,86 @@ CREATE TABLE other_details(
         ON DELETE no action
 ) ENGINE=InnoDB DEFAULT CHARSET=UTF8MB4;
 
+-- Denormalized copy of prime_details + other_details + lookups in the flat shape returned by other_details api
+-- Rows are written in the same transaction as the source tables, reads of cases need no joins
+CREATE TABLE catalog(
+    prime_details_id int unsigned NOT NULL,
+    other_details_id int unsigned NOT NULL UNIQUE,
+    mbtb_code varchar(255) NOT NULL UNIQUE,
+    sex enum('Male', 'Female') DEFAULT NULL,
+    age varchar(50) DEFAULT NULL,
+    postmortem_interval varchar(255) DEFAULT NULL,
+    time_in_fix varchar(255) DEFAULT NULL,
+    neuropathology_diagnosis varchar(255) DEFAULT NULL,
+    tissue_type varchar(255) DEFAULT NULL,
+    preservation_method enum('Formalin-Fixed', 'Fresh Frozen', 'Both') DEFAULT NULL,
+    storage_year datetime DEFAULT NULL,
+    autopsy_type varchar(255) DEFAULT NULL,
+    clinical_diagnosis varchar(255) DEFAULT NULL,
+    race varchar(255) DEFAULT NULL,
+    duration int(3) DEFAULT NULL,
+    clinical_details text DEFAULT NULL,
+    cause_of_death varchar(255) DEFAULT NULL,
+    brain_weight int(5) DEFAULT NULL,
+    neuropathology_summary text DEFAULT NULL,
+    neuropathology_gross text DEFAULT NULL,
+    neuropathology_microscopic text DEFAULT NULL,
+    neouropathology_criteria varchar(255) DEFAULT NULL,
+    cerad varchar(255) DEFAULT NULL,
+    braak_stage varchar(255) DEFAULT NULL,
+    khachaturian varchar(255) DEFAULT NULL,
+    abc varchar(255) DEFAULT NULL,
+    formalin_fixed enum('True', 'False') DEFAULT NULL,
+    fresh_frozen enum('True', 'False') DEFAULT NULL,
+    version bigint unsigned NOT NULL DEFAULT 1, -- incremented on every write of the case, used for ETag
+    updated_at datetime NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (prime_details_id),
+    INDEX idx_catalog_clinical_diagnosis (clinical_diagnosis, prime_details_id),
+    INDEX idx_catalog_neuropathology_diagnosis (neuropathology_diagnosis, tissue_type, prime_details_id),
+    INDEX idx_catalog_tissue_type (tissue_type, preservation_method, prime_details_id),
+    INDEX idx_catalog_preservation_method (preservation_method, prime_details_id),
+    INDEX idx_catalog_sex (sex, prime_details_id),
+    INDEX idx_catalog_braak_stage (braak_stage, cerad, prime_details_id),
+    INDEX idx_catalog_cerad (cerad, prime_details_id),
+    INDEX idx_catalog_storage_year (storage_year, prime_details_id),
+    FOREIGN KEY (prime_details_id)
+        REFERENCES prime_details(prime_details_id)
+        ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=UTF8MB4;
+
+-- Version of mbtb data, incremented by every write of data api; read caches are keyed on it
+CREATE TABLE data_versions(
+    name varchar(50) NOT NULL,
+    version bigint unsigned NOT NULL DEFAULT 0,
+    updated_at datetime NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (name)
+) ENGINE=InnoDB DEFAULT CHARSET=UTF8MB4;
+
+INSERT INTO data_versions(name, version) VALUES
+    ('dataset', 0);
+
+-- Queued download_data exports, claimed and run by `run_export_worker` management command
+CREATE TABLE export_jobs(
+    job_id char(32) NOT NULL,
+    request_key char(64) NOT NULL,
+    data_version bigint unsigned NOT NULL DEFAULT 0,
+    download_mode varchar(20) NOT NULL,
+    download_format varchar(10) NOT NULL,
+    parameters text DEFAULT NULL,
+    status varchar(10) NOT NULL DEFAULT 'queued',
+    rows_total int unsigned NOT NULL DEFAULT 0,
+    rows_done int unsigned NOT NULL DEFAULT 0,
+    file_path varchar(255) DEFAULT NULL,
+    error text DEFAULT NULL,
+    requested_by varchar(255) DEFAULT NULL,
+    created_at datetime NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    started_at datetime DEFAULT NULL,
+    finished_at datetime DEFAULT NULL,
+    PRIMARY KEY (job_id),
+    KEY export_jobs_request_key (request_key),
+    KEY export_jobs_status_created_at (status, created_at)
+) ENGINE=InnoDB DEFAULT CHARSET=UTF8MB4;
+
 CREATE TABLE tissue_requests(
     tissue_requests_id int unsigned NOT NULL AUTO_INCREMENT,
     title varchar(10) DEFAULT NULL,
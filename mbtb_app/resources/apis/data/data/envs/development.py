@@ -23,6 +23,14 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 with open('resources/config/development/secret_key.cnf') as sk:
     SECRET_KEY = sk.read().strip()
 
+# Key of auth tokens, signed by users api and verified by data api, so both apis must use the same value.
+# It is not SECRET_KEY: MBTB_JWT_SECRET if set, else jwt_secret.cnf, a file with the same content in both apis
+if os.environ.get('MBTB_JWT_SECRET', None):
+    JWT_SECRET = os.environ['MBTB_JWT_SECRET']
+else:
+    with open('resources/config/development/jwt_secret.cnf') as jwt_sk:
+        JWT_SECRET = jwt_sk.read().strip()
+
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
 
@@ -38,6 +46,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'rest_framework',
+    'django_filters',
     'mbtb',
     'tissue_requests'
 ]
@@ -102,13 +111,131 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Per worker cache for computed read results, e.g. facets; keys include data version so writes invalidate them
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'mbtb-data',
+    }
+}
+
+# Full-dataset responses rendered once per data version: download_data `all` in json
+# BACKGROUND_REBUILD rebuilds held snapshots in a thread after a write, otherwise on next request
+SNAPSHOT_CACHE = {
+    'GZIP_LEVEL': 6,
+    'BROTLI_QUALITY': 5,
+    'BACKGROUND_REBUILD': True,
+}
+
+# Rows read per query when download_data streams its response, codes per `IN (...)` of filtered download
+DOWNLOAD_STREAM = {
+    'CHUNK_SIZE': 2000,
+    'CODES_PER_QUERY': 1000,
+}
+
+# csv upload (file_upload POST, PATCH): rows are validated first, then written with bulk_create or bulk_update
+# BATCH_SIZE rows at a time
+FILE_UPLOAD = {
+    'BATCH_SIZE': 500,
+}
+
+# Rendered download_data exports kept on disk, least recently used files are removed above MAX_BYTES
+EXPORT_CACHE = {
+    'DIRECTORY': os.path.join(BASE_DIR, 'exports'),
+    'MAX_BYTES': 2 * 1024 ** 3,
+    'ENABLED': True,
+}
+
+# Export files of signed urls (download_data `link`, export job `download_url`), valid for URL_MAX_AGE seconds.
+# SERVE 'django' reads files in a worker, 'x-accel-redirect' hands them to nginx, e.g.
+# `location /protected_exports/ { internal; alias <EXPORT_CACHE DIRECTORY>/; }`, 'x-sendfile' to apache or lighttpd
+EXPORT_FILES = {
+    'URL_MAX_AGE': 900,
+    'SERVE': 'django',
+    'ACCEL_REDIRECT_PREFIX': '/protected_exports/',
+    'BLOCK_SIZE': 64 * 1024,
+}
+
+# Export jobs of download_data (`"async": true`), run by `run_export_worker` and written to export cache
+EXPORT_JOBS = {
+    'POLL_INTERVAL': 2,
+}
+
+# HDF5 download_format: rows per HDF5 chunk and compression of each column dataset
+HDF5_EXPORT = {
+    'CHUNK_ROWS': 4096,
+    'COMPRESSION': 'gzip',
+    'COMPRESSION_LEVEL': 4,
+}
+
+# Role required per (url name, http method), looked up by permission classes via `request.resolver_match`
+# Admin: IsAdmin, Authenticated: IsAuthenticated (user or admin), Public: IsPostAllowed. Unlisted requests are denied.
+PERMISSION_REGISTRY = {
+    'brain_dataset-list': {'GET': 'Authenticated'},
+    'brain_dataset-detail': {'GET': 'Authenticated'},
+    'brain_dataset-facets': {'GET': 'Authenticated'},
+    'other_details-list': {'GET': 'Authenticated'},
+    'other_details-detail': {'GET': 'Authenticated'},
+    'get_select_options': {'GET': 'Authenticated'},
+    'download_data': {'POST': 'Authenticated'},
+    'export_job': {'GET': 'Authenticated'},
+    'export_job_result': {'GET': 'Authenticated'},
+    'export_cache': {'GET': 'Admin'},
+    'add_new_data': {'POST': 'Admin'},
+    'file_upload': {'POST': 'Admin', 'PATCH': 'Admin'},
+    'edit_data': {'PATCH': 'Admin'},
+    'delete_data': {'DELETE': 'Admin'},
+    'add_new_tissue_requests-list': {'POST': 'Authenticated'},
+    'add_new_tissue_requests-detail': {'POST': 'Authenticated'},
+    'get_new_tissue_requests-list': {'GET': 'Admin', 'PATCH': 'Admin', 'DELETE': 'Admin'},
+    'get_new_tissue_requests-detail': {'GET': 'Admin', 'PATCH': 'Admin', 'DELETE': 'Admin'},
+    'get_archive_tissue_requests-list': {'GET': 'Admin', 'PATCH': 'Admin', 'DELETE': 'Admin'},
+    'get_archive_tissue_requests-detail': {'GET': 'Admin', 'PATCH': 'Admin', 'DELETE': 'Admin'}
+}
+
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'resources.permissions.is_admin.IsAdmin',
         'resources.permissions.is_authenticated.IsAuthenticated',
+    ),
+    # orjson backed JSON, stdlib json is used when orjson is not installed
+    'DEFAULT_RENDERER_CLASSES': (
+        'resources.renderers.fast_json.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'resources.renderers.fast_json.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     )
 }
 
+# In-process cache of authenticated principals used by the permission classes
+# MAX_SIZE: number of (id, email, role) entries kept per worker, TTL: seconds before an entry is re-checked
+# Suspensions and approvals evict entries through REVOCATION_FEED, so TTL can stay long
+PRINCIPAL_CACHE = {
+    'MAX_SIZE': 1024,
+    'TTL': 3600
+}
+
+# Revocation set for role-bearing tokens: suspended users and bumped token versions
+# ENABLED: check claims against the set, REFRESH: seconds between full reloads from the database
+# TOKEN_TTL: lifetime of tokens issued by users api (AUTH_TOKEN TTL), feed changes this recent are reloaded too
+REVOCATION_SET = {
+    'ENABLED': True,
+    'REFRESH': 600,
+    'TOKEN_TTL': 24 * 60 * 60
+}
+
+# Feed of suspension/approval changes written by users api to `auth_revocations`
+# POLL_INTERVAL: seconds between polls per worker, BATCH_SIZE: changes read per query
+# LOOKBACK: change ids before the cursor read again, for changes committed after a higher id
+REVOCATION_FEED = {
+    'POLL_INTERVAL': 5,
+    'BATCH_SIZE': 500,
+    'LOOKBACK': 100
+}
+
 # Internationalization
 # https://docs.djangoproject.com/en/2.2/topics/i18n/
 
@@ -0,0 +1,80 @@
+import django_filters
+from django.db.models import IntegerField
+from django.db.models.functions import Cast
+from .models import PrimeDetails, Catalog
+
+
+# FilterSet for brain_dataset query parameters, e.g. /brain_dataset/?tissue_type=Brain&age_min=60&ordering=-age
+# Equality filters are served by composite indexes on prime_details, see db/schema.sql
+class PrimeDetailsFilter(django_filters.FilterSet):
+    clinical_diagnosis = django_filters.CharFilter(field_name='clinical_diagnosis')
+    neuropathology_diagnosis = django_filters.CharFilter(field_name='neuro_diagnosis_id__neuro_diagnosis_name')
+    tissue_type = django_filters.CharFilter(field_name='tissue_type__tissue_type')
+    preservation_method = django_filters.CharFilter(field_name='preservation_method')
+    sex = django_filters.CharFilter(field_name='sex')
+
+    # age is stored as text, compared as number
+    age_min = django_filters.NumberFilter(method='filter_age', label='Age greater than or equal to')
+    age_max = django_filters.NumberFilter(method='filter_age', label='Age less than or equal to')
+
+    # year lookups are translated to a datetime range on storage_year
+    storage_year_min = django_filters.NumberFilter(field_name='storage_year', lookup_expr='year__gte')
+    storage_year_max = django_filters.NumberFilter(field_name='storage_year', lookup_expr='year__lte')
+
+    ordering = django_filters.OrderingFilter(
+        fields=(
+            ('prime_details_id', 'prime_details_id'),
+            ('mbtb_code', 'mbtb_code'),
+            ('clinical_diagnosis', 'clinical_diagnosis'),
+            ('neuro_diagnosis_id__neuro_diagnosis_name', 'neuropathology_diagnosis'),
+            ('tissue_type__tissue_type', 'tissue_type'),
+            ('preservation_method', 'preservation_method'),
+            ('sex', 'sex'),
+            ('age_value', 'age'),
+            ('storage_year', 'storage_year'),
+        )
+    )
+
+    class Meta:
+        model = PrimeDetails
+        fields = []
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # numeric age is needed by age filters and ordering
+        self.queryset = self.queryset.annotate(age_value=Cast('age', IntegerField()))
+
+    def filter_age(self, queryset, name, value):
+        lookup = 'age_value__gte' if name == 'age_min' else 'age_value__lte'
+        return queryset.filter(**{lookup: value})
+
+
+# FilterSet over denormalized `catalog`, same names as PrimeDetailsFilter plus other_details stages
+# Used by other_details list and by download_data `query` mode, every filter is a column of the one table
+class CatalogFilter(django_filters.FilterSet):
+    clinical_diagnosis = django_filters.CharFilter(field_name='clinical_diagnosis')
+    neuropathology_diagnosis = django_filters.CharFilter(field_name='neuropathology_diagnosis')
+    tissue_type = django_filters.CharFilter(field_name='tissue_type')
+    preservation_method = django_filters.CharFilter(field_name='preservation_method')
+    sex = django_filters.CharFilter(field_name='sex')
+    braak_stage = django_filters.CharFilter(field_name='braak_stage')
+    cerad = django_filters.CharFilter(field_name='cerad')
+
+    # age is stored as text, compared as number
+    age_min = django_filters.NumberFilter(method='filter_age', label='Age greater than or equal to')
+    age_max = django_filters.NumberFilter(method='filter_age', label='Age less than or equal to')
+
+    storage_year_min = django_filters.NumberFilter(field_name='storage_year', lookup_expr='year__gte')
+    storage_year_max = django_filters.NumberFilter(field_name='storage_year', lookup_expr='year__lte')
+
+    class Meta:
+        model = Catalog
+        fields = []
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.queryset = self.queryset.annotate(age_value=Cast('age', IntegerField()))
+
+    def filter_age(self, queryset, name, value):
+        lookup = 'age_value__gte' if name == 'age_min' else 'age_value__lte'
+        return queryset.filter(**{lookup: value})
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from resources.db_operations.catalog_sync import CatalogSync
+
+
+# Rebuild `catalog` table from prime_details, other_details and lookups, e.g. after loading data with sql
+class Command(BaseCommand):
+    help = 'Rebuild denormalized catalog table from prime_details and other_details'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            _response = CatalogSync().rebuild()
+
+        self.stdout.write('Catalog rebuilt with {} rows'.format(_response['synced']))
@@ -0,0 +1,41 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from resources.db_operations.export_jobs import ExportJobs
+
+
+# Run queued download_data export jobs, one at a time, e.g. `python manage.py run_export_worker`
+class Command(BaseCommand):
+    help = 'Run queued export jobs of download_data and write their result files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit when the queue is empty')
+        parser.add_argument(
+            '--requeue-running', action='store_true', help='Queue again jobs left running by a stopped worker'
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=getattr(settings, 'EXPORT_JOBS', {}).get('POLL_INTERVAL', 2),
+            help='Seconds to wait before checking an empty queue again'
+        )
+
+    def handle(self, *args, **options):
+        export_jobs = ExportJobs()
+        if options['requeue_running']:
+            self.stdout.write('Queued again {} running jobs'.format(export_jobs.requeue_running()))
+
+        while True:
+            _job = export_jobs.claim()
+            if _job is None:
+                if options['once']:
+                    return
+                time.sleep(options['poll_interval'])
+                continue
+
+            # a failing job is marked failed, otherwise it stays running and identical requests wait for it
+            try:
+                _status = export_jobs.run(_job)['data'].status
+            except Exception as error:
+                _status = export_jobs.finish(_job, status='failed', error=str(error))['data'].status
+                self.stderr.write('Export job {} {}: {!r}'.format(_job.job_id, _status, error))
+                continue
+            self.stdout.write('Export job {} {}'.format(_job.job_id, _status))
@@ -106,6 +106,7 @@ class TissueTypes(models.Model):
 class AdminAccount(models.Model):
     email = models.CharField(max_length=50)
     password_hash = models.CharField(max_length=50)
+    token_version = models.IntegerField(default=0)
 
     class Meta:
         managed = False
@@ -115,7 +116,96 @@ class AdminAccount(models.Model):
 class UserAccount(models.Model):
     email = models.CharField(max_length=50)
     password_hash = models.CharField(max_length=50)
+    pending_approval = models.CharField(max_length=1, default='Y')
+    suspend = models.CharField(max_length=1, default='N')
+    token_version = models.IntegerField(default=0)
 
     class Meta:
         managed = False
         db_table = 'users'
+
+
+class AuthRevocation(models.Model):
+    change_id = models.BigAutoField(primary_key=True)
+    principal_id = models.IntegerField()
+    role = models.CharField(max_length=5, default='User')
+    suspend = models.CharField(max_length=1, default='N')
+    pending_approval = models.CharField(max_length=1, default='Y')
+    token_version = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        managed = False
+        db_table = 'auth_revocations'
+
+
+class DataVersion(models.Model):
+    name = models.CharField(max_length=50, primary_key=True)
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=datetime.now)
+
+    class Meta:
+        managed = False
+        db_table = 'data_versions'
+
+
+# Queued download_data exports, run by `run_export_worker` management command and written to EXPORT_JOBS directory
+# `request_key` identifies data version, mode, format, codes and fields, so identical requests reuse the result file
+class ExportJob(models.Model):
+    job_id = models.CharField(max_length=32, primary_key=True)
+    request_key = models.CharField(max_length=64, db_index=True)
+    data_version = models.BigIntegerField(default=0)
+    download_mode = models.CharField(max_length=20)
+    download_format = models.CharField(max_length=10)
+    parameters = models.TextField(blank=True, null=True)
+    status = models.CharField(max_length=10, default='queued')
+    rows_total = models.IntegerField(default=0)
+    rows_done = models.IntegerField(default=0)
+    file_path = models.CharField(max_length=255, blank=True, null=True)
+    error = models.TextField(blank=True, null=True)
+    requested_by = models.CharField(max_length=255, blank=True, null=True)
+    created_at = models.DateTimeField(default=datetime.now)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        managed = False
+        db_table = 'export_jobs'
+
+
+# Denormalized read model: one row per case in the flat shape of OtherDetailsSerializer, kept in sync by write views
+class Catalog(models.Model):
+    prime_details_id = models.IntegerField(primary_key=True)
+    other_details_id = models.IntegerField(unique=True)
+    mbtb_code = models.CharField(max_length=255, unique=True)
+    sex = models.CharField(max_length=6, blank=True, null=True)
+    age = models.CharField(max_length=50, blank=True, null=True)
+    postmortem_interval = models.CharField(max_length=255, blank=True, null=True)
+    time_in_fix = models.CharField(max_length=255, blank=True, null=True)
+    neuropathology_diagnosis = models.CharField(max_length=255, blank=True, null=True)
+    tissue_type = models.CharField(max_length=255, blank=True, null=True)
+    preservation_method = models.CharField(max_length=20, blank=True, null=True)
+    storage_year = models.DateTimeField(blank=True, null=True)
+    autopsy_type = models.CharField(max_length=255, blank=True, null=True)
+    clinical_diagnosis = models.CharField(max_length=255, blank=True, null=True)
+    race = models.CharField(max_length=255, blank=True, null=True)
+    duration = models.IntegerField(blank=True, null=True)
+    clinical_details = models.TextField(blank=True, null=True)
+    cause_of_death = models.CharField(max_length=255, blank=True, null=True)
+    brain_weight = models.IntegerField(blank=True, null=True)
+    neuropathology_summary = models.TextField(blank=True, null=True)
+    neuropathology_gross = models.TextField(blank=True, null=True)
+    neuropathology_microscopic = models.TextField(blank=True, null=True)
+    neouropathology_criteria = models.CharField(max_length=255, blank=True, null=True)
+    cerad = models.CharField(max_length=255, blank=True, null=True)
+    braak_stage = models.CharField(max_length=255, blank=True, null=True)
+    khachaturian = models.CharField(max_length=255, blank=True, null=True)
+    abc = models.CharField(max_length=255, blank=True, null=True)
+    formalin_fixed = models.CharField(max_length=5, blank=True, null=True)
+    fresh_frozen = models.CharField(max_length=5, blank=True, null=True)
+    version = models.BigIntegerField(default=1)
+    updated_at = models.DateTimeField(default=datetime.now)
+
+    class Meta:
+        managed = False
+        db_table = 'catalog'
@@ -0,0 +1,34 @@
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+# This class pages list responses on prime_details_id with an opaque cursor (keyset pagination)
+# Every page is `WHERE prime_details_id > <cursor> ORDER BY prime_details_id LIMIT n`, no OFFSET scan on deep pages
+# Lists are always paged: a request without `cursor` gets the first `page_size` rows (default 100, at most 1000)
+# and `next` url of the following page, clients read the whole list by following `next` until it is null
+# A list with `ordering` (e.g. -age) can't be a keyset on prime_details_id, it is paged by page number instead
+class PrimeDetailsCursorPagination(CursorPagination):
+    ordering = 'prime_details_id'
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.ordered_pagination = None
+        if request.query_params.get('ordering', None):
+            self.ordered_pagination = OrderedPagination()
+            return self.ordered_pagination.paginate_queryset(queryset, request, view)
+
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.ordered_pagination is not None:
+            return self.ordered_pagination.get_paginated_response(data)
+
+        return super().get_paginated_response(data)
+
+
+# This class pages lists ordered by a filterset `ordering`, with the same page sizes as the cursor pagination
+class OrderedPagination(PageNumberPagination):
+    page_size = PrimeDetailsCursorPagination.page_size
+    page_size_query_param = PrimeDetailsCursorPagination.page_size_query_param
+    max_page_size = PrimeDetailsCursorPagination.max_page_size
@@ -1,10 +1,25 @@
+from django.urls import reverse
 from rest_framework import serializers
+from resources.cache.export_cache import export_cache
+from resources.permissions.signed_url import signed_url
 from .models import AutopsyTypes, PrimeDetails, OtherDetails, NeuropathologicalDiagnosis, \
-    TissueTypes
+    TissueTypes, Catalog, ExportJob
+
+
+# Mixin to serialize only given `fields`, see resources/db_operations/sparse_fields.py
+class SparseFieldsMixin(object):
+
+    def __init__(self, *args, **kwargs):
+        _fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+
+        if _fields is not None:
+            for name in set(self.fields) - set(_fields):
+                self.fields.pop(name)
 
 
 # Serializer to have all mbtb_data from `PrimeDetails` model
-class PrimeDetailsSerializer(serializers.ModelSerializer):
+class PrimeDetailsSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     neuro_diagnosis_id = serializers.CharField(source='neuro_diagnosis_id.neuro_diagnosis_name', read_only=True)
     tissue_type = serializers.CharField(source='tissue_type.tissue_type', read_only=True)
 
@@ -32,6 +47,53 @@ class OtherDetailsSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
+# Serializer to read `Catalog` rows, same fields and order as `OtherDetailsSerializer`
+class CatalogSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    storage_year = serializers.CharField(read_only=True)
+
+    class Meta:
+        model = Catalog
+        fields = [
+            'other_details_id', 'mbtb_code', 'sex', 'age', 'postmortem_interval', 'time_in_fix',
+            'neuropathology_diagnosis', 'tissue_type', 'preservation_method', 'storage_year', 'autopsy_type',
+            'clinical_diagnosis', 'race', 'duration', 'clinical_details', 'cause_of_death', 'brain_weight',
+            'neuropathology_summary', 'neuropathology_gross', 'neuropathology_microscopic', 'neouropathology_criteria',
+            'cerad', 'braak_stage', 'khachaturian', 'abc', 'formalin_fixed', 'fresh_frozen', 'prime_details_id'
+        ]
+
+
+# Serializer for status of `ExportJob`: progress in percent and result url once the file is written
+class ExportJobSerializer(serializers.ModelSerializer):
+    progress = serializers.SerializerMethodField()
+    result_url = serializers.SerializerMethodField()
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ExportJob
+        fields = [
+            'job_id', 'status', 'download_mode', 'download_format', 'data_version', 'rows_total', 'rows_done',
+            'progress', 'result_url', 'download_url', 'error', 'created_at', 'started_at', 'finished_at'
+        ]
+
+    def get_progress(self, obj):
+        if obj.status == 'done':
+            return 100
+        if not obj.rows_total:
+            return 0
+        return min(int(obj.rows_done * 100 / obj.rows_total), 99)
+
+    def get_result_url(self, obj):
+        if obj.status != 'done':
+            return None
+        return reverse('export_job_result', kwargs={'job_id': obj.job_id})
+
+    # Signed url of result file, downloaded without authentication until it expires
+    def get_download_url(self, obj):
+        if obj.status != 'done' or not obj.file_path:
+            return None
+        return signed_url.sign(export_cache.name(obj.file_path))['url']
+
+
 # Serializer for uploading data to `PrimeDetails` model
 class FileUploadPrimeDetailsSerializer(serializers.ModelSerializer):
 
@@ -48,6 +110,26 @@ class FileUploadOtherDetailsSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
+# Serializers to validate rows of a csv upload without a query per row, see resources/db_operations/bulk_ingest.py
+# Lookup ids are resolved once per file, mbtb_code is checked against whole file, prime_details_id is set on insert
+class BulkPrimeDetailsSerializer(serializers.ModelSerializer):
+    mbtb_code = serializers.CharField(max_length=50)
+    tissue_type = serializers.IntegerField(source='tissue_type_id')
+    neuro_diagnosis_id = serializers.IntegerField(source='neuro_diagnosis_id_id')
+
+    class Meta:
+        model = PrimeDetails
+        fields = "__all__"
+
+
+class BulkOtherDetailsSerializer(serializers.ModelSerializer):
+    autopsy_type = serializers.IntegerField(source='autopsy_type_id')
+
+    class Meta:
+        model = OtherDetails
+        exclude = ['prime_details_id']
+
+
 # Serializer for inserting single row in `PrimeDetails` model
 # TODO: Switch to FileUploadPrimeDetailsSerializer if storage_year is added
 class InsertRowPrimeDetailsSerializer(serializers.ModelSerializer):
@@ -1,12 +1,53 @@
 from rest_framework import status
 from rest_framework.test import APITestCase, force_authenticate, APIClient
-from .models import PrimeDetails, NeuropathologicalDiagnosis, TissueTypes, AutopsyTypes, OtherDetails, AdminAccount
+from .models import PrimeDetails, NeuropathologicalDiagnosis, TissueTypes, AutopsyTypes, OtherDetails, AdminAccount, \
+    UserAccount, AuthRevocation, Catalog, ExportJob
+from .pagination import PrimeDetailsCursorPagination
 from .serializers import PrimeDetailsSerializer, OtherDetailsSerializer, FileUploadPrimeDetailsSerializer, \
-    FileUploadOtherDetailsSerializer, InsertRowPrimeDetailsSerializer
+    FileUploadOtherDetailsSerializer, InsertRowPrimeDetailsSerializer, CatalogSerializer
 from resources.tests.common_tests import CommonTests
+from resources.tests.query_budget import QueryBudget
+from resources.cache.principal_cache import PrincipalCache, principal_cache
+from resources.cache.revocation_feed import revocation_feed
+from resources.cache.revocation_set import revocation_set
+from resources.cache.data_version import dataset_version
+from resources.cache.snapshot_cache import snapshot_cache
+from resources.cache.export_cache import ExportCache, export_cache
+from resources.permissions.signed_url import SignedUrl, signed_url
+from resources.renderers.file_transfer import FileTransfer, file_transfer
+from django.core.cache import cache
+from resources.db_operations.catalog_sync import CatalogSync
+from resources.db_operations.export_jobs import ExportJobs
+from resources.db_operations.projection import catalog_projection, prime_details_projection
+from resources.db_operations.user_or_admin import UserOrAdmin
+from resources.permissions.registry import PermissionRegistry, permission_registry
+from resources.validations.validate_data import ValidateData
+from resources.renderers.hdf5_export import HDF5Export, h5py, numpy
+from resources.renderers.fast_json import FastJSONRenderer, FastJSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.exceptions import ParseError
+from collections import OrderedDict
+from datetime import datetime, date, timedelta
+from decimal import Decimal
+import uuid
+from django.test import RequestFactory
+from django.urls import resolve
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.test import override_settings
+from unittest import skipUnless
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.conf import settings
 import jwt
 import csv
+import gzip
+import json
 import os
+import shutil
+import tempfile
+import time
+from io import StringIO, BytesIO
 
 
 # This class is to set up test data
@@ -29,6 +70,7 @@ class SetUpTestData(APITestCase):
             cerad='', abc='', khachaturian='', braak_stage='test',
             formalin_fixed=True, fresh_frozen=True,
         )
+        CatalogSync().run(prime_details_ids=[cls.prime_details_1.pk])
         cls.test_data = {
             'mbtb_code': 'BB99-102', 'sex': 'Male', 'age': '70', 'postmortem_interval': '12',
             'time_in_fix': 'Not known', 'tissue_type': 'Brain', 'preservation_method': 'Fresh Frozen',
@@ -49,8 +91,23 @@ class SetUpTestData(APITestCase):
             'id': admin.id,
             'email': admin.email,
         }
-        cls.token = jwt.encode(payload, "SECRET_KEY", algorithm='HS256')  # generating jwt token
+        cls.token = jwt.encode(payload, settings.JWT_SECRET, algorithm='HS256')  # generating jwt token
         cls.client = APIClient(enforce_csrf_checks=True)  # enforcing csrf checks
+        snapshot_cache.background = False  # rebuild snapshots in request thread, within test transaction
+        cls.export_directory = tempfile.mkdtemp()
+        export_cache.directory = cls.export_directory
+        export_cache.enabled = False  # read downloads from database, enabled in ExportCacheTest
+
+    # Add prime_details and other_details records until there are `size` records in total
+    def add_records(self, size):
+        for i in range(PrimeDetails.objects.count(), size):
+            prime_details = PrimeDetails.objects.create(
+                neuro_diagnosis_id=self.neuro_diagnosis_1, tissue_type=self.tissue_type_1, mbtb_code='BB00-' + str(i),
+                sex='Male', age='70', preservation_method='Fresh Frozen', archive='No'
+            )
+            OtherDetails.objects.create(prime_details_id=prime_details, autopsy_type=self.autopsy_type_1)
+            CatalogSync().run(prime_details_ids=[prime_details.pk])
+        dataset_version.bump()
 
     # Create CSV file once filename and data is provided
     def dict_to_csv_file(self, filename, data):
@@ -61,6 +118,10 @@ class SetUpTestData(APITestCase):
 
     @classmethod
     def tearDownClass(cls):
+        snapshot_cache.clear()
+        cache.clear()
+        shutil.rmtree(cls.export_directory)
+        Catalog.objects.all().delete()
         OtherDetails.objects.all().delete()
         PrimeDetails.objects.filter().delete()
         TissueTypes.objects.filter().delete()
@@ -84,7 +145,7 @@ class PrimeDetailsViewTest(SetUpTestData):
         response = self.client.get('/brain_dataset/')
         model_response = PrimeDetails.objects.all()
         serializer_response = PrimeDetailsSerializer(model_response, many=True)
-        self.assertEqual(response.data, serializer_response.data)
+        self.assertEqual(json.loads(response.content)['results'], serializer_response.data)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.client.credentials()
 
@@ -99,6 +160,13 @@ class PrimeDetailsViewTest(SetUpTestData):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.client.credentials()
 
+    # list and detail requests issue a fixed number of queries while records grow
+    # budget: data version for conditional GET and records with their relations
+    def test_query_budget(self):
+        query_budget = QueryBudget(token=self.token, url='/brain_dataset/?page_size=100', budget=2)
+        self.assertEqual(query_budget.run_with_growth(grow=self.add_records, sizes=[1, 10, 30]), True)
+        query_budget.run(url='/brain_dataset/' + str(self.prime_details_1.pk) + '/')
+
     # get request for single brain_dataset with valid token and invalid payload data
     def test_get_invalid_single_request(self):
         url = '/brain_dataset/' + '25' + '/'
@@ -153,7 +221,7 @@ class OtherDetailsViewTest(SetUpTestData):
         response = self.client.get('/other_details/')
         model_response = OtherDetails.objects.all()
         serializer_response = OtherDetailsSerializer(model_response, many=True)
-        self.assertEqual(response.data, serializer_response.data)
+        self.assertEqual(response.data['results'], serializer_response.data)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.client.credentials()
 
@@ -168,6 +236,13 @@ class OtherDetailsViewTest(SetUpTestData):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.client.credentials()
 
+    # list and detail requests issue a fixed number of queries while records grow
+    # budget: case version for conditional GET of detail and catalog rows
+    def test_query_budget(self):
+        query_budget = QueryBudget(token=self.token, url='/other_details/', budget=2)
+        self.assertEqual(query_budget.run_with_growth(grow=self.add_records, sizes=[1, 10, 30]), True)
+        query_budget.run(url='/other_details/' + str(self.prime_details_1.pk) + '/')
+
     # get request for single other_details with valid token and invalid payload data
     def test_get_invalid_single_request(self):
         url = '/other_details/' + '50' + '/'
@@ -208,6 +283,1207 @@ class OtherDetailsViewTest(SetUpTestData):
         del self.common_tests
 
 
+
+# This class is to test cursor pagination of brain_dataset and other_details list requests
+class CursorPaginationTest(SetUpTestData):
+
+    def setUp(self):
+        super(SetUpTestData, self).setUpClass()
+        self.add_records(10)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.decode('utf-8'))
+
+    # follow next cursors until last page and return ids of every page
+    def walk_pages(self, url, key):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append([row[key] for row in response.data['results']])
+            url = response.data['next']
+        return pages
+
+    def test_brain_dataset_pages(self):
+        pages = self.walk_pages('/brain_dataset/?page_size=4', 'prime_details_id')
+        self.assertEqual([len(page) for page in pages], [4, 4, 2])
+        self.assertEqual(sum(pages, []), list(PrimeDetails.objects.order_by('pk').values_list('pk', flat=True)))
+
+    def test_other_details_pages(self):
+        pages = self.walk_pages('/other_details/?page_size=3', 'prime_details_id')
+        self.assertEqual(sum(pages, []), list(
+            OtherDetails.objects.order_by('prime_details_id_id').values_list('prime_details_id_id', flat=True)))
+
+    # deep page is a keyset range query, page size is bounded
+    def test_keyset_query(self):
+        response = self.client.get('/brain_dataset/?page_size=4')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(response.data['next'])
+        self.assertFalse([query for query in queries.captured_queries if 'OFFSET' in query['sql'].upper()])
+        self.assertTrue([query for query in queries.captured_queries if '"prime_details_id" >' in query['sql']])
+
+        response = self.client.get('/brain_dataset/?page_size=5000')
+        self.assertEqual(len(response.data['results']), 10)
+
+    # list without pagination params is the first page of default size, with `next` of the rest
+    def test_default_page(self):
+        PrimeDetailsCursorPagination.page_size = 4
+        try:
+            pages = self.walk_pages('/brain_dataset/', 'prime_details_id')
+            self.assertEqual([len(page) for page in pages], [4, 4, 2])
+            self.assertEqual(len(self.client.get('/other_details/').data['results']), 4)
+        finally:
+            PrimeDetailsCursorPagination.page_size = 100
+
+    # list with `ordering` is paged by page number, in requested order
+    def test_ordering_pages(self):
+        PrimeDetails.objects.filter(mbtb_code='BB00-1').update(age='20')
+        pages = self.walk_pages('/brain_dataset/?ordering=age&page_size=4', 'mbtb_code')
+        self.assertEqual([len(page) for page in pages], [4, 4, 2])
+        self.assertEqual(pages[0][0], 'BB00-1')
+
+    def tearDown(self):
+        super(SetUpTestData, self).tearDownClass()
+        self.client.credentials()
+
+
+# This class is to test filtering and ordering of brain_dataset with query parameters
+class PrimeDetailsFilterTest(SetUpTestData):
+
+    def setUp(self):
+        super(SetUpTestData, self).setUpClass()
+        self.add_records(5)
+        PrimeDetails.objects.filter(mbtb_code='BB00-1').update(age='65', storage_year='2015-01-01T00:00:00')
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.decode('utf-8'))
+
+    def mbtb_codes(self, query):
+        response = self.client.get('/brain_dataset/?' + query)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [row['mbtb_code'] for row in response.data['results']]
+
+    def test_filters(self):
+        self.assertEqual(self.mbtb_codes('sex=Female'), ['BB99-101'])
+        self.assertEqual(self.mbtb_codes('clinical_diagnosis=test&neuropathology_diagnosis=Mixed AD VAD'), ['BB99-101'])
+        self.assertEqual(len(self.mbtb_codes('tissue_type=brain&preservation_method=Fresh Frozen')), 5)
+        self.assertEqual(self.mbtb_codes('age_min=60&age_max=69'), ['BB00-1'])
+        self.assertEqual(self.mbtb_codes('age_min=90'), ['BB99-101'])
+        self.assertEqual(self.mbtb_codes('storage_year_max=2016'), ['BB00-1'])
+        self.assertEqual(self.mbtb_codes('tissue_type=Spinal Cord'), [])
+
+    def test_ordering(self):
+        self.assertEqual(self.mbtb_codes('ordering=-age')[0], 'BB99-101')
+        self.assertEqual(self.mbtb_codes('ordering=age')[0], 'BB00-1')
+        self.assertEqual(self.mbtb_codes('ordering=-mbtb_code')[0], 'BB99-101')
+
+    def test_invalid_filter(self):
+        response = self.client.get('/brain_dataset/?age_min=old')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def tearDown(self):
+        super(SetUpTestData, self).tearDownClass()
+        self.client.credentials()
+
+
+# This class is to test brain_dataset/facets/: value counts, filters and invalidation on data write
+class FacetsTest(SetUpTestData):
+
+    def setUp(self):
+        super(SetUpTestData, self).setUpClass()
+        self.add_records(4)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.decode('utf-8'))
+
+    def test_facets(self):
+        response = self.client.get('/brain_dataset/facets/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['sex'], [{'value': 'Female', 'count': 1}, {'value': 'Male', 'count': 3}])
+        self.assertEqual(response.data['tissue_type'], [{'value': 'brain', 'count': 4}])
+        self.assertEqual(response.data['neuropathology_diagnosis'], [{'value': 'Mixed AD VAD', 'count': 4}])
+
+    # counts are conditioned on other filters, own filter keeps every option
+    def test_filtered_facets(self):
+        response = self.client.get('/brain_dataset/facets/?sex=Female')
+        self.assertEqual(response.data['clinical_diagnosis'], [{'value': 'test', 'count': 1}])
+        self.assertEqual(len(response.data['sex']), 2)
+
+        response = self.client.get('/brain_dataset/facets/?age_min=old')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    # repeated request reads only data version, a write bumps version and counts are rebuilt
+    def test_cache(self):
+        self.client.get('/brain_dataset/facets/')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/brain_dataset/facets/')
+        self.assertEqual(len(queries), 1)
+
+        _version = dataset_version.current()
+        self.client.delete('/delete_data/' + str(self.prime_details_1.pk) + '/')
+        self.assertEqual(dataset_version.current(), _version + 1)
+        response = self.client.get('/brain_dataset/facets/')
+        self.assertEqual(response.data['sex'], [{'value': 'Male', 'count': 3}])
+
+    # denied write request does not change data version
+    def test_denied_write(self):
+        _version = dataset_version.current()
+        self.client.credentials()
+        self.client.delete('/delete_data/' + str(self.prime_details_1.pk) + '/')
+        self.assertEqual(dataset_version.current(), _version)
+
+    # rejected write is rolled back and does not change data version
+    def test_rejected_write(self):
+        _version = dataset_version.current()
+        _age = PrimeDetails.objects.get(pk=self.prime_details_1.pk).age
+        edit_data = dict(self.test_data, age='99', duration='test', autopsy_type='Rejected autopsy type')
+        response = self.client.patch('/edit_data/' + str(self.prime_details_1.pk) + '/', edit_data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post('/add_new_data/', dict(edit_data, mbtb_code='BB99-199'), format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.assertEqual(dataset_version.current(), _version)
+        self.assertEqual(PrimeDetails.objects.get(pk=self.prime_details_1.pk).age, _age)
+        self.assertEqual(Catalog.objects.get(pk=self.prime_details_1.pk).age, _age)
+        self.assertFalse(PrimeDetails.objects.filter(mbtb_code='BB99-199').exists())
+        self.assertFalse(AutopsyTypes.objects.filter(autopsy_type='Rejected autopsy type').exists())
+
+    def tearDown(self):
+        super(SetUpTestData, self).tearDownClass()
+        self.client.credentials()
+
+
+# This class is to test catalog: write views keep it equal to other_details serialization, reads need no joins
+class CatalogTest(SetUpTestData):
+
+    def setUp(self):
+        super(SetUpTestData, self).setUpClass()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.decode('utf-8'))
+
+    def assert_catalog(self, mbtb_code):
+        other_details = OtherDetails.objects.get(prime_details_id__mbtb_code=mbtb_code)
+        catalog = CatalogSerializer(Catalog.objects.get(mbtb_code=mbtb_code))
+        self.assertEqual(catalog.data, OtherDetailsSerializer(other_details).data)
+
+    def test_write_views(self):
+        response = self.client.post('/add_new_data/', self.test_data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assert_catalog('BB99-102')
+
+        prime_details_id = PrimeDetails.objects.get(mbtb_code='BB99-102').pk
+        _version = Catalog.objects.get(pk=prime_details_id).version
+        edit_data = dict(self.test_data, age='75', autopsy_type='Full body', neuropathology_diagnosis='AD')
+        response = self.client.patch('/edit_data/' + str(prime_details_id) + '/', edit_data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assert_catalog('BB99-102')
+        # catalog row is written once, after both tables are saved
+        self.assertEqual(Catalog.objects.get(pk=prime_details_id).version, _version + 1)
+        self.assertEqual(Catalog.objects.get(pk=prime_details_id).neuropathology_diagnosis, 'AD')
+
+        response = self.client.delete('/delete_data/' + str(prime_details_id) + '/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(Catalog.objects.filter(pk=prime_details_id).exists())
+
+    def test_single_table_read(self):
+        self.client.get('/other_details/')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/other_details/' + str(self.prime_details_1.pk) + '/')
+        self.assertEqual(len(queries), 2)
+        self.assertFalse([query for query in queries.captured_queries if 'JOIN' in query['sql']])
+
+    def test_rebuild(self):
+        Catalog.objects.all().delete()
+        call_command('rebuild_catalog', stdout=StringIO())
+        self.assert_catalog(self.prime_details_1.mbtb_code)
+
+    def tearDown(self):
+        super(SetUpTestData, self).tearDownClass()
+        self.client.credentials()
+
+
+# This class is to test sparse fieldsets: `fields`/`exclude` limit response keys and columns read from database
+class SparseFieldsTest(SetUpTestData):
+
+    def setUp(self):
+        super(SetUpTestData, self).setUpClass()
+        self.text_columns = ['clinical_details', 'neuropathology_summary', 'neuropathology_gross',
+                             'neuropathology_microscopic']
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.decode('utf-8'))
+
+    def get_with_queries(self, url):
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, ' '.join(query['sql'] for query in queries.captured_queries)
+
+    def test_brain_dataset_fields(self):
+        response, sql = self.get_with_queries('/brain_dataset/?fields=mbtb_code,neuro_diagnosis_id')
+        self.assertEqual(response.data['results'], [{'mbtb_code': 'BB99-101', 'neuro_diagnosis_id': 'Mixed AD VAD'}])
+        self.assertNotIn('clinical_diagnosis', sql)
+        self.assertNotIn('tissue_types', sql)
+
+        response, sql = self.get_with_queries('/brain_dataset/?fields=mbtb_code&page_size=10&age_min=90&ordering=age')
+        self.assertEqual(response.data['results'], [{'mbtb_code': 'BB99-101'}])
+
+    def test_other_details_exclude(self):
+        url = '/other_details/' + str(self.prime_details_1.pk) + '/?exclude=' + ','.join(self.text_columns)
+        response, sql = self.get_with_queries(url)
+        self.assertEqual(response.data['mbtb_code'], 'BB99-101')
+        for column in self.text_columns:
+            self.assertNotIn(column, response.data)
+            self.assertNotIn(column, sql)
+
+    def test_download_fields(self):
+        response = self.client.post('/download_data/', {
+            'download_mode': 'filtered', 'download_data': [{'mbtb_code': 'BB99-101'}], 'fields': ['mbtb_code', 'sex']
+        }, format='json')
+        self.assertEqual(json.loads(b''.join(response.streaming_content)), [{'mbtb_code': 'BB99-101', 'sex': 'Female'}])
+
+        response = self.client.post('/download_data/', {'download_mode': 'all', 'exclude': 'cerad'}, format='json')
+        data = json.loads(b''.join(response.streaming_content))
+        self.assertNotIn('cerad', data[0])
+        self.assertNotIn('prime_details_id', data[0])
+
+    def test_invalid_fields(self):
+        response = self.client.get('/other_details/?fields=mbtb_code,password')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('password', response.data['Error'])
+
+        response = self.client.post('/download_data/', {'download_mode': 'all', 'fields': 'password'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    # fields or exclude other than a string or list of strings is an invalid field name, not a server error
+    def test_invalid_fields_type(self):
+        for value in [5, [1, 2], ['mbtb_code', None], {'mbtb_code': 1}, True]:
+            for name in ['fields', 'exclude']:
+                response = self.client.post('/download_data/', {'download_mode': 'all', name: value}, format='json')
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertIn('Invalid field names', response.data['Error'])
+
+    def tearDown(self):
+        super(SetUpTestData, self).tearDownClass()
+        self.client.credentials()
+
+
+# This class is to test conditional GET: ETag/Last-Modified follow data version, matching requests get 304
+class ConditionalGetTest(SetUpTestData):
+
+    def setUp(self):
+        super(SetUpTestData, self).setUpClass()
+        self.add_records(3)
+        self.other_prime_details = PrimeDetails.objects.exclude(pk=self.prime_details_1.pk).first()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.decode('utf-8'))
+
+    def test_brain_dataset(self):
+        dataset_version.bump()
+        response = self.client.get('/brain_dataset/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        with CaptureQueriesContext(connection) as queries:
+            response_not_modified = self.client.get('/brain_dataset/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response_not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(len(queries), 1)
+
+        response_modified_since = self.client.get('/brain_dataset/', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response_modified_since.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # other query parameters are another representation
+        response_filtered = self.client.get('/brain_dataset/?sex=Male', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response_filtered.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response_filtered['ETag'], response['ETag'])
+
+        # write changes ETag
+        self.client.delete('/delete_data/' + str(self.other_prime_details.pk) + '/')
+        response_after_write = self.client.get('/brain_dataset/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response_after_write.status_code, status.HTTP_200_OK)
+
+    # ETag of a case changes only when the case is written
+    def test_other_details(self):
+        url = '/other_details/' + str(self.prime_details_1.pk) + '/'
+        response = self.client.get(url)
+        self.client.delete('/delete_data/' + str(self.other_prime_details.pk) + '/')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code,
+                         status.HTTP_304_NOT_MODIFIED)
+
+        CatalogSync().run(prime_details_ids=[self.prime_details_1.pk])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get('/other_details/50/').status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_get_select_options(self):
+        response = self.client.get('/get_select_options/')
+        response_not_modified = self.client.get('/get_select_options/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response_not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    # conditional headers do not bypass authentication
+    def test_without_token(self):
+        response = self.client.get('/get_select_options/')
+        self.client.credentials()
+        response_without_token = self.client.get('/get_select_options/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response_without_token.status_code, status.HTTP_403_FORBIDDEN)
+
+    def tearDown(self):
+        super(SetUpTestData, self).tearDownClass()
+        self.client.credentials()
+
+
+# This class is to test snapshot cache: full-dataset responses are rendered once per data version
+class SnapshotCacheTest(SetUpTestData):
+
+    def setUp(self):
+        super(SetUpTestData, self).setUpClass()
+        self.add_records(3)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.decode('utf-8'))
+
+    def download_all(self, **kwargs):
+        return self.client.post('/download_data/', {'download_mode': 'all'}, format='json', **kwargs)
+
+    def test_download_all(self):
+        response = self.download_all()
+        with CaptureQueriesContext(connection) as queries:
+            response_cached = self.download_all()
+        self.assertFalse([query for query in queries.captured_queries if 'catalog' in query['sql']])
+        self.assertEqual(response_cached.content, response.content)
+        self.assertEqual(len(json.loads(response.content)), 3)
+
+    def test_encodings(self):
+        response = self.download_all(HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(len(json.loads(gzip.decompress(response.content))), 3)
+
+        response = self.download_all(HTTP_ACCEPT_ENCODING='gzip;q=0')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    # write rebuilds snapshot for new data version
+    def test_write(self):
+        response = self.client.post('/download_data/', {'download_mode': 'all'}, format='json')
+        self.assertEqual(len(json.loads(response.content)), 3)
+        self.client.delete('/delete_data/' + str(self.prime_details_1.pk) + '/')
+        self.assertEqual(snapshot_cache.stats()['download_all']['count'], 2)
+
+        response = self.client.post('/download_data/', {'download_mode': 'all'}, format='json')
+        self.assertEqual(len(json.loads(response.content)), 2)
+        self.assertNotIn('prime_details_id', json.loads(response.content)[0])
+
+    def tearDown(self):
+        super(SetUpTestData, self).tearDownClass()
+        self.client.credentials()
+
+
+# This class is to test projections: values() rows mapped to the same output as DRF serializers
+class ProjectionTest(SetUpTestData):
+
+    def setUp(self):
+        super(SetUpTestData, self).setUpClass()
+        self.add_records(3)
+        PrimeDetails.objects.filter(mbtb_code='BB00-1').update(storage_year='2019-01-02T03:04:05.123456', age=None)
+        CatalogSync().run(prime_details_ids=PrimeDetails.objects.values_list('pk', flat=True))
+
+    def test_catalog_projection(self):
+        queryset = Catalog.objects.order_by('pk')
+        self.assertEqual(catalog_projection.run(queryset=queryset), CatalogSerializer(queryset, many=True).data)
+        self.assertEqual(
+            catalog_projection.run(queryset=queryset),
+            OtherDetailsSerializer(OtherDetails.objects.order_by('prime_details_id'), many=True).data
+        )
+        self.assertEqual(list(catalog_projection.run()[0]), list(CatalogSerializer(queryset.first()).data))
+        self.assertEqual(list(catalog_projection.run(names=['sex', 'mbtb_code'])[0]), ['mbtb_code', 'sex'])
+
+    def test_prime_details_projection(self):
+        queryset = PrimeDetails.objects.order_by('pk')
+        self.assertEqual(
+            prime_details_projection.run(queryset=queryset), PrimeDetailsSerializer(queryset, many=True).data
+        )
+        self.assertEqual(list(prime_details_projection.run()[0]), list(PrimeDetailsSerializer(queryset.first()).data))
+        self.assertEqual(len(list(prime_details_projection.iterate(chunk_size=2))), 3)
+
+    def tearDown(self):
+        super(SetUpTestData, self).tearDownClass()
+
+
+# This class is to test streamed download_data responses: JSON array and NDJSON, encoded one chunk at a time
+@override_settings(DOWNLOAD_STREAM={'CHUNK_SIZE': 2, 'CODES_PER_QUERY': 2})
+class StreamingDownloadTest(SetUpTestData):
+
+    def setUp(self):
+        super(SetUpTestData, self).setUpClass()
+        self.add_records(5)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.decode('utf-8'))
+        self.expected = [
+            {name: value for name, value in row.items() if name not in ['prime_details_id', 'other_details_id']}
+            for row in catalog_projection.run(queryset=Catalog.objects.order_by('pk'))
+        ]
+
+    def test_chunks(self):
+        chunks = list(catalog_projection.chunks(chunk_size=2))
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 1])
+        self.assertEqual(sum(chunks, []), catalog_projection.run(queryset=Catalog.objects.order_by('pk')))
+        self.assertEqual([len(chunk) for chunk in catalog_projection.chunks(chunk_size=5)], [5])
+
+    def test_json(self):
+        response = self.client.post('/download_data/', {'download_mode': 'all', 'exclude': 'cerad'}, format='json')
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        with CaptureQueriesContext(connection) as queries:
+            content = list(response.streaming_content)
+        self.assertEqual(len(queries), 3)  # one query per chunk of 2 rows
+        self.assertEqual(content[0], b'[')
+        self.assertEqual(
+            json.loads(b''.join(content)), [{k: v for k, v in row.items() if k != 'cerad'} for row in self.expected]
+        )
+
+    def test_ndjson(self):
+        response = self.client.post(
+            '/download_data/', {'download_mode': 'all', 'download_format': 'ndjson'}, format='json'
+        )
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual([json.loads(line) for line in lines], self.expected)
+
+        response = self.client.post('/download_data/?download_format=ndjson', {
+            'download_mode': 'filtered', 'download_data': [{'mbtb_code': 'BB00-1'}, {'mbtb_code': 'BB00-3'}]
+        }, format='json')
+        lines = b''.join(response.streaming_content).splitlines()
+        self.assertEqual([json.loads(line)['mbtb_code'] for line in lines], ['BB00-1', 'BB00-3'])
+
+    # codes are read in batches of CODES_PER_QUERY, rows follow order of given codes and repeated codes are sent once
+    def test_filtered_batches(self):
+        codes = ['BB00-4', 'BB00-1', 'BB99-101', 'BB00-1', 'BB00-3']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/download_data/', {
+                'download_mode': 'filtered', 'download_data': [{'mbtb_code': code} for code in codes],
+                'fields': 'sex'
+            }, format='json')
+            content = b''.join(response.streaming_content)
+        self.assertEqual(len([query for query in queries if 'catalog' in query['sql']]), 4)  # 2 to check, 2 to read
+        self.assertEqual(json.loads(content), [{'sex': 'Male'}, {'sex': 'Male'}, {'sex': 'Female'}, {'sex': 'Male'}])
+
+        response = self.client.post('/download_data/', {
+            'download_mode': 'filtered', 'download_data': [{'mbtb_code': code} for code in codes]
+        }, format='json')
+        self.assertEqual(
+            [row['mbtb_code'] for row in json.loads(b''.join(response.streaming_content))],
+            ['BB00-4', 'BB00-1', 'BB99-101', 'BB00-3']
+        )
+
+    def test_errors(self):
+        response = self.client.post('/download_data/', {
+            'download_mode': 'filtered',
+            'download_data': [{'mbtb_code': 'BB00-1'}, {'mbtb_code': 'BB99-999'}, {'mbtb_code': 'BB00-2'},
+                              {'mbtb_code': 'BB99-998'}]
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(response.streaming)
+        self.assertEqual(response.data['missing_codes'], ['BB99-999', 'BB99-998'])
+
+        response = self.client.post(
+            '/download_data/', {'download_mode': 'all', 'download_format': 'xml'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        Catalog.objects.all().delete()
+        response = self.client.post('/download_data/', {'download_mode': 'all', 'fields': 'sex'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def tearDown(self):
+        super(SetUpTestData, self).tearDownClass()
+        self.client.credentials()
+
+# This class is to test download_data `query` mode: cohort by filter criteria, compiled to one query on catalog
+class QueryDownloadTest(SetUpTestData):
+
+    def setUp(self):
+        super(SetUpTestData, self).setUpClass()
+        self.add_records(5)
+        OtherDetails.objects.filter(prime_details_id__mbtb_code__in=['BB00-1', 'BB00-3', 'BB00-4']).update(
+            braak_stage='VI', cerad='C'
+        )
+        PrimeDetails.objects.filter(mbtb_code='BB00-3').update(age='62')
+        CatalogSync().run(prime_details_ids=PrimeDetails.objects.values_list('pk', flat=True))
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.decode('utf-8'))
+
+    def download(self, query, **kwargs):
+        data = dict({'download_mode': 'query', 'download_query': query}, **kwargs)
+        return self.client.post('/download_data/', data, format='json')
+
+    def test_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.download({'braak_stage': 'VI', 'cerad': 'C', 'age_min': 65, 'tissue_type': 'brain'})
+            data = json.loads(b''.join(response.streaming_content))
+        self.assertEqual([row['mbtb_code'] for row in data], ['BB00-1', 'BB00-4'])
+        self.assertEqual(len([query for query in queries if 'catalog' in query['sql']]), 1)
+        self.assertNotIn('JOIN', [query for query in queries if 'catalog' in query['sql']][0]['sql'])
+
+        response = self.download({'sex': 'Female'}, download_format='ndjson', fields='mbtb_code')
+        self.assertEqual(b''.join(response.streaming_content), b'{"mbtb_code":"BB99-101"}\n')
+
+        response = self.download({'braak_stage': 'I'})
+        self.assertEqual(json.loads(b''.join(response.streaming_content)), [])
+
+    def test_invalid_query(self):
+        response = self.download({'braak': 'VI'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('braak', str(response.data['Error']))
+        self.assertEqual(self.download({'age_min': 'old'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.download(['VI']).status_code, status.HTTP_400_BAD_REQUEST)
+
+        # list or object criteria are rejected naming the filter, not answered as an empty cohort
+        for query in [{'sex': ['Male']}, {'braak_stage': 'VI', 'cerad': {'in': ['C']}}]:
+            response = self.download(query)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn(list(query)[-1], str(response.data['Error']))
+        self.assertEqual(
+            self.client.post('/download_data/', {'download_mode': 'query'}, format='json').status_code,
+            status.HTTP_400_BAD_REQUEST
+        )
+
+    # other_details list takes the same criteria as query parameters
+    def test_other_details_list(self):
+        response = self.client.get('/other_details/?braak_stage=VI&age_max=65')
+        self.assertEqual([row['mbtb_code'] for row in response.data['results']], ['BB00-3'])
+
+    def tearDown(self):
+        super(SetUpTestData, self).tearDownClass()
+        self.client.credentials()
+
+
+# This class is to test CSV / TSV download_data: upload file columns, exported file can be uploaded back unchanged
+class CsvExportTest(SetUpTestData):
+
+    def setUp(self):
+        super(SetUpTestData, self).setUpClass()
+        self.add_records(3)
+        # preservation_method is derived from formalin_fixed / fresh_frozen on upload
+        OtherDetails.objects.update(formalin_fixed='False', fresh_frozen='True')
+        PrimeDetails.objects.update(preservation_method='Fresh Frozen')
+        OtherDetails.objects.filter(prime_details_id__mbtb_code='BB00-1').update(
+            formalin_fixed='True', duration=None, clinical_details='line 1\nline 2, "quoted"'
+        )
+        PrimeDetails.objects.filter(mbtb_code='BB00-1').update(preservation_method='Both')
+        CatalogSync().run(prime_details_ids=PrimeDetails.objects.values_list('pk', flat=True))
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.decode('utf-8'))
+
+    def download(self, **kwargs):
+        response = self.client.post('/download_data/', dict({'download_mode': 'all'}, **kwargs), format='json')
+        return response, b''.join(response.streaming_content).decode('utf-8')
+
+    # CSV has no null, empty text columns are uploaded back as ''
+    def catalog_rows(self):
+        return [
+            {name: '' if value is None else value for name, value in row.items()}
+            for row in Catalog.objects.order_by('pk').values(*ValidateData.column_names, 'preservation_method')
+        ]
+
+    def test_columns(self):
+        response, content = self.download(download_format='csv')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('mbtb_data.csv', response['Content-Disposition'])
+        rows = list(csv.reader(StringIO(content)))
+        self.assertEqual(rows[0], ValidateData.column_names)
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(ValidateData().check_column_names(column_names=rows[0]), {'Response': True})
+
+        response, content = self.download(download_format='tsv')
+        self.assertEqual(response['Content-Type'], 'text/tab-separated-values; charset=utf-8')
+        self.assertEqual(content.splitlines()[0].split('\t'), ValidateData.column_names)
+
+        response = self.client.post('/download_data/', {
+            'download_mode': 'filtered', 'download_data': [{'mbtb_code': 'BB00-2'}], 'download_format': 'csv'
+        }, format='json')
+        rows = list(csv.DictReader(StringIO(b''.join(response.streaming_content).decode('utf-8'))))
+        self.assertEqual([row['mbtb_code'] for row in rows], ['BB00-2'])
+
+        response = self.client.post('/download_data/', {
+            'download_mode': 'all', 'download_format': 'csv', 'fields': 'mbtb_code'
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_round_trip(self):
+        before = self.catalog_rows()
+        response, content = self.download(download_format='csv')
+        response = self.client.patch(
+            '/file_upload/', {'file': SimpleUploadedFile('export.csv', content.encode('utf-8'))}, format='multipart'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.catalog_rows(), before)
+        self.assertEqual(Catalog.objects.get(mbtb_code='BB00-1').preservation_method, 'Both')
+        self.assertIsNone(Catalog.objects.get(mbtb_code='BB00-1').duration)
+        self.assertEqual(Catalog.objects.get(mbtb_code='BB00-2').preservation_method, 'Fresh Frozen')
+
+    def tearDown(self):
+        super(SetUpTestData, self).tearDownClass()
+        self.client.credentials()
+
+
+# This class is to test HDF5 download_data: one dataset per column, typed numbers and dictionary encoded categories
+@skipUnless(HDF5Export.is_available(), 'h5py and numpy are not installed')
+@override_settings(DOWNLOAD_STREAM={'CHUNK_SIZE': 2}, HDF5_EXPORT={'CHUNK_ROWS': 2})
+class HDF5ExportTest(SetUpTestData):
+
+    def setUp(self):
+        super(SetUpTestData, self).setUpClass()
+        self.add_records(5)
+        OtherDetails.objects.filter(prime_details_id__mbtb_code='BB00-2').update(duration=None, brain_weight=1080)
+        PrimeDetails.objects.filter(mbtb_code='BB00-3').update(sex=None, age='81 years', postmortem_interval='Unknown')
+        CatalogSync().run(prime_details_ids=PrimeDetails.objects.values_list('pk', flat=True))
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.decode('utf-8'))
+
+    def download(self, data):
+        response = self.client.post('/download_data/', data, format='json')
+        self.assertEqual(response['Content-Type'], 'application/x-hdf5')
+        return h5py.File(BytesIO(b''.join(response.streaming_content)), 'r')
+
+    def test_columns(self):
+        catalog = list(Catalog.objects.order_by('pk'))
+        with self.download({'download_mode': 'all', 'download_format': 'hdf5'}) as h5_file:
+            self.assertEqual(h5_file.attrs['rows'], 5)
+            self.assertNotIn('prime_details_id', h5_file)
+            self.assertEqual([value.decode() for value in h5_file['mbtb_code'][:]], [row.mbtb_code for row in catalog])
+            self.assertEqual(h5_file['mbtb_code'].chunks, (2,))
+            self.assertEqual(h5_file['mbtb_code'].compression, 'gzip')
+
+            self.assertEqual(h5_file['age'].dtype, numpy.float64)
+            self.assertEqual(h5_file['age'][3], 81.0)
+            self.assertTrue(numpy.isnan(h5_file['postmortem_interval'][3]))
+            self.assertTrue(numpy.isnan(h5_file['duration'][2]))
+            self.assertEqual(h5_file['brain_weight'][2], 1080.0)
+
+            self.assertEqual(h5_file['sex'].dtype, numpy.int32)
+            categories = [value.decode() for value in h5_file[h5_file['sex'].attrs['categories']][:]]
+            decoded = [None if code == -1 else categories[code] for code in h5_file['sex'][:]]
+            self.assertEqual(decoded, [row.sex for row in catalog])
+
+    def test_filtered(self):
+        with self.download({
+            'download_mode': 'filtered', 'download_data': [{'mbtb_code': 'BB00-1'}], 'download_format': 'hdf5',
+            'fields': 'mbtb_code,sex'
+        }) as h5_file:
+            self.assertEqual(sorted(h5_file.keys()), ['categories', 'mbtb_code', 'sex'])
+            self.assertEqual(h5_file['mbtb_code'][0].decode(), 'BB00-1')
+
+    def tearDown(self):
+        super(SetUpTestData, self).tearDownClass()
+        self.client.credentials()
+
+
+# This class is to test export jobs: download_data with `async`, run_export_worker and status / result endpoints
+class ExportJobTest(SetUpTestData):
+
+    def setUp(self):
+        super(SetUpTestData, self).setUpClass()
+        self.add_records(3)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.decode('utf-8'))
+        self.directory = tempfile.mkdtemp()
+        export_cache.directory = self.directory
+
+    def enqueue(self, **kwargs):
+        data = dict({'download_mode': 'all', 'async': True}, **kwargs)
+        return self.client.post('/download_data/', data, format='json')
+
+    def run_worker(self):
+        call_command('run_export_worker', once=True, stdout=StringIO())
+
+    def test_job(self):
+        response = self.enqueue(download_format='csv')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertFalse(response.data['reused'])
+        job_id = response.data['data']['job_id']
+        self.assertEqual(response.data['data']['status'], 'queued')
+        self.assertEqual(self.enqueue(download_format='csv').data['data']['job_id'], job_id)
+        self.assertEqual(
+            self.client.get('/export_jobs/' + job_id + '/result/').status_code, status.HTTP_400_BAD_REQUEST
+        )
+
+        self.run_worker()
+        response = self.client.get('/export_jobs/' + job_id + '/')
+        self.assertEqual(response.data['data']['status'], 'done')
+        self.assertEqual(response.data['data']['progress'], 100)
+        self.assertEqual(response.data['data']['rows_done'], 3)
+
+        response = self.client.get(response.data['data']['result_url'])
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        exported = b''.join(response.streaming_content)
+        response = self.client.post(
+            '/download_data/', {'download_mode': 'all', 'download_format': 'csv'}, format='json'
+        )
+        self.assertEqual(exported, b''.join(response.streaming_content))
+
+    def test_reuse(self):
+        job_id = self.enqueue(fields='mbtb_code,sex').data['data']['job_id']
+        self.run_worker()
+        response = self.enqueue(fields=['sex', 'mbtb_code'])
+        self.assertTrue(response.data['reused'])
+        self.assertEqual(response.data['data']['job_id'], job_id)
+        self.assertEqual(response.data['data']['status'], 'done')
+
+        # other format or data version is a new job
+        self.assertNotEqual(
+            self.enqueue(fields='mbtb_code,sex', download_format='ndjson').data['data']['job_id'], job_id
+        )
+        dataset_version.bump()
+        self.assertNotEqual(self.enqueue(fields='mbtb_code,sex').data['data']['job_id'], job_id)
+
+    # result file removed from disk is computed again
+    def test_missing_file(self):
+        job_id = self.enqueue().data['data']['job_id']
+        self.run_worker()
+        os.remove(ExportJob.objects.get(job_id=job_id).file_path)
+        self.assertEqual(
+            self.client.get('/export_jobs/' + job_id + '/result/').status_code, status.HTTP_400_BAD_REQUEST
+        )
+        self.assertNotEqual(self.enqueue().data['data']['job_id'], job_id)
+
+    def test_filtered(self):
+        response = self.enqueue(download_mode='filtered', download_data=[{'mbtb_code': 'BB00-1'}, {'mbtb_code': 'X'}])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(ExportJob.objects.exists())
+
+        response = self.enqueue(download_mode='filtered', download_data=[{'mbtb_code': 'BB00-1'}])
+        self.run_worker()
+        response = self.client.get('/export_jobs/' + response.data['data']['job_id'] + '/result/')
+        self.assertEqual([row['mbtb_code'] for row in json.loads(b''.join(response.streaming_content))], ['BB00-1'])
+
+    def test_query(self):
+        OtherDetails.objects.filter(prime_details_id__mbtb_code='BB00-2').update(braak_stage='VI')
+        CatalogSync().run(prime_details_ids=PrimeDetails.objects.values_list('pk', flat=True))
+        response = self.enqueue(download_mode='query', download_query={'braak_stage': 'VI'}, download_format='ndjson')
+        job_id = response.data['data']['job_id']
+        response = self.enqueue(download_mode='query', download_query={'braak_stage': 'V'})
+        self.assertNotEqual(response.data['data']['job_id'], job_id)
+        self.run_worker()
+        response = self.client.get('/export_jobs/' + job_id + '/')
+        self.assertEqual((response.data['data']['status'], response.data['data']['rows_total']), ('done', 1))
+        response = self.client.get(response.data['data']['result_url'])
+        self.assertEqual(json.loads(b''.join(response.streaming_content))['mbtb_code'], 'BB00-2')
+
+    # result file evicted from export cache after the job is done is not available, not a server error
+    def test_evicted_result(self):
+        job_id = self.enqueue(download_format='ndjson').data['data']['job_id']
+        self.run_worker()
+        self.assertEqual(self.client.get('/export_jobs/' + job_id + '/result/').status_code, status.HTTP_200_OK)
+
+        _max_bytes, export_cache.max_bytes = export_cache.max_bytes, 0
+        try:
+            export_cache.evict()
+        finally:
+            export_cache.max_bytes = _max_bytes
+        self.assertFalse(os.path.exists(ExportJob.objects.get(job_id=job_id).file_path))
+        response = self.client.get('/export_jobs/' + job_id + '/result/')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['Error'], 'Export job is done, result is not available.')
+
+    # result file evicted between the job status check and the transfer is not available, not a server error
+    def test_result_evicted_during_transfer(self):
+        job_id = self.enqueue(download_format='ndjson').data['data']['job_id']
+        self.run_worker()
+
+        def evicting_response(request, directory, name, **kwargs):
+            os.remove(os.path.join(directory, name))
+            return FileTransfer.response(file_transfer, request, directory, name, **kwargs)
+
+        file_transfer.response = evicting_response
+        try:
+            response = self.client.get('/export_jobs/' + job_id + '/result/')
+        finally:
+            del file_transfer.response
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['Error'], 'Export job is done, result is not available.')
+
+    # job raising an error is failed with its error and worker goes on with the next job
+    def test_failing_job(self):
+        failing_job_id = self.enqueue(download_format='csv').data['data']['job_id']
+        ExportJob.objects.filter(job_id=failing_job_id).update(parameters='{')
+        job_id = self.enqueue(download_format='ndjson').data['data']['job_id']
+        call_command('run_export_worker', once=True, stdout=StringIO(), stderr=StringIO())
+
+        job = ExportJob.objects.get(job_id=failing_job_id)
+        self.assertEqual(job.status, 'failed')
+        self.assertTrue(job.error)
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(ExportJob.objects.get(job_id=job_id).status, 'done')
+        self.assertNotEqual(self.enqueue(download_format='csv').data['data']['job_id'], failing_job_id)
+
+    def test_claim(self):
+        self.enqueue()
+        export_jobs = ExportJobs()
+        job = export_jobs.claim()
+        self.assertEqual(job.status, 'running')
+        self.assertIsNone(export_jobs.claim())
+        self.assertEqual(export_jobs.requeue_running(), 1)
+        self.assertEqual(export_jobs.claim().job_id, job.job_id)
+        self.assertEqual(self.client.get('/export_jobs/unknown/').status_code, status.HTTP_404_NOT_FOUND)
+
+    def tearDown(self):
+        export_cache.directory = self.export_directory
+        shutil.rmtree(self.directory)
+        ExportJob.objects.all().delete()
+        super(SetUpTestData, self).tearDownClass()
+        self.client.credentials()
+
+
+# This class is to test export cache: repeated download_data requests served from file, eviction and counters
+class ExportCacheTest(SetUpTestData):
+
+    def setUp(self):
+        super(SetUpTestData, self).setUpClass()
+        self.add_records(4)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.decode('utf-8'))
+        self.directory = tempfile.mkdtemp()
+        export_cache.directory = self.directory
+        export_cache.enabled = True
+        export_cache.reset_counters()
+
+    def download(self, **kwargs):
+        response = self.client.post('/download_data/', dict({'download_mode': 'all'}, **kwargs), format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return b''.join(response.streaming_content)
+
+    # Rows are read only for the first request, later ones read the file
+    def test_hit(self):
+        contents = self.download(download_format='csv')
+        self.assertEqual(export_cache.stats()['misses'], 1)
+        self.assertEqual(export_cache.stats()['files'], 1)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.download(download_format='csv'), contents)
+        self.assertFalse([
+            query for query in queries.captured_queries if '"catalog"' in query['sql'] and 'LIMIT 1' not in query['sql']
+        ])
+        self.assertEqual(export_cache.stats()['hits'], 1)
+        self.assertEqual(export_cache.stats()['hit_ratio'], 0.5)
+
+        self.download(download_format='ndjson')
+        self.download(download_format='ndjson', fields=['mbtb_code'])
+        self.download(
+            download_mode='filtered', download_format='csv',
+            download_data=[{'mbtb_code': 'BB00-3'}, {'mbtb_code': 'BB00-2'}, {'mbtb_code': 'BB00-3'}]
+        )
+        self.assertEqual(export_cache.stats()['files'], 4)
+
+        # a new data version is a new key
+        self.add_records(5)
+        self.assertIn(b'BB00-4', self.download(download_format='csv'))
+        self.assertEqual(export_cache.stats()['files'], 5)
+
+    def test_key(self):
+        key = export_cache.key(data_version=1, download_mode='filtered', mbtb_codes=['B', 'A', 'B'])
+        self.assertEqual(key, export_cache.key(data_version=1, download_mode='filtered', mbtb_codes=['B', 'A']))
+        self.assertNotEqual(key, export_cache.key(data_version=1, download_mode='filtered', mbtb_codes=['A', 'B']))
+        self.assertNotEqual(key, export_cache.key(data_version=2, download_mode='filtered', mbtb_codes=['B', 'A']))
+
+    # Least recently used file is removed first, a hit marks the file as used
+    def test_evict(self):
+        export_cache_small = ExportCache(directory=self.directory, max_bytes=250)
+        for name in ['a', 'b']:
+            export_cache_small.put(name * 64, 'txt', lambda file_obj: file_obj.write(b'x' * 100))
+            os.utime(export_cache_small.path(name * 64, 'txt'), (time.time() - 60, time.time() - 60))
+        self.assertIsNotNone(export_cache_small.get('a' * 64, 'txt'))
+
+        export_cache_small.put('c' * 64, 'txt', lambda file_obj: file_obj.write(b'x' * 100))
+        self.assertIsNone(export_cache_small.get('b' * 64, 'txt'))
+        self.assertIsNotNone(export_cache_small.get('a' * 64, 'txt'))
+        self.assertEqual(export_cache_small.stats()['evictions'], 1)
+        self.assertEqual(export_cache_small.usage(), {'files': 2, 'bytes': 200})
+
+    # A response closed before its end (client gone) leaves no file behind
+    def test_abandoned(self):
+        contents = export_cache.tee('d' * 64, 'txt', iter([b'a', b'b']))
+        self.assertEqual(next(contents), b'a')
+        contents.close()
+        self.assertIsNone(export_cache.get('d' * 64, 'txt'))
+        self.assertFalse([
+            file_names for directory, sub_directories, file_names in os.walk(self.directory) if file_names
+        ])
+
+    @skipUnless(h5py is not None, 'h5py is not installed')
+    def test_hdf5(self):
+        contents = self.download(download_format='hdf5')
+        self.assertEqual(self.download(download_format='hdf5'), contents)
+        self.assertEqual(export_cache.stats()['hits'], 1)
+
+    def test_stats(self):
+        self.download(download_format='ndjson')
+        response = self.client.get('/export_cache/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['data']['misses'], 1)
+        self.assertEqual(response.data['data']['files'], 1)
+        self.client.credentials()
+        self.assertEqual(self.client.get('/export_cache/').status_code, status.HTTP_403_FORBIDDEN)
+
+    def tearDown(self):
+        export_cache.directory = self.export_directory
+        export_cache.enabled = False
+        shutil.rmtree(self.directory)
+        cache.clear()
+        super(SetUpTestData, self).tearDownClass()
+        self.client.credentials()
+
+
+# This class is to test signed export urls: download_data `link`, export file view, Range requests and offloading
+class SignedExportTest(SetUpTestData):
+
+    def setUp(self):
+        super(SetUpTestData, self).setUpClass()
+        self.add_records(4)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.decode('utf-8'))
+        self.directory = tempfile.mkdtemp()
+        export_cache.directory = self.directory
+
+    def link(self, **kwargs):
+        response = self.client.post(
+            '/download_data/', dict({'download_mode': 'all', 'download_format': 'csv', 'link': True}, **kwargs),
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['data']['url']
+
+    def test_link(self):
+        url = self.link()
+        self.client.credentials()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        content = b''.join(response.streaming_content)
+        self.assertEqual(len(content.splitlines()), Catalog.objects.count() + 1)
+        self.assertEqual(int(response['Content-Length']), len(content))
+
+        # same request on same data version gives the same file
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.decode('utf-8'))
+        self.assertEqual(self.link().split('?')[0], url.split('?')[0])
+        self.assertNotEqual(self.link(download_format='tsv').split('?')[0], url.split('?')[0])
+
+    def test_signature(self):
+        url = self.link()
+        path, query = url.split('?')
+        self.assertEqual(self.client.get(path).status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(
+            self.client.get(url[:-1] + ('1' if url[-1] == '0' else '0')).status_code, status.HTTP_403_FORBIDDEN
+        )
+        self.assertEqual(
+            self.client.get(path.replace('.csv', '.tsv') + '?' + query).status_code, status.HTTP_403_FORBIDDEN
+        )
+
+        name = path[len('/exports/'):]
+        expired = SignedUrl(max_age=-1).sign(name)['url']
+        self.assertEqual(self.client.get(expired).status_code, status.HTTP_403_FORBIDDEN)
+        self.assertTrue(signed_url.verify(name, query.split('&')[0].split('=')[1], query.split('signature=')[1]))
+
+        # a valid signature of a name outside export cache, or of an evicted file, is not found
+        self.assertEqual(self.client.get(signed_url.sign('../../manage.py')['url']).status_code, 404)
+        shutil.rmtree(self.directory)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+    # Interrupted download is resumed with a Range request
+    def test_range(self):
+        url = self.link()
+        content = b''.join(self.client.get(url).streaming_content)
+
+        response = self.client.get(url, HTTP_RANGE='bytes=10-')
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(response['Content-Range'], 'bytes 10-{}/{}'.format(len(content) - 1, len(content)))
+        self.assertEqual(b''.join(response.streaming_content), content[10:])
+
+        self.assertEqual(b''.join(self.client.get(url, HTTP_RANGE='bytes=2-5').streaming_content), content[2:6])
+        self.assertEqual(b''.join(self.client.get(url, HTTP_RANGE='bytes=-4').streaming_content), content[-4:])
+
+        response = self.client.get(url, HTTP_RANGE='bytes={}-'.format(len(content)))
+        self.assertEqual(response.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        self.assertEqual(response['Content-Range'], 'bytes */{}'.format(len(content)))
+
+        # several ranges, or If-Range of another file, get the whole file
+        self.assertEqual(self.client.get(url, HTTP_RANGE='bytes=0-1,4-5').status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(url, HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"other"').status_code, 200)
+        response = self.client.get(url, HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE=self.client.get(url)['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+
+    def test_offload(self):
+        url = self.link()
+        name = url.split('?')[0][len('/exports/'):]
+        request = RequestFactory().get(url)
+
+        response = FileTransfer(serve='x-accel-redirect', accel_redirect_prefix='/protected/').response(
+            request, self.directory, name, content_type='text/csv'
+        )
+        self.assertEqual(response['X-Accel-Redirect'], '/protected/' + name)
+        self.assertEqual(response.content, b'')
+
+        response = FileTransfer(serve='x-sendfile').response(request, self.directory, name, content_type='text/csv')
+        self.assertEqual(response['X-Sendfile'], os.path.join(self.directory, name))
+
+    def test_job(self):
+        self.client.post('/download_data/', {'download_mode': 'all', 'async': True}, format='json')
+        call_command('run_export_worker', once=True, stdout=StringIO())
+        job = ExportJob.objects.get()
+        response = self.client.get('/export_jobs/' + job.job_id + '/')
+        self.client.credentials()
+        response = self.client.get(response.data['data']['download_url'])
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(len(json.loads(b''.join(response.streaming_content))), Catalog.objects.count())
+
+    def tearDown(self):
+        export_cache.directory = self.export_directory
+        shutil.rmtree(self.directory, ignore_errors=True)
+        ExportJob.objects.all().delete()
+        cache.clear()
+        super(SetUpTestData, self).tearDownClass()
+        self.client.credentials()
+
+
+# This class is to test csv upload of many rows: batched inserts, one transaction and per file validation
+@override_settings(FILE_UPLOAD={'BATCH_SIZE': 10})
+class BulkIngestTest(SetUpTestData):
+
+    def setUp(self):
+        super(SetUpTestData, self).setUpClass()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.decode('utf-8'))
+
+    def csv_file(self, rows):
+        content = StringIO()
+        writer = csv.DictWriter(content, fieldnames=rows[0].keys())
+        writer.writeheader()
+        writer.writerows(rows)
+        return SimpleUploadedFile('upload.csv', content.getvalue().encode('utf-8'))
+
+    def rows(self, size, **kwargs):
+        rows = []
+        for i in range(size):
+            row = {key: value for key, value in self.test_data.items() if key != 'preservation_method'}
+            row.update(mbtb_code='BB50-' + str(i), **kwargs)
+            rows.append(row)
+        return rows
+
+    def upload(self, rows):
+        return self.client.post('/file_upload/', {'file': self.csv_file(rows)}, format='multipart')
+
+    def test_upload(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.upload(self.rows(25, tissue_type='Spinal cord'))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['rows'], 25)
+        self.assertGreater(response.data['rows_per_second'], 0)
+
+        # queries grow with batches, not with rows
+        self.assertLess(len(queries), 40)
+        self.assertEqual(len([
+            query for query in queries.captured_queries if 'INSERT INTO "prime_details"' in query['sql']
+        ]), 3)
+
+        self.assertEqual(PrimeDetails.objects.filter(mbtb_code__startswith='BB50-').count(), 25)
+        self.assertEqual(OtherDetails.objects.filter(prime_details_id__mbtb_code__startswith='BB50-').count(), 25)
+        self.assertEqual(TissueTypes.objects.filter(tissue_type='Spinal cord').count(), 1)
+        catalog = Catalog.objects.get(mbtb_code='BB50-24')
+        self.assertEqual(catalog.tissue_type, 'Spinal cord')
+        self.assertEqual(catalog.preservation_method, 'Both')
+        self.assertEqual(catalog.brain_weight, 1080)
+
+    # An invalid row anywhere in the file uploads nothing, lookup names of the file are not added either
+    def test_rollback(self):
+        rows = self.rows(25, tissue_type='Spinal cord')
+        rows[22]['duration'] = 'test'
+        response = self.upload(rows)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['Error'], (
+            'Expecting value, received text for duration and/or brain_weight at mbtb_code: BB50-22.'
+        ))
+        self.assertFalse(PrimeDetails.objects.filter(mbtb_code__startswith='BB50-').exists())
+        self.assertFalse(TissueTypes.objects.filter(tissue_type='Spinal cord').exists())
+
+        rows = self.rows(3)
+        rows[2]['storage_year'] = ''
+        response = self.upload(rows)
+        self.assertEqual(response.data['Message'], 'Error in prime details, Data uploading failed at mbtb_code: BB50-2')
+        self.assertIn('storage_year', response.data['Error'])
+        self.assertFalse(PrimeDetails.objects.filter(mbtb_code__startswith='BB50-').exists())
+
+    def test_duplicate_code(self):
+        rows = self.rows(3)
+        rows[2]['mbtb_code'] = 'BB50-0'
+        response = self.upload(rows)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['Message'], 'Error in prime details, Data uploading failed at mbtb_code: BB50-0')
+        self.assertIn('mbtb_code', response.data['Error'])
+
+        rows = self.rows(2)
+        rows[1]['mbtb_code'] = self.prime_details_1.mbtb_code
+        self.assertEqual(self.upload(rows).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(PrimeDetails.objects.filter(mbtb_code__startswith='BB50-').exists())
+
+    def tearDown(self):
+        super(SetUpTestData, self).tearDownClass()
+        self.client.credentials()
+
+
+# This class is to test csv edit of many rows: one lookup per batch, changed columns only, summary of codes
+@override_settings(FILE_UPLOAD={'BATCH_SIZE': 10})
+class BulkEditTest(BulkIngestTest):
+
+    def setUp(self):
+        super().setUp()
+        self.assertEqual(self.upload(self.rows(25)).status_code, status.HTTP_201_CREATED)
+
+    def edit(self, rows):
+        return self.client.patch('/file_upload/', {'file': self.csv_file(rows)}, format='multipart')
+
+    def test_upload(self):
+        rows = self.rows(25)
+        for row in rows[:12]:
+            row['sex'] = 'Female'
+        rows[20]['brain_weight'] = '1200'
+        rows.append(dict(rows[0], mbtb_code='BB60-1'))
+        versions = dict(Catalog.objects.values_list('mbtb_code', 'version'))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.edit(rows)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['updated'], ['BB50-' + str(i) for i in range(12)] + ['BB50-20'])
+        self.assertEqual(len(response.data['unchanged']), 12)
+        self.assertEqual(response.data['missing'], ['BB60-1'])
+        self.assertEqual(response.data['rows'], 26)
+
+        # only changed columns are written, rows with the same changes in one statement per batch
+        updates = [query['sql'] for query in queries.captured_queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len([sql for sql in updates if 'UPDATE "prime_details"' in sql]), 2)
+        self.assertEqual(len([sql for sql in updates if 'UPDATE "other_details"' in sql]), 1)
+        self.assertFalse([sql for sql in updates if 'UPDATE "prime_details"' in sql and '"age"' in sql])
+        self.assertLess(len(queries), 40)
+
+        self.assertEqual(PrimeDetails.objects.filter(mbtb_code__startswith='BB50-', sex='Female').count(), 12)
+        self.assertEqual(Catalog.objects.get(mbtb_code='BB50-3').sex, 'Female')
+        self.assertEqual(Catalog.objects.get(mbtb_code='BB50-20').brain_weight, 1200)
+        self.assertEqual(Catalog.objects.get(mbtb_code='BB50-3').version, versions['BB50-3'] + 1)
+        self.assertEqual(Catalog.objects.get(mbtb_code='BB50-15').version, versions['BB50-15'])
+
+        # same file again changes nothing
+        response = self.edit(rows)
+        self.assertEqual(response.data['updated'], [])
+        self.assertEqual(len(response.data['unchanged']), 25)
+
+    # An invalid row anywhere in the file updates nothing
+    def test_rollback(self):
+        rows = self.rows(25, sex='Female')
+        rows[22]['duration'] = 'test'
+        response = self.edit(rows)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['Error'], (
+            'Expecting value, received text for duration and/or brain_weight at mbtb_code: BB50-22.'
+        ))
+        self.assertFalse(PrimeDetails.objects.filter(sex='Female', mbtb_code__startswith='BB50-').exists())
+
+        rows = self.rows(3, sex='Female')
+        rows[1]['khachaturian'] = str(400 ** 99)
+        response = self.edit(rows)
+        self.assertEqual(response.data['Message'], 'Error in other details, Data uploading failed at mbtb_code: BB50-1')
+        self.assertFalse(PrimeDetails.objects.filter(sex='Female', mbtb_code__startswith='BB50-').exists())
+
+    # Repeated code is reported once, its last row is kept
+    def test_duplicate_code(self):
+        rows = self.rows(2)
+        rows.append(dict(rows[1], sex='Female'))
+        response = self.edit(rows)
+        self.assertEqual(response.data['updated'], ['BB50-1'])
+        self.assertEqual(response.data['unchanged'], ['BB50-0'])
+        self.assertEqual(PrimeDetails.objects.get(mbtb_code='BB50-1').sex, 'Female')
+
+
 # This class is to test CreateDataAPIView: all request
 # Default: only POST request is allowed with auth_token, remaining requests are blocked
 class CreateDataAPIViewTest(SetUpTestData):
@@ -1014,3 +2290,287 @@ class DeleteDataAPIViewTest(SetUpTestData):
     def tearDown(self):
         super(SetUpTestData, self).tearDownClass()
         del self.common_tests
+
+
+# This class is to test PrincipalCache: repeated tokens skip the database, size and ttl are honoured
+class PrincipalCacheTest(SetUpTestData):
+
+    def setUp(self):
+        super(SetUpTestData, self).setUpClass()
+        principal_cache.clear()
+
+    # second request with the same token is served from cache
+    def test_cache_hit(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.decode('utf-8'))
+        self.client.get('/get_select_options/')
+        _misses = principal_cache.stats()['misses']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/get_select_options/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(principal_cache.stats()['misses'], _misses)
+        self.assertGreater(principal_cache.stats()['hits'], 0)
+        self.assertFalse([query for query in queries.captured_queries if 'admins' in query['sql']])
+        self.client.credentials()
+
+    # expired and least recently used entries are dropped
+    def test_ttl_and_size(self):
+        cache = PrincipalCache(max_size=2, ttl=60)
+        cache.set((1, 'a@mbtb.ca', 'User'), True)
+        cache.set((2, 'b@mbtb.ca', 'User'), True)
+        cache.get((1, 'a@mbtb.ca', 'User'))
+        cache.set((3, 'c@mbtb.ca', 'Admin'), True)
+        self.assertTrue(cache.get((1, 'a@mbtb.ca', 'User')))
+        self.assertIsNone(cache.get((2, 'b@mbtb.ca', 'User')))
+        self.assertEqual(cache.stats()['size'], 2)
+
+        expired_cache = PrincipalCache(max_size=2, ttl=-1)
+        expired_cache.set((1, 'a@mbtb.ca', 'User'), True)
+        self.assertIsNone(expired_cache.get((1, 'a@mbtb.ca', 'User')))
+        self.assertEqual(expired_cache.stats()['misses'], 1)
+
+    def tearDown(self):
+        super(SetUpTestData, self).tearDownClass()
+        principal_cache.clear()
+
+
+# This class is to test UserOrAdmin: principal is resolved in one query and suspended users are denied
+class UserOrAdminTest(SetUpTestData):
+
+    def setUp(self):
+        super(SetUpTestData, self).setUpClass()
+        principal_cache.clear()
+        self.user = UserAccount.objects.create(email='user@mbtb.ca', password_hash='asdfghjkl123', suspend='Y')
+        self.user_token = jwt.encode(
+            {'id': self.user.id, 'email': self.user.email}, settings.JWT_SECRET, algorithm='HS256'
+        )
+
+    # users and admins are looked up with a single UNION query
+    def test_single_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            principal = UserOrAdmin().run(id=self.user.id, email=self.user.email)
+        self.assertEqual(len(queries.captured_queries), 1)
+        self.assertEqual(principal['role'], 'User')
+        self.assertEqual(principal['suspend'], 'Y')
+
+    # suspended user is denied with a previously issued token
+    def test_suspended_user(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.user_token.decode('utf-8'))
+        response = self.client.get('/get_select_options/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.client.credentials()
+
+    def tearDown(self):
+        super(SetUpTestData, self).tearDownClass()
+        UserAccount.objects.all().delete()
+        principal_cache.clear()
+
+
+# This class is to test role-bearing tokens: authorized from claims, revoked by suspension or token version
+class RoleTokenTest(SetUpTestData):
+
+    def setUp(self):
+        super(SetUpTestData, self).setUpClass()
+        principal_cache.clear()
+        self.admin = AdminAccount.objects.get(email=self.email)
+        self.user = UserAccount.objects.create(email='user@mbtb.ca', password_hash='asdfghjkl123', pending_approval='N')
+        self.admin_token = self.role_token(self.admin, 'Admin')
+        self.user_token = self.role_token(self.user, 'User')
+        revocation_set.refresh()
+
+    def role_token(self, principal, role, **kwargs):
+        payload = {
+            'id': principal.id, 'email': principal.email, 'role': role, 'ver': principal.token_version,
+            'exp': int(time.time()) + kwargs.get('ttl', 60)
+        }
+        return jwt.encode(payload, settings.JWT_SECRET, algorithm='HS256')
+
+    # user token is authorized without querying users or admins tables
+    def test_authorized_from_claims(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.user_token.decode('utf-8'))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/get_select_options/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse([query for query in queries.captured_queries if 'admins' in query['sql']])
+        self.client.credentials()
+
+    # admin token is checked against admins table once, then answered from principal cache
+    def test_admin_token_checked(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.admin_token.decode('utf-8'))
+        self.assertEqual(self.client.get('/get_select_options/').status_code, status.HTTP_200_OK)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/export_cache/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse([query for query in queries.captured_queries if 'admins' in query['sql']])
+        self.client.credentials()
+
+    # admin claim of an id without admin row, or a token signed with another key, is not authorized
+    def test_forged_admin_token(self):
+        forged = AdminAccount(id=987654, email='forged@mbtb.ca', token_version=0)
+        payload = {'id': forged.id, 'email': forged.email, 'role': 'Admin', 'ver': 0, 'exp': int(time.time()) + 60}
+        self.assertNotEqual(settings.JWT_SECRET, settings.SECRET_KEY)
+        for token in [self.role_token(forged, 'Admin'), jwt.encode(payload, 'SECRET_KEY', algorithm='HS256'),
+                      jwt.encode(dict(payload, id=self.admin.id, email=self.admin.email), settings.SECRET_KEY,
+                                 algorithm='HS256')]:
+            self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.decode('utf-8'))
+            self.assertEqual(self.client.get('/export_cache/').status_code, status.HTTP_403_FORBIDDEN)
+            response = self.client.delete('/delete_data/' + str(self.prime_details_1.pk) + '/')
+            self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.client.credentials()
+
+    # user role is not allowed for admin urls
+    def test_user_role_on_admin_url(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.user_token.decode('utf-8'))
+        response = self.client.delete('/delete_data/' + str(self.prime_details_1.pk) + '/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.client.credentials()
+
+    # suspended user and outdated token version are revoked after refresh
+    def test_revoked_tokens(self):
+        UserAccount.objects.filter(id=self.user.id).update(suspend='Y')
+        AdminAccount.objects.filter(id=self.admin.id).update(token_version=1)
+        revocation_set.refresh()
+        for token in [self.user_token, self.admin_token]:
+            self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.decode('utf-8'))
+            response = self.client.get('/get_select_options/')
+            self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.client.credentials()
+
+    # expired token is rejected
+    def test_expired_token(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.role_token(self.admin, 'Admin', ttl=-10).decode())
+        response = self.client.get('/get_select_options/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(response.data['detail'], 'Token - Signature has expired')
+        self.client.credentials()
+
+    def tearDown(self):
+        super(SetUpTestData, self).tearDownClass()
+        UserAccount.objects.all().delete()
+        revocation_set.refresh()
+
+
+# This class is to test RevocationFeed: new changes evict cached principals and update revocation set
+class RevocationFeedTest(SetUpTestData):
+
+    def setUp(self):
+        super(SetUpTestData, self).setUpClass()
+        principal_cache.clear()
+        revocation_feed.cursor = None
+        revocation_feed.poll()
+        self.user = UserAccount.objects.create(email='user@mbtb.ca', password_hash='asdfghjkl123', pending_approval='N')
+        self.user_token = jwt.encode(
+            {'id': self.user.id, 'email': self.user.email, 'role': 'User', 'ver': 0}, settings.JWT_SECRET,
+            algorithm='HS256'
+        )
+        revocation_set.refresh()
+
+    def test_poll(self):
+        UserOrAdmin().run(id=self.user.id, email=self.user.email)
+        self.assertIsNotNone(principal_cache.get((self.user.id, self.user.email, 'User')))
+
+        UserAccount.objects.filter(id=self.user.id).update(suspend='Y', token_version=1)
+        AuthRevocation.objects.create(principal_id=self.user.id, role='User', suspend='Y', token_version=1)
+        revocation_feed.poll()
+        self.assertIsNone(principal_cache.get((self.user.id, self.user.email, 'User')))
+        self.assertTrue(revocation_set.is_revoked(id=self.user.id, role='User', ver=0))
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.user_token.decode('utf-8'))
+        response = self.client.get('/get_select_options/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.client.credentials()
+
+        # reverted account stays revoked for tokens issued before suspension
+        AuthRevocation.objects.create(principal_id=self.user.id, role='User', suspend='N', token_version=1)
+        revocation_feed.poll()
+        self.assertTrue(revocation_set.is_revoked(id=self.user.id, role='User', ver=0))
+        self.assertFalse(revocation_set.is_revoked(id=self.user.id, role='User', ver=1))
+
+    # change committed after a higher change_id was read is applied on next poll, seen changes only once
+    def test_late_commit(self):
+        _cursor = revocation_feed.cursor
+        AuthRevocation.objects.create(change_id=_cursor + 10, principal_id=self.user.id + 1, role='User')
+        revocation_feed.poll()
+        self.assertEqual(revocation_feed.cursor, _cursor + 10)
+
+        AuthRevocation.objects.create(
+            change_id=_cursor + 5, principal_id=self.user.id, role='User', suspend='Y', token_version=1
+        )
+        UserOrAdmin().run(id=self.user.id + 1, email='other@mbtb.ca')
+        revocation_feed.poll()
+        self.assertTrue(revocation_set.is_revoked(id=self.user.id, role='User', ver=0))
+        self.assertEqual(revocation_feed.cursor, _cursor + 10)
+        self.assertIsNotNone(principal_cache.get((self.user.id + 1, 'other@mbtb.ca', 'User')))
+
+    # deleted user is only left in the feed, full refresh keeps its tokens revoked until they expire
+    def test_deleted_user_after_refresh(self):
+        AuthRevocation.objects.create(principal_id=self.user.id, role='User', suspend='Y', token_version=1)
+        UserAccount.objects.filter(id=self.user.id).delete()
+        revocation_feed.poll()
+        revocation_set.refresh()
+        self.assertTrue(revocation_set.is_revoked(id=self.user.id, role='User', ver=0))
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.user_token.decode('utf-8'))
+        response = self.client.get('/get_select_options/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.client.credentials()
+
+        # changes older than token lifetime are not loaded, no token of that time is still valid
+        AuthRevocation.objects.update(created_at=datetime.now() - timedelta(seconds=revocation_set.token_ttl + 60))
+        revocation_set.refresh()
+        self.assertFalse(revocation_set.is_revoked(id=self.user.id, role='User', ver=0))
+
+    def tearDown(self):
+        super(SetUpTestData, self).tearDownClass()
+        UserAccount.objects.all().delete()
+        AuthRevocation.objects.all().delete()
+        revocation_feed.cursor = None
+        revocation_set.refresh()
+
+
+# This class is to test PermissionRegistry: roles are looked up by resolved url name and method
+class PermissionRegistryTest(APITestCase):
+
+    def required_role(self, method, path):
+        request = getattr(RequestFactory(), method.lower())(path)
+        request.resolver_match = resolve(path)
+        return permission_registry.required_role(request)
+
+    def test_required_role(self):
+        self.assertEqual(self.required_role('PATCH', '/edit_data/12/'), 'Admin')
+        self.assertEqual(self.required_role('GET', '/other_details/12/'), 'Authenticated')
+        self.assertEqual(self.required_role('GET', '/brain_dataset/'), 'Authenticated')
+        self.assertEqual(self.required_role('DELETE', '/get_new_tissue_requests/3/'), 'Admin')
+        self.assertIsNone(self.required_role('GET', '/edit_data/12/'))
+        self.assertIsNone(self.required_role('POST', '/brain_dataset/'))
+
+    def test_registry(self):
+        registry = PermissionRegistry(registry={'edit_data': {'patch': 'Admin'}})
+        self.assertTrue(registry.is_registered('edit_data', 'PATCH'))
+        self.assertFalse(registry.is_registered('edit_data', 'GET'))
+        self.assertIsNone(registry.required_role(RequestFactory().patch('/edit_data/1/')))
+
+
+# This class is to test FastJSONRenderer and FastJSONParser: same output as DRF JSON renderer and parser
+class FastJSONTest(APITestCase):
+
+    def setUp(self):
+        self.data = [OrderedDict([
+            ('mbtb_code', 'BB99-101'), ('storage_year', datetime(2018, 6, 6, 3, 3, 3, 250000)),
+            ('date', date(2018, 6, 6)), ('brain_weight', Decimal('1080.5')), ('duration', 12), ('race', None),
+            ('tissue_request_number', uuid.UUID('12345678-1234-5678-1234-567812345678')),
+            ('clinical_details', 'Démence\u2028AD'), ('formalin_fixed', True)
+        ])]
+
+    def test_render(self):
+        self.assertEqual(FastJSONRenderer().render(self.data), JSONRenderer().render(self.data))
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+        self.assertEqual(
+            FastJSONRenderer().render(self.data, 'application/json; indent=4'),
+            FastJSONRenderer().render(self.data, 'application/json; indent=2')
+        )
+
+    def test_parse(self):
+        content = FastJSONRenderer().render(self.data)
+        self.assertEqual(FastJSONParser().parse(BytesIO(content))[0]['storage_year'], '2018-06-06T03:03:03.250000')
+        self.assertRaises(ParseError, FastJSONParser().parse, BytesIO(b'{"mbtb_code": NaN}'))
+        self.assertRaises(ParseError, FastJSONParser().parse, BytesIO(b'{"mbtb_code": '))
@@ -5,15 +5,19 @@ from rest_framework import routers
 router = routers.DefaultRouter()
 
 # pass views to router as url
-router.register('brain_dataset', views.PrimeDetailsAPIView)
-router.register('other_details', views.OtherDetailsAPIView)
+router.register('brain_dataset', views.PrimeDetailsAPIView, basename='brain_dataset')
+router.register('other_details', views.OtherDetailsAPIView, basename='other_details')
 
 urlpatterns = [
     path('', include(router.urls)),
-    path('add_new_data/', views.CreateDataAPIView.as_view()),
-    path('get_select_options/', views.GetSelectOptions.as_view()),
-    path('file_upload/', views.FileUploadAPIView.as_view()),
-    path('edit_data/<int:prime_details_id>/', views.EditDataAPIView.as_view()),
-    path('delete_data/<int:prime_details_id>/', views.DeleteDataAPIView.as_view()),
-    path('download_data/', views.DownloadDataAPIView.as_view())
+    path('add_new_data/', views.CreateDataAPIView.as_view(), name='add_new_data'),
+    path('get_select_options/', views.GetSelectOptions.as_view(), name='get_select_options'),
+    path('file_upload/', views.FileUploadAPIView.as_view(), name='file_upload'),
+    path('edit_data/<int:prime_details_id>/', views.EditDataAPIView.as_view(), name='edit_data'),
+    path('delete_data/<int:prime_details_id>/', views.DeleteDataAPIView.as_view(), name='delete_data'),
+    path('download_data/', views.DownloadDataAPIView.as_view(), name='download_data'),
+    path('export_jobs/<str:job_id>/', views.ExportJobAPIView.as_view(), name='export_job'),
+    path('export_jobs/<str:job_id>/result/', views.ExportJobResultAPIView.as_view(), name='export_job_result'),
+    path('export_cache/', views.ExportCacheAPIView.as_view(), name='export_cache'),
+    path('exports/<path:name>', views.ExportFileView.as_view(), name='export_file')
 ]
@@ -2,42 +2,136 @@ import codecs
 import csv
 import json
 
-from rest_framework import viewsets, views, response
+from rest_framework import viewsets, views, response, exceptions
+from rest_framework.decorators import action
 from rest_framework.parsers import MultiPartParser, FormParser
+from django_filters.rest_framework import DjangoFilterBackend
+from django.db import transaction
 from django.shortcuts import get_object_or_404
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+from django.views import View
+from django.http import JsonResponse
 from resources.data_templates.other_details import OtherDetailsTemplate
 from resources.data_templates.prime_details import PrimeDetailsTemplate
+from resources.db_operations.bulk_edit import BulkEdit
+from resources.db_operations.bulk_ingest import BulkIngest
+from resources.db_operations.catalog_sync import CatalogSync
 from resources.db_operations.get_or_create import GetOrCreate
 from resources.db_operations.download_all_data import DownloadAllData
 from resources.db_operations.download_filtered_data import DownloadFilteredData
+from resources.db_operations.download_query_data import DownloadQueryData
+from resources.db_operations.export_jobs import ExportJobs, build_encoder, file_encoder
+from resources.db_operations.facets import Facets
+from resources.db_operations.sparse_fields import SparseFields
 from .models import AutopsyTypes, PrimeDetails, OtherDetails, NeuropathologicalDiagnosis, \
-    TissueTypes
-from .serializers import PrimeDetailsSerializer, OtherDetailsSerializer, FileUploadPrimeDetailsSerializer, \
-    FileUploadOtherDetailsSerializer, InsertRowPrimeDetailsSerializer
+    TissueTypes, Catalog, ExportJob
+from .filters import PrimeDetailsFilter, CatalogFilter
+from .pagination import PrimeDetailsCursorPagination
+from .serializers import PrimeDetailsSerializer, CatalogSerializer, FileUploadPrimeDetailsSerializer, \
+    FileUploadOtherDetailsSerializer, InsertRowPrimeDetailsSerializer, ExportJobSerializer
 from resources.validations.validate_data import ValidateData
+from resources.cache.data_version import dataset_version, record_version
+from resources.cache.export_cache import export_cache
+from resources.cache.snapshot_cache import snapshot_cache
 from resources.permissions.is_authenticated import IsAuthenticated
 from resources.permissions.is_admin import IsAdmin
+from resources.permissions.signed_url import signed_url
+from resources.renderers.file_transfer import file_transfer
+from resources.renderers.hdf5_export import HDF5Export
+from resources.renderers.streaming_csv import StreamingCSV
+from resources.renderers.streaming_json import StreamingJSON
+
+
+# This mixin increments data version once per write request, caches keyed on data version are rebuilt on next read
+# Rejected requests (4xx) roll back what they wrote, e.g. csv files are validated before the first row is written,
+# so only 2xx responses count as writes
+class DataVersionMixin(object):
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        _status = int(response.status_code)
+        if request.method in ['POST', 'PATCH', 'DELETE'] and 200 <= _status < 300:
+            dataset_version.bump()
+            snapshot_cache.refresh(dataset_version.current())
+
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+# This mixin limits list and detail responses to `fields` or drops `exclude` query parameters, e.g. ?fields=mbtb_code
+# Only columns behind returned fields are read, large TEXT columns are skipped unless they are asked for
+class SparseFieldsViewMixin(object):
+
+    def get_sparse_fields(self):
+        if not hasattr(self, '_sparse_fields'):
+            self._sparse_fields = SparseFields(
+                serializer_class=self.serializer_class, fields=self.request.query_params.get('fields', None),
+                exclude=self.request.query_params.get('exclude', None)
+            )
+            _valid = self._sparse_fields.validate()
+            if not _valid['Response']:
+                raise exceptions.ValidationError({'Error': _valid['Message']})
+
+        return self._sparse_fields
+
+    def get_queryset(self):
+        return self.get_sparse_fields().apply(super().get_queryset())
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.update(self.get_sparse_fields().serializer_kwargs())
+        return super().get_serializer(*args, **kwargs)
 
 
 # This view class is to fetch prime_details, allowed methods: GET
-class PrimeDetailsAPIView(viewsets.ModelViewSet):
+# List can be filtered and ordered with query parameters, see PrimeDetailsFilter
+class PrimeDetailsAPIView(SparseFieldsViewMixin, viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
-    queryset = PrimeDetails.objects.all()
+    queryset = PrimeDetails.objects.select_related('neuro_diagnosis_id', 'tissue_type')
     serializer_class = PrimeDetailsSerializer
+    pagination_class = PrimeDetailsCursorPagination
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = PrimeDetailsFilter
+
+    # Conditional GET: ETag and Last-Modified follow data version, matching requests get 304 before any query
+    @method_decorator(condition(etag_func=dataset_version.etag, last_modified_func=dataset_version.last_modified))
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @method_decorator(condition(etag_func=dataset_version.etag, last_modified_func=dataset_version.last_modified))
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    # brain_dataset/facets/: distinct values and counts of dropdown columns, accepts the same filters as list
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        _response = Facets().run(params=request.query_params)
+        if not _response['response']:
+            return response.Response(_response['errors'], status="400")
+
+        return response.Response(_response['data'], status="200")
 
 
 # This view class is to fetch other_details, allowed methods: GET
-class OtherDetailsAPIView(viewsets.ModelViewSet):
+# Cases are read from denormalized `catalog` table, see CatalogSync
+class OtherDetailsAPIView(SparseFieldsViewMixin, viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
-    queryset = OtherDetails.objects.all()
-    serializer_class = OtherDetailsSerializer
+    queryset = Catalog.objects.all()
+    serializer_class = CatalogSerializer
+    pagination_class = PrimeDetailsCursorPagination
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = CatalogFilter
     lookup_field = 'prime_details_id'
 
+    # Conditional GET for single case, ETag and Last-Modified follow version of the case in catalog
+    @method_decorator(condition(etag_func=record_version.etag, last_modified_func=record_version.last_modified))
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
 
 # This view class is to add single row in prime_details, other_details, allowed methods: POST
-class CreateDataAPIView(views.APIView):
+class CreateDataAPIView(DataVersionMixin, views.APIView):
     permission_classes = [IsAdmin]
 
+    @transaction.atomic
     def post(self, request):
         if not request.data:
             return response.Response({'Error': "Please provide mbtb data"}, status="400")
@@ -72,6 +166,7 @@ class CreateDataAPIView(views.APIView):
             _brain_weight = validate_data.check_is_number(value=request.data['brain_weight'])
 
             if (not _duration['Response']) or (not _brain_weight['Response']):
+                transaction.set_rollback(True)  # undo prime_details and lookup names saved by this request
                 return response.Response({'Error': 'Expecting value, received text for duration and/or brain_weight.'},
                                          status="400")
 
@@ -89,13 +184,14 @@ class CreateDataAPIView(views.APIView):
             other_details_serializer = FileUploadOtherDetailsSerializer(data=other_details.__dict__)
             if other_details_serializer.is_valid():
                 other_details_serializer.save()  # Saving other_details
+                CatalogSync().run(prime_details_ids=[prime_serializer_instance.prime_details_id])
                 return response.Response({'Response': 'Success'}, status="201")  # Return response
 
             else:
                 # TODO: log errors here related to add single data for other_details
 
-                # deleting instance if any error in other_details data
-                prime_serializer_instance.delete()
+                # undo prime_details and lookup names saved by this request if any error in other_details data
+                transaction.set_rollback(True)
 
                 # Return error response if any error in other_details data
                 return response.Response(
@@ -105,7 +201,8 @@ class CreateDataAPIView(views.APIView):
 
         else:
             # TODO: log errors here related to add single data for prime details
-            # Return error response if any error in prime_details data
+            # Return error response if any error in prime_details data, lookup names saved above are undone
+            transaction.set_rollback(True)
             return response.Response(
                 {'Error': 'Error in prime_details, Inserting data failed.'},
                 status="400")
@@ -116,6 +213,7 @@ class CreateDataAPIView(views.APIView):
 class GetSelectOptions(views.APIView):
     permission_classes = [IsAuthenticated]
 
+    @method_decorator(condition(etag_func=dataset_version.etag, last_modified_func=dataset_version.last_modified))
     def get(self, request):
         _neuropathology_diagnosis = NeuropathologicalDiagnosis.objects.values_list('neuro_diagnosis_name', flat=True) \
             .order_by('neuro_diagnosis_name')
@@ -130,11 +228,12 @@ class GetSelectOptions(views.APIView):
 
 
 # This view class is to upload and edit data via csv file in prime_details, other_details, allowed methods: POST, PATCH
-class FileUploadAPIView(views.APIView):
+class FileUploadAPIView(DataVersionMixin, views.APIView):
     parser_classes = (MultiPartParser, FormParser)
     permission_classes = [IsAdmin]
 
     # For `POST` request: upload data via csv file
+    @transaction.atomic
     def post(self, request, format=None):
         validate_data = ValidateData()
         _file_tag = validate_data.check_file_tag(request=request)  # Check for `file` tag
@@ -157,83 +256,16 @@ class FileUploadAPIView(views.APIView):
         if not _column_names['Response']:
             return response.Response({'Error': _column_names['Message']}, status="400")
 
-        for row in _csv_file:
-
-            # Get or Create (Get value or create new if not exists) for AutopsyType, TissuType and Neuro Diagnosis
-            tissue_type = GetOrCreate(model_name='TissueTypes').run(tissue_type=row['tissue_type'])
-            neuro_diagnosis_id = GetOrCreate(model_name='NeuropathologicalDiagnosis').run(
-                neuro_diagnosis_name=row['neuropathology_diagnosis'])
-            autopsy_type = GetOrCreate(model_name='AutopsyTypes').run(autopsy_type=row['autopsy_type'])
-
-            # If prime_details data is validated then save it else return error response
-            _preservation_method = validate_data.check_preservation_method(
-                formalin_fixed=row['formalin_fixed'], fresh_frozen=row['fresh_frozen']
-            )
-            prime_details = PrimeDetailsTemplate(
-                mbtb_code=row['mbtb_code'], sex=row['sex'], age=row['age'],
-                postmortem_interval=row['postmortem_interval'], time_in_fix=row['time_in_fix'],
-                clinical_diagnosis=row['clinical_diagnosis'], tissue_type=tissue_type.tissue_type_id,
-                preservation_method=_preservation_method,
-                neuro_diagnosis_id=neuro_diagnosis_id.neuro_diagnosis_id,
-                storage_year=row['storage_year']
-            )
-            prime_details_serializer = FileUploadPrimeDetailsSerializer(data=prime_details.__dict__)
-
-            if prime_details_serializer.is_valid():
-                prime_serializer_instance = prime_details_serializer.save()  # Saving prime_details
-
-                # If other_details data is validated then save it else return error response
-                _duration = validate_data.check_is_number(value=row['duration'])
-                _brain_weight = validate_data.check_is_number(value=row['brain_weight'])
-
-                if (not _duration['Response']) or (not _brain_weight['Response']):
-                    _error = 'Expecting value, received text for duration and/or brain_weight at mbtb_code: {}.' \
-                        .format(row['mbtb_code'])
-                    return response.Response({'Error': _error}, status="400")
-
-                # If other_details data is validated then save it else return error response
-                other_details = OtherDetailsTemplate(
-                    prime_details_id=prime_details_serializer.data['prime_details_id'], race=row['race'],
-                    duration=_duration['Value'], clinical_details=row['clinical_details'],
-                    cause_of_death=row['cause_of_death'], brain_weight=_brain_weight['Value'],
-                    neuropathology_summary=row['neuropathology_summary'],
-                    neuropathology_gross=row['neuropathology_gross'],
-                    neuropathology_microscopic=row['neuropathology_microscopic'], cerad=row['cerad'],
-                    braak_stage=row['braak_stage'], khachaturian=row['khachaturian'], abc=row['abc'],
-                    autopsy_type=autopsy_type.autopsy_type_id, formalin_fixed=row['formalin_fixed'],
-                    fresh_frozen=row['fresh_frozen']
-                )
-                other_details_serializer = FileUploadOtherDetailsSerializer(data=other_details.__dict__)
-                if other_details_serializer.is_valid():
-                    other_details_serializer.save()  # Saving other_details
-                else:
-                    # TODO: log errors here related to file data uploading for other details
-
-                    # deleting instance if any error in other_details data
-                    prime_serializer_instance.delete()
-
-                    # Return error response if any error in other_details data
-                    return response.Response(
-                        {'Response': 'Failure',
-                         'Message': 'Error in other details, Data uploading failed at mbtb_code: {}'.format(
-                             row['mbtb_code']), 'Error': other_details_serializer.errors},
-                        status="400"
-                    )
-
-            else:
-                # TODO: log errors here related to file data uploading for prime details
-                # Return error response if any error in prime_details data
-                return response.Response(
-                    {'Response': 'Failure',
-                     'Message': 'Error in prime details, Data uploading failed at mbtb_code: {}'.format(
-                         row['mbtb_code']), 'Error': prime_details_serializer.errors},
-                    status="400"
-                )
+        # Whole file is validated before the first insert, rows are then inserted in batches in one transaction
+        _response = BulkIngest().run(csv_file=_csv_file)
+        if not _response['response']:
+            return response.Response(_response['data'], status="400")
 
-        # Return response: data is uploaded successfully
-        return response.Response({'Response': 'Success'}, status="201")
+        # Return response: data is uploaded successfully, with number of rows and rows per second
+        return response.Response(dict({'Response': 'Success'}, **_response['data']), status="201")
 
     # For `PATCH` request: edit data via csv file
+    @transaction.atomic
     def patch(self, request, format=None):
         validate_data = ValidateData()
         _file_tag = validate_data.check_file_tag(request=request)  # Check for `file` tag
@@ -256,92 +288,20 @@ class FileUploadAPIView(views.APIView):
         if not _column_names['Response']:
             return response.Response({'Error': _column_names['Message']}, status="400")
 
-        for row in _csv_file:
+        # Whole file is validated before the first update, then only changed columns of changed rows are written
+        _response = BulkEdit().run(csv_file=_csv_file)
+        if not _response['response']:
+            return response.Response(_response['data'], status="400")
 
-            # Get prime_details, other_details based on prime_details_id or return 404 if not found
-            prime_details = get_object_or_404(PrimeDetails, mbtb_code=row['mbtb_code'])
-            other_details = get_object_or_404(OtherDetails, prime_details_id=prime_details.prime_details_id)
-
-            # Get or Create (Get value or create new if not exists) for AutopsyType, TissuType and Neuro Diagnosis
-            tissue_type = GetOrCreate(model_name='TissueTypes').run(tissue_type=row['tissue_type'])
-            neuro_diagnosis_id = GetOrCreate(model_name='NeuropathologicalDiagnosis').run(
-                neuro_diagnosis_name=row['neuropathology_diagnosis'])
-            autopsy_type = GetOrCreate(model_name='AutopsyTypes').run(autopsy_type=row['autopsy_type'])
-
-            # If prime_details data is validated then save it else return error response
-            _preservation_method = validate_data.check_preservation_method(
-                formalin_fixed=row['formalin_fixed'], fresh_frozen=row['fresh_frozen']
-            )
-            prime_details_template_data = PrimeDetailsTemplate(
-                mbtb_code=row['mbtb_code'], sex=row['sex'], age=row['age'],
-                postmortem_interval=row['postmortem_interval'], time_in_fix=row['time_in_fix'],
-                clinical_diagnosis=row['clinical_diagnosis'], tissue_type=tissue_type.tissue_type_id,
-                preservation_method=_preservation_method,
-                neuro_diagnosis_id=neuro_diagnosis_id.neuro_diagnosis_id,
-                storage_year=row['storage_year']
-            )
-            prime_details_serializer = FileUploadPrimeDetailsSerializer(
-                prime_details, data=prime_details_template_data.__dict__, partial=True
-            )
-
-            if prime_details_serializer.is_valid():
-                prime_details_serializer.save()  # Saving prime_details
-
-                # If other_details data is validated then save it else return error response
-                _duration = validate_data.check_is_number(value=row['duration'])
-                _brain_weight = validate_data.check_is_number(value=row['brain_weight'])
-
-                if (not _duration['Response']) or (not _brain_weight['Response']):
-                    _error = 'Expecting value, received text for duration and/or brain_weight at mbtb_code: {}.' \
-                        .format(row['mbtb_code'])
-                    return response.Response({'Error': _error}, status="400")
-
-                # If other_details data is validated then save it else return error response
-                other_details_template_data = OtherDetailsTemplate(
-                    prime_details_id=prime_details.prime_details_id, race=row['race'],
-                    duration=_duration['Value'], clinical_details=row['clinical_details'],
-                    cause_of_death=row['cause_of_death'], brain_weight=_brain_weight['Value'],
-                    neuropathology_summary=row['neuropathology_summary'],
-                    neuropathology_gross=row['neuropathology_gross'],
-                    neuropathology_microscopic=row['neuropathology_microscopic'], cerad=row['cerad'],
-                    braak_stage=row['braak_stage'], khachaturian=row['khachaturian'], abc=row['abc'],
-                    autopsy_type=autopsy_type.autopsy_type_id, formalin_fixed=row['formalin_fixed'],
-                    fresh_frozen=row['fresh_frozen']
-                )
-                other_details_serializer = FileUploadOtherDetailsSerializer(
-                    other_details, data=other_details_template_data.__dict__, partial=True
-                )
-                if other_details_serializer.is_valid():
-                    other_details_serializer.save()  # Saving other_details
-                else:
-                    # TODO: log errors here related to file data uploading for other details
-
-                    # Return error response if any error in other_details data
-                    return response.Response(
-                        {'Response': 'Failure',
-                         'Message': 'Error in other details, Data uploading failed at mbtb_code: {}'.format(
-                             row['mbtb_code']), 'Error': other_details_serializer.errors},
-                        status="400"
-                    )
-
-            else:
-                # TODO: log errors here related to file data uploading for prime details
-                # Return error response if any error in prime_details data
-                return response.Response(
-                    {'Response': 'Failure',
-                     'Message': 'Error in prime details, Data uploading failed at mbtb_code: {}'.format(
-                         row['mbtb_code']), 'Error': prime_details_serializer.errors},
-                    status="400"
-                )
-
-        # Return response: data is uploaded successfully
-        return response.Response({'Response': 'Success'}, status="201")
+        # Return response: data is uploaded successfully, with updated, unchanged and missing mbtb_code values
+        return response.Response(dict({'Response': 'Success'}, **_response['data']), status="201")
 
 
 # This view class allows us to edit single row of mbtb_data: prime_details, other_details, allowed methods: PATCH
-class EditDataAPIView(views.APIView):
+class EditDataAPIView(DataVersionMixin, views.APIView):
     permission_classes = [IsAdmin]
 
+    @transaction.atomic
     def patch(self, request, prime_details_id, format=None):
         if not request.data:
             return response.Response({'Error': "Please provide mbtb data"}, status="400")
@@ -380,6 +340,7 @@ class EditDataAPIView(views.APIView):
             _brain_weight = validate_data.check_is_number(value=request.data['brain_weight'])
 
             if (not _duration['Response']) or (not _brain_weight['Response']):
+                transaction.set_rollback(True)  # undo prime_details and lookup names saved by this request
                 return response.Response({'Error': 'Expecting value, received text for duration and/or brain_weight.'},
                                          status="400")
 
@@ -399,11 +360,13 @@ class EditDataAPIView(views.APIView):
             )
             if other_details_serializer.is_valid():
                 other_details_serializer.save()  # Saving other_details
+                CatalogSync().run(prime_details_ids=[prime_details_id])
                 return response.Response({'Response': 'Success'}, status="201")  # Return response
 
             else:
                 # TODO: log errors here related to add single data for other_details
-                # Return error response if any error in other_details data
+                # Return error response if any error in other_details data, prime_details changes are undone
+                transaction.set_rollback(True)
                 return response.Response(
                     {'Error': 'Error in other details, Uploading data failed.'},
                     status="400"
@@ -411,7 +374,8 @@ class EditDataAPIView(views.APIView):
 
         else:
             # TODO: log errors here related to add single data for prime details
-            # Return error response if any error in prime_details data
+            # Return error response if any error in prime_details data, lookup names saved above are undone
+            transaction.set_rollback(True)
             return response.Response(
                 {'Error': 'Error in prime_details, Uploading data failed.'},
                 status="400"
@@ -419,14 +383,16 @@ class EditDataAPIView(views.APIView):
 
 
 # This view class allows us to delete data from mbtb_data: prime_details, other_details, allowed_methods: DELETE
-class DeleteDataAPIView(views.APIView):
+class DeleteDataAPIView(DataVersionMixin, views.APIView):
     permission_classes = [IsAdmin]
 
+    @transaction.atomic
     def delete(self, request, prime_details_id, format=None):
         # Get prime_details instance with prime_details_id, return 404 if not found, then delete it
         prime_details = get_object_or_404(PrimeDetails, prime_details_id=prime_details_id)
         other_details = get_object_or_404(OtherDetails, prime_details_id=prime_details_id)
         other_details.delete()
+        CatalogSync().run(prime_details_ids=[prime_details_id])  # removes catalog row, no other_details left
         prime_details.delete()
         return response.Response({'Response': 'Success'}, status="200")  # Return response
 
@@ -442,15 +408,56 @@ class DownloadDataAPIView(views.APIView):
 
         _download_mode = request.data["download_mode"]
 
-        if _download_mode == "all":
+        # optional `fields` or `exclude` list of column names, in request data or query parameters
+        _sparse_fields = SparseFields(
+            serializer_class=CatalogSerializer,
+            fields=request.data.get('fields', request.query_params.get('fields', None)),
+            exclude=request.data.get('exclude', request.query_params.get('exclude', None))
+        )
+        _valid_fields = _sparse_fields.validate()
+        if not _valid_fields['Response']:
+            return response.Response({'Error': _valid_fields['Message']}, status="400")
+
+        # optional `download_format`, 'json' (array, default), 'ndjson' (one object per line),
+        # 'csv' or 'tsv' (columns of the upload file, can be edited and uploaded back), 'hdf5' (dataset per column)
+        _download_format = request.data.get('download_format', request.query_params.get('download_format', 'json'))
+        if _download_format in StreamingCSV.content_types and _sparse_fields.is_sparse():
+            return response.Response({
+                "Error": "'fields' and 'exclude' can't be used with csv, tsv download_format."}, status="400")
+        elif _download_format == "hdf5" and not HDF5Export.is_available():
+            return response.Response({"Error": "hdf5 download_format is not available."}, status="400")
+        elif _download_format not in list(StreamingJSON.content_types) + list(StreamingCSV.content_types) + ["hdf5"]:
+            return response.Response({
+                "Error": "Invalid download_format option, allowed options are 'json', 'ndjson', 'csv', 'tsv', "
+                         "'hdf5'."}, status="400")
+
+        # optional `async`, queue an export job and return its id instead of the data,
+        # optional `link`, write export file and return its signed url instead of the data
+        _export_file = request.data.get('async', False) is True or request.data.get('link', False) is True
+
+        if _download_mode == "all" and _download_format == "json" and not _sparse_fields.is_sparse() \
+                and not _export_file:
+            # all columns of all cases are served from snapshot rendered once per data version
+            _snapshot = snapshot_cache.get('download_all', dataset_version.current())
+            if not _snapshot['count']:
+                return response.Response({
+                    "Error": "Something went wrong, please try again!"}, status="400")
+
+            return snapshot_cache.response(request, _snapshot)
+
+        elif _download_mode == "all":
+            # rows are read and encoded one chunk at a time while the response is sent
             download_all_data = DownloadAllData()
-            _response = download_all_data.run()
+            _response = download_all_data.stream(sparse_fields=_sparse_fields)
 
             if not _response['response']:
                 return response.Response({
                     "Error": "Something went wrong, please try again!"}, status="400")
 
-            return response.Response(_response["data"], status="200")
+            return self.download_response(
+                request, _response["data"], download_mode=_download_mode, download_format=_download_format,
+                fields=_sparse_fields.names()
+            )
 
         elif _download_mode == "filtered":
             # validate request data for 'download_data' tag
@@ -469,14 +476,117 @@ class DownloadDataAPIView(views.APIView):
                 )
             _mbtb_code_list = [elem['mbtb_code'] for elem in _received_input]
             download_filtered_data = DownloadFilteredData()
-            _response = download_filtered_data.run(input_mbtb_codes=_mbtb_code_list)
+            _response = download_filtered_data.stream(input_mbtb_codes=_mbtb_code_list, sparse_fields=_sparse_fields)
 
             if not _response['response']:
                 return response.Response({
-                    "Error": "Invalid mbtb_code present, data not found"}, status="400")
+                    "Error": "Invalid mbtb_code present, data not found",
+                    "missing_codes": _response['missing_codes']}, status="400")
 
-            return response.Response(_response["data"], status="200")
+            return self.download_response(
+                request, _response["data"], download_mode=_download_mode, download_format=_download_format,
+                fields=_sparse_fields.names(), mbtb_codes=_mbtb_code_list
+            )
+
+        elif _download_mode == "query":
+            # cases matching `download_query` criteria, same names as other_details list filters
+            download_query_data = DownloadQueryData()
+            _response = download_query_data.stream(
+                query=request.data.get('download_query', None), sparse_fields=_sparse_fields
+            )
+
+            if not _response['response']:
+                return response.Response({"Error": _response['errors']}, status="400")
+
+            return self.download_response(
+                request, _response["data"], download_mode=_download_mode, download_format=_download_format,
+                fields=_sparse_fields.names(), query=request.data['download_query']
+            )
 
         else:
             return response.Response({
-                "Error": "Invalid download_mode option, allowed options are 'all', 'filtered'."}, status="400")
+                "Error": "Invalid download_mode option, allowed options are 'all', 'filtered', 'query'."},
+                status="400")
+
+    # Stream chunks in requested format, with `async` queue an export job for them and return its status,
+    # with `link` return signed url of export file
+    def download_response(self, request, chunks, **kwargs):
+        if request.data.get('async', False) is True:
+            _principal = getattr(request, 'principal', None) or {}
+            _response = ExportJobs().enqueue(requested_by=_principal.get('email', None), **kwargs)
+            return response.Response(
+                {'response': True, 'reused': _response['reused'], 'data': ExportJobSerializer(_response['data']).data},
+                status="202"
+            )
+
+        # repeated downloads on the same data version are served from the export cache file
+        _key = export_cache.key(data_version=dataset_version.current(), **kwargs)
+        _encoder = build_encoder(kwargs.get('download_format', None))
+        if request.data.get('link', False) is True:
+            _path = export_cache.name(export_cache.file(_key, _encoder, chunks))
+            return response.Response({'response': True, 'data': signed_url.sign(_path)}, status="200")
+
+        return export_cache.response(_key, _encoder, chunks)
+
+
+# This class is to read status and progress of an export job queued by download_data with `async`
+class ExportJobAPIView(views.APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id, format=None):
+        _job = get_object_or_404(ExportJob, job_id=job_id)
+        return response.Response({'response': True, 'data': ExportJobSerializer(_job).data}, status="200")
+
+
+# This class is to download result file of a finished export job
+class ExportJobResultAPIView(views.APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id, format=None):
+        _job = get_object_or_404(ExportJob, job_id=job_id)
+        if _job.status == 'done':
+            _encoder = build_encoder(_job.download_format)
+            # result file may be evicted from export cache at any time after the job is done
+            try:
+                return file_transfer.response(
+                    request, export_cache.directory, export_cache.name(_job.file_path),
+                    content_type=_encoder.content_type, filename='mbtb_data.' + _encoder.extension
+                )
+            except FileNotFoundError:
+                pass
+
+        return response.Response({"Error": "Export job is {}, result is not available.".format(_job.status)},
+                                 status="400")
+
+
+# This class is to download export file of a signed url, allowed methods: GET
+# Plain Django view: signature is checked without authentication or db query, then file is handed to web server
+class ExportFileView(View):
+
+    def get(self, request, name):
+        if not signed_url.verify(name, request.GET.get('expires', None), request.GET.get('signature', None)):
+            return JsonResponse({"Error": "Invalid or expired download link."}, status=403)
+
+        _key, _encoder = export_cache.split(name), file_encoder(name)
+        if _key is None or _encoder is None or export_cache.get(*_key) is None:
+            return JsonResponse({"Error": "Export file is not available, please download data again."}, status=404)
+
+        try:
+            return file_transfer.response(
+                request, export_cache.directory, name, content_type=_encoder.content_type,
+                filename='mbtb_data.' + _encoder.extension
+            )
+        except FileNotFoundError:
+            return JsonResponse({"Error": "Export file is not available, please download data again."}, status=404)
+
+
+# This class is to read export cache counters and disk usage, allowed methods: GET
+class ExportCacheAPIView(views.APIView):
+    permission_classes = [IsAdmin]
+
+    def get(self, request, format=None):
+        return response.Response({'response': True, 'data': export_cache.stats()}, status="200")
+
+
+# Full-dataset responses kept in snapshot cache, rebuilt when data version changes
+snapshot_cache.register('download_all', lambda: DownloadAllData().run().get('data', []))
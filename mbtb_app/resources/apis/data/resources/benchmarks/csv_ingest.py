@@ -0,0 +1,112 @@
+"""
+Compare csv upload (file_upload POST) paths: row by row saves against validate-then-bulk_create ingest.
+
+Run from the data API directory, rows are inserted into a temporary test database:
+    python -m resources.benchmarks.csv_ingest [rows ...]    (default: 500 5000)
+
+Each path uploads the same rows with new mbtb_code values; rows/sec and number of queries are printed.
+"""
+import os
+import sys
+import time
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'data.envs.development')
+
+import django  # noqa: E402
+django.setup()
+
+from django.db import connection, transaction  # noqa: E402
+from mbtb.serializers import FileUploadPrimeDetailsSerializer, FileUploadOtherDetailsSerializer  # noqa: E402
+from mbtb.utils import ManagedModelTestRunner  # noqa: E402
+from resources.data_templates.other_details import OtherDetailsTemplate  # noqa: E402
+from resources.data_templates.prime_details import PrimeDetailsTemplate  # noqa: E402
+from resources.db_operations.bulk_ingest import BulkIngest  # noqa: E402
+from resources.db_operations.catalog_sync import CatalogSync  # noqa: E402
+from resources.db_operations.get_or_create import GetOrCreate  # noqa: E402
+from resources.validations.validate_data import ValidateData  # noqa: E402
+
+ROW = {
+    'sex': 'Male', 'age': '70', 'postmortem_interval': '12', 'time_in_fix': 'Not known', 'tissue_type': 'Brain',
+    'autopsy_type': 'Brain', 'neuropathology_diagnosis': 'Mixed AD VAD', 'race': '', 'clinical_diagnosis': 'AD',
+    'duration': '10', 'clinical_details': 'AD ' * 40, 'cause_of_death': '', 'brain_weight': '1080',
+    'neuropathology_summary': 'AD SEVERE WITH ATROPHY, NEURONAL LOSS AND GLIOSIS ' * 4, 'neuropathology_gross': '',
+    'neuropathology_microscopic': '', 'cerad': '', 'braak_stage': 'VI', 'khachaturian': '30', 'abc': '',
+    'formalin_fixed': 'True', 'fresh_frozen': 'False', 'storage_year': '2018-06-06 03:03:03'
+}
+
+
+# Upload path before bulk ingest: lookups, two serializer saves and a catalog sync per row
+@transaction.atomic
+def row_by_row_path(csv_file):
+    validate_data = ValidateData()
+    for row in csv_file:
+        tissue_type = GetOrCreate(model_name='TissueTypes').run(tissue_type=row['tissue_type'])
+        neuro_diagnosis_id = GetOrCreate(model_name='NeuropathologicalDiagnosis').run(
+            neuro_diagnosis_name=row['neuropathology_diagnosis'])
+        autopsy_type = GetOrCreate(model_name='AutopsyTypes').run(autopsy_type=row['autopsy_type'])
+        prime_details_serializer = FileUploadPrimeDetailsSerializer(data=PrimeDetailsTemplate(
+            mbtb_code=row['mbtb_code'], sex=row['sex'], age=row['age'],
+            postmortem_interval=row['postmortem_interval'], time_in_fix=row['time_in_fix'],
+            clinical_diagnosis=row['clinical_diagnosis'], tissue_type=tissue_type.tissue_type_id,
+            preservation_method=validate_data.check_preservation_method(
+                formalin_fixed=row['formalin_fixed'], fresh_frozen=row['fresh_frozen']),
+            neuro_diagnosis_id=neuro_diagnosis_id.neuro_diagnosis_id, storage_year=row['storage_year']
+        ).__dict__)
+        prime_details_serializer.is_valid(raise_exception=True)
+        prime_details = prime_details_serializer.save()
+        other_details_serializer = FileUploadOtherDetailsSerializer(data=OtherDetailsTemplate(
+            prime_details_id=prime_details.prime_details_id, race=row['race'],
+            duration=validate_data.check_is_number(value=row['duration'])['Value'],
+            clinical_details=row['clinical_details'], cause_of_death=row['cause_of_death'],
+            brain_weight=validate_data.check_is_number(value=row['brain_weight'])['Value'],
+            neuropathology_summary=row['neuropathology_summary'], neuropathology_gross=row['neuropathology_gross'],
+            neuropathology_microscopic=row['neuropathology_microscopic'], cerad=row['cerad'],
+            braak_stage=row['braak_stage'], khachaturian=row['khachaturian'], abc=row['abc'],
+            autopsy_type=autopsy_type.autopsy_type_id, formalin_fixed=row['formalin_fixed'],
+            fresh_frozen=row['fresh_frozen']
+        ).__dict__)
+        other_details_serializer.is_valid(raise_exception=True)
+        other_details_serializer.save()
+        CatalogSync().run(prime_details_ids=[prime_details.prime_details_id])
+
+
+def bulk_path(csv_file):
+    _response = BulkIngest().run(csv_file=csv_file)
+    if not _response['response']:
+        raise ValueError(_response['data'])
+
+
+# Count queries without keeping them, query log of CaptureQueriesContext is capped at 9000
+class QueryCounter(object):
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def main():
+    sizes = [int(size) for size in sys.argv[1:]] or [500, 5000]
+    runner = ManagedModelTestRunner(verbosity=0)
+    runner.setup_test_environment()
+    old_config = runner.setup_databases()
+    try:
+        for size in sizes:
+            for name, func in [('row by row', row_by_row_path), ('bulk', bulk_path)]:
+                csv_file = [dict(ROW, mbtb_code='{}-{}-{}'.format(name[:3], size, i)) for i in range(size)]
+                queries = QueryCounter()
+                with connection.execute_wrapper(queries):
+                    start = time.perf_counter()
+                    func(csv_file)
+                    seconds = time.perf_counter() - start
+                print('{:>6} rows  {:<10} {:>8.3f} s  {:>8.0f} rows/s  {:>6} queries'.format(
+                    size, name, seconds, size / seconds, queries.count))
+    finally:
+        runner.teardown_databases(old_config)
+        runner.teardown_test_environment()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Compare filtered download_data for long mbtb_code lists: one `IN (...)` with every code against batched queries.
+
+Run from the data API directory, rows are inserted into a temporary test database:
+    python -m resources.benchmarks.filtered_download [codes ...]    (default: 100 10000 100000)
+
+The catalog holds as many cases as the largest code list; every list has one unknown code at the end, so the
+time to report missing codes is measured as well.
+"""
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'data.envs.development')
+
+import django  # noqa: E402
+django.setup()
+
+from mbtb.models import Catalog  # noqa: E402
+from mbtb.utils import ManagedModelTestRunner  # noqa: E402
+from resources.benchmarks.serializer_throughput import insert_rows  # noqa: E402
+from resources.db_operations.download_filtered_data import DownloadFilteredData  # noqa: E402
+from resources.db_operations.projection import catalog_projection  # noqa: E402
+
+NAMES = [name for name in catalog_projection.names() if name not in ['prime_details_id', 'other_details_id']]
+
+
+# Filtered download before batching: all codes in a single `IN (...)`, only a length check for missing codes
+def single_in_path(codes):
+    data = catalog_projection.run(queryset=Catalog.objects.filter(mbtb_code__in=codes), names=NAMES)
+    if len(data) != len(codes):
+        return {'response': False}
+    return {'response': True, 'data': data}
+
+
+def batched_path(codes):
+    return DownloadFilteredData().run(input_mbtb_codes=codes)
+
+
+def measure(func, codes):
+    start = time.perf_counter()
+    try:
+        response = func(codes)
+    except Exception as error:
+        return 'failed: {}'.format(str(error).splitlines()[0][:40]), time.perf_counter() - start
+    if response['response']:
+        return '{} rows'.format(len(response['data'])), time.perf_counter() - start
+    return '{} missing'.format(len(response.get('missing_codes', [])) or '?'), time.perf_counter() - start
+
+
+def main():
+    sizes = [int(size) for size in sys.argv[1:]] or [100, 10000, 100000]
+    runner = ManagedModelTestRunner(verbosity=0)
+    runner.setup_test_environment()
+    old_config = runner.setup_databases()
+    try:
+        insert_rows(max(sizes))
+        all_codes = list(Catalog.objects.values_list('mbtb_code', flat=True))
+        for size in sizes:
+            codes = random.sample(all_codes, size)
+            for name, func in [('single IN', single_in_path), ('batched', batched_path)]:
+                result, seconds = measure(func, codes)
+                print('{:>7} codes  {:<10} {:>8.3f} s  {}'.format(size, name, seconds, result))
+                result, seconds = measure(func, codes + ['BB-UNKNOWN'])
+                print('{:>7} codes  {:<10} {:>8.3f} s  {} (one unknown code)'.format(size, name, seconds, result))
+    finally:
+        runner.teardown_databases(old_config)
+        runner.teardown_test_environment()
+
+
+if __name__ == '__main__':
+    main()
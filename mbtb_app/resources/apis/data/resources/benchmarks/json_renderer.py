@@ -0,0 +1,61 @@
+"""
+Measure JSON encode/decode time: DRF JSONRenderer/JSONParser against the orjson backed renderer and parser.
+
+Run from the data API directory:
+    python -m resources.benchmarks.json_renderer [rows ...]
+
+Rows are shaped like the catalog projection (strings, datetime, Decimal, UUID), so no database is needed.
+"""
+import os
+import sys
+import timeit
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from decimal import Decimal
+from io import BytesIO
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'data.envs.development')
+
+import django  # noqa: E402
+django.setup()
+
+from rest_framework.parsers import JSONParser  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+from resources.renderers.fast_json import FastJSONRenderer, FastJSONParser  # noqa: E402
+
+
+def build_rows(size):
+    rows = []
+    for i in range(size):
+        rows.append(OrderedDict([
+            ('mbtb_code', 'BB99-{}'.format(i)), ('sex', 'Male' if i % 2 else 'Female'), ('age', str(50 + i % 40)),
+            ('postmortem_interval', '{} hours'.format(i % 24)), ('time_in_fix', '3 weeks'),
+            ('clinical_diagnosis', 'Alzheimer\'s Disease'), ('neuropathology_diagnosis', 'AD; Lewy body disease'),
+            ('brain_weight', Decimal('1{}.5'.format(i % 1000))), ('storage_year', datetime(2018, 6, 6, 3, 3, i % 60)),
+            ('tissue_request_number', uuid.UUID(int=i)), ('clinical_details', 'Progressive memory loss ' * 4),
+            ('formalin_fixed', bool(i % 2)), ('race', None)
+        ]))
+    return rows
+
+
+def main():
+    sizes = [int(size) for size in sys.argv[1:]] or [10000, 100000]
+    for size in sizes:
+        rows = build_rows(size)
+        content = JSONRenderer().render(rows)
+        assert FastJSONRenderer().render(rows) == content
+        cases = [
+            ('drf render', lambda: JSONRenderer().render(rows)),
+            ('orjson render', lambda: FastJSONRenderer().render(rows)),
+            ('drf parse', lambda: JSONParser().parse(BytesIO(content))),
+            ('orjson parse', lambda: FastJSONParser().parse(BytesIO(content))),
+        ]
+        print('{} rows, {:.1f} MB'.format(size, len(content) / 1e6))
+        for name, func in cases:
+            seconds = min(timeit.repeat(func, number=1, repeat=3))
+            print('  {:<14} {:>8.1f} ms {:>10.0f} rows/s'.format(name, seconds * 1e3, size / seconds))
+
+
+if __name__ == '__main__':
+    main()
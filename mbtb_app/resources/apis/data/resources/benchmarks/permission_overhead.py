@@ -0,0 +1,83 @@
+"""
+Measure per-request permission overhead: legacy path splitting against the url name registry.
+
+Run from the data API directory:
+    python -m resources.benchmarks.permission_overhead [iterations]
+
+Principal is attached to each request beforehand, so only the url/method check itself is timed.
+"""
+import os
+import sys
+import timeit
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'data.envs.development')
+
+import django  # noqa: E402
+django.setup()
+
+from django.test import RequestFactory  # noqa: E402
+from django.urls import resolve  # noqa: E402
+from resources.permissions.is_admin import IsAdmin  # noqa: E402
+from resources.permissions.is_authenticated import IsAuthenticated  # noqa: E402
+
+REQUESTS = [
+    ('GET', '/brain_dataset/', IsAuthenticated),
+    ('GET', '/other_details/12/', IsAuthenticated),
+    ('POST', '/download_data/', IsAuthenticated),
+    ('PATCH', '/edit_data/12/', IsAdmin),
+    ('DELETE', '/get_new_tissue_requests/3/', IsAdmin),
+]
+
+# url lists checked before the registry, per method
+LEGACY_URLS = {
+    IsAdmin: {
+        'POST': ['file_upload', 'add_new_data'],
+        'PATCH': ['edit_data', 'file_upload', 'get_new_tissue_requests', 'get_archive_tissue_requests'],
+        'DELETE': ['delete_data', 'get_new_tissue_requests', 'get_archive_tissue_requests'],
+        'GET': ['get_new_tissue_requests', 'get_archive_tissue_requests']
+    },
+    IsAuthenticated: {
+        'GET': ['brain_dataset', 'other_details', 'get_select_options'],
+        'POST': ['add_new_tissue_requests', 'download_data']
+    }
+}
+
+
+def build_request(method, path):
+    request = getattr(RequestFactory(), method.lower())(path)
+    request.resolver_match = resolve(path)
+    request.principal = {'id': 1, 'email': 'admin@mbtb.ca', 'role': 'Admin', 'suspend': 'N', 'pending_approval': 'N'}
+    return request
+
+
+def legacy_has_permission(permission, request):
+    valid_url = list(LEGACY_URLS[type(permission)][request.method])
+    url_path = request.path.split('/')
+    if max(url_path) in valid_url:
+        return permission.authenticate(request)
+    return False
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    cases = [(build_request(method, path), permission()) for method, path, permission in REQUESTS]
+
+    for request, permission in cases:
+        assert legacy_has_permission(permission, request) and permission.has_permission(request, None)
+
+    def legacy():
+        for request, permission in cases:
+            legacy_has_permission(permission, request)
+
+    def registry():
+        for request, permission in cases:
+            permission.has_permission(request, None)
+
+    calls = iterations * len(cases)
+    for name, func in [('path split', legacy), ('registry', registry)]:
+        seconds = min(timeit.repeat(func, number=iterations, repeat=3))
+        print('{:<12} {:>8.3f} us/request'.format(name, seconds / calls * 1e6))
+
+
+if __name__ == '__main__':
+    main()
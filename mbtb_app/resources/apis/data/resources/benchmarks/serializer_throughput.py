@@ -0,0 +1,76 @@
+"""
+Compare rows/sec of download_data `all` paths: DRF serializer against values() projection.
+
+Run from the data API directory, rows are inserted into a temporary test database:
+    python -m resources.benchmarks.serializer_throughput [rows ...]    (default: 10000 100000)
+"""
+import os
+import sys
+import time
+from datetime import datetime
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'data.envs.development')
+
+import django  # noqa: E402
+django.setup()
+
+from mbtb.models import Catalog  # noqa: E402
+from mbtb.serializers import CatalogSerializer  # noqa: E402
+from mbtb.utils import ManagedModelTestRunner  # noqa: E402
+from resources.db_operations.projection import catalog_projection  # noqa: E402
+
+
+def insert_rows(rows):
+    Catalog.objects.all().delete()
+    Catalog.objects.bulk_create([
+        Catalog(
+            prime_details_id=i, other_details_id=i, mbtb_code='BB{:06d}'.format(i), sex='Female', age='81',
+            postmortem_interval='12', time_in_fix='10', neuropathology_diagnosis='Mixed AD VAD', tissue_type='Brain',
+            preservation_method='Fresh Frozen', storage_year=datetime(2018, 6, 6, 3, 3, 3), autopsy_type='Brain',
+            clinical_diagnosis='AD', race='', duration=10, clinical_details='AD ' * 40, cause_of_death='',
+            brain_weight=1080, neuropathology_summary='AD SEVERE WITH ATROPHY, NEURONAL LOSS AND GLIOSIS ' * 4,
+            neuropathology_gross='', neuropathology_microscopic='', cerad='', braak_stage='VI', khachaturian='30',
+            abc='', formalin_fixed='True', fresh_frozen='True'
+        ) for i in range(1, rows + 1)
+    ], batch_size=400)
+
+
+# Download path before projection: model instances, serializer, OrderedDict to dict, deleting keys
+def drf_path():
+    data = [dict(elem) for elem in CatalogSerializer(Catalog.objects.all(), many=True).data]
+    for elem in data:
+        del elem['prime_details_id']
+        del elem['other_details_id']
+    return data
+
+
+def projection_path():
+    names = [name for name in catalog_projection.names() if name not in ['prime_details_id', 'other_details_id']]
+    return catalog_projection.run(names=names)
+
+
+def measure(func):
+    start = time.perf_counter()
+    data = func()
+    return len(data), time.perf_counter() - start
+
+
+def main():
+    sizes = [int(size) for size in sys.argv[1:]] or [10000, 100000]
+    runner = ManagedModelTestRunner(verbosity=0)
+    runner.setup_test_environment()
+    old_config = runner.setup_databases()
+    try:
+        for rows in sizes:
+            insert_rows(rows)
+            assert drf_path() == projection_path()
+            for name, func in [('drf serializer', drf_path), ('projection', projection_path)]:
+                count, seconds = measure(func)
+                print('{:>7} rows  {:<15} {:>8.3f} s  {:>10.0f} rows/sec'.format(count, name, seconds, count / seconds))
+    finally:
+        runner.teardown_databases(old_config)
+        runner.teardown_test_environment()
+
+
+if __name__ == '__main__':
+    main()
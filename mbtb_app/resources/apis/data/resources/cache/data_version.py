@@ -0,0 +1,72 @@
+import hashlib
+from datetime import datetime
+from django.db.models import F
+from mbtb.models import DataVersion, Catalog
+
+
+# This class reads and increments the version of mbtb data stored in `data_versions` table
+# Every worker sees the same version, so caches keyed on it are invalidated by a write in any worker
+class DatasetVersion(object):
+
+    def __init__(self, **kwargs):
+        self.name = kwargs.get('name', 'dataset')
+
+    def current(self):
+        return self.state()['version']
+
+    # Return version and time of last write, `request` keeps it for later calls of the same request
+    def state(self, request=None):
+        if request is not None and hasattr(request, '_dataset_version'):
+            return request._dataset_version
+
+        _state = DataVersion.objects.filter(name=self.name).values('version', 'updated_at').first() or \
+            {'version': 0, 'updated_at': None}
+        if request is not None:
+            request._dataset_version = _state
+        return _state
+
+    # Increment version in a single UPDATE, row is created on first write if it is missing
+    def bump(self):
+        _updated = DataVersion.objects.filter(name=self.name).update(version=F('version') + 1, updated_at=datetime.now())
+        if not _updated:
+            DataVersion.objects.create(name=self.name, version=1)
+
+    # ETag and Last-Modified callables for `django.views.decorators.http.condition`
+    def etag(self, request, *args, **kwargs):
+        return representation_etag(request, self.state(request)['version'])
+
+    def last_modified(self, request, *args, **kwargs):
+        return self.state(request)['updated_at']
+
+
+# This class reads version of a single case from `catalog`, incremented by CatalogSync on every write of the case
+class RecordVersion(object):
+
+    def __init__(self, **kwargs):
+        self.lookup_field = kwargs.get('lookup_field', 'prime_details_id')
+
+    def state(self, request, **kwargs):
+        if not hasattr(request, '_record_version'):
+            request._record_version = Catalog.objects.filter(prime_details_id=kwargs.get(self.lookup_field, None)) \
+                .values('version', 'updated_at').first() or {'version': None, 'updated_at': None}
+        return request._record_version
+
+    # No ETag for missing case, request continues to 404 response
+    def etag(self, request, *args, **kwargs):
+        _version = self.state(request, **kwargs)['version']
+        if _version is None:
+            return None
+        return representation_etag(request, '{}-{}'.format(kwargs.get(self.lookup_field, None), _version))
+
+    def last_modified(self, request, *args, **kwargs):
+        return self.state(request, **kwargs)['updated_at']
+
+
+# Strong ETag of a response: data version plus what selects the representation (query string and Accept header)
+def representation_etag(request, version):
+    _representation = '{}|{}'.format(request.META.get('QUERY_STRING', ''), request.META.get('HTTP_ACCEPT', ''))
+    return '{}-{}'.format(version, hashlib.md5(_representation.encode('utf-8')).hexdigest()[:16])
+
+
+dataset_version = DatasetVersion()
+record_version = RecordVersion()
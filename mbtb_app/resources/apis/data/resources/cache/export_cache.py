@@ -0,0 +1,191 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+from django.conf import settings
+from django.core.cache import cache
+
+
+# This class keeps rendered download_data exports on disk, file name is a hash of everything that changes the result
+# Files are written under a temporary name and renamed, so gunicorn workers never read a half written export.
+# Total size is bounded by `max_bytes`, least recently used files (by mtime, touched on every hit) are removed first.
+# Hit / miss counters are kept in Django cache, shared by workers when the cache backend is shared.
+class ExportCache(object):
+    counters = ['hits', 'misses', 'writes', 'evictions']
+    name_pattern = re.compile(r'^([0-9a-f]{2})/(\1[0-9a-f]{62})\.([a-z0-9]+)$')
+
+    def __init__(self, **kwargs):
+        self.directory = kwargs.get('directory', 'exports')
+        self.max_bytes = kwargs.get('max_bytes', 2 * 1024 ** 3)
+        self.enabled = kwargs.get('enabled', True)
+
+    # Hash of data version, download mode, code list without repeats (rows follow its order) or query,
+    # format and selected fields
+    def key(self, **kwargs):
+        _mbtb_codes = kwargs.get('mbtb_codes', None)
+        _key = json.dumps({
+            'data_version': kwargs.get('data_version', None),
+            'download_mode': kwargs.get('download_mode', None),
+            'download_format': kwargs.get('download_format', None),
+            'mbtb_codes': list(dict.fromkeys(_mbtb_codes)) if _mbtb_codes is not None else None,
+            'query': kwargs.get('query', None),
+            'fields': kwargs.get('fields', None)
+        }, sort_keys=True)
+        return hashlib.sha256(_key.encode('utf-8')).hexdigest()
+
+    def path(self, key, extension):
+        return os.path.join(self.directory, key[:2], '{}.{}'.format(key, extension))
+
+    # Name of a cached export relative to `directory`, e.g. 'ab/ab12..ef.csv', used in signed export urls
+    def name(self, path):
+        return os.path.relpath(path, self.directory).replace(os.sep, '/')
+
+    # (key, extension) of a valid name, None for anything else, e.g. '../' in the name
+    def split(self, name):
+        _match = self.name_pattern.match(name)
+        if _match is None:
+            return None
+        return _match.group(2), _match.group(3)
+
+    # Path of cached export or None, a hit marks the file as recently used
+    def get(self, key, extension):
+        _path = self.path(key, extension)
+        try:
+            os.utime(_path)
+        except FileNotFoundError:
+            self.count('misses')
+            return None
+
+        self.count('hits')
+        return _path
+
+    # Write export with `write(file_obj)` and return its path
+    def put(self, key, extension, write):
+        _path = self.path(key, extension)
+        _file_obj = self.open_temporary(_path)
+        try:
+            with _file_obj:
+                write(_file_obj)
+            os.replace(_file_obj.name, _path)
+        finally:
+            if os.path.exists(_file_obj.name):
+                os.remove(_file_obj.name)
+
+        self.count('writes')
+        self.evict()
+        return _path
+
+    # Pass encoded contents through while writing them to cache; the file is kept only if all contents were read,
+    # e.g. a client disconnecting in the middle leaves no file behind
+    def tee(self, key, extension, contents):
+        _path = self.path(key, extension)
+        _file_obj = self.open_temporary(_path)
+        try:
+            with _file_obj:
+                for content in contents:
+                    _file_obj.write(content)
+                    yield content
+            os.replace(_file_obj.name, _path)
+        finally:
+            if os.path.exists(_file_obj.name):
+                os.remove(_file_obj.name)
+
+        self.count('writes')
+        self.evict()
+
+    def open_temporary(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return tempfile.NamedTemporaryFile(dir=os.path.dirname(path), suffix='.tmp', delete=False)
+
+    # Response from cached file, or encoded from chunks and written to cache on the way out
+    def response(self, key, encoder, chunks):
+        if not self.enabled:
+            return encoder.response(chunks)
+
+        _path = self.get(key, encoder.extension)
+        if _path is not None:
+            try:
+                _file_obj = open(_path, 'rb')
+                chunks.close()
+                return encoder.file_response(_file_obj)
+            except FileNotFoundError:
+                pass  # evicted by another worker after the lookup
+
+        if encoder.streaming:
+            return encoder.content_response(self.tee(key, encoder.extension, encoder.run(chunks)))
+
+        _path = self.put(key, encoder.extension, lambda file_obj: encoder.write(chunks, file_obj))
+        return encoder.file_response(open(_path, 'rb'))
+
+    # Path of export written from chunks, or of the cached one
+    def file(self, key, encoder, chunks):
+        _path = self.get(key, encoder.extension)
+        if _path is not None:
+            chunks.close()
+            return _path
+
+        return self.put(key, encoder.extension, lambda file_obj: encoder.write(chunks, file_obj))
+
+    # Remove least recently used exports until total size is within `max_bytes`
+    def evict(self):
+        _files = []
+        for directory, sub_directories, file_names in os.walk(self.directory):
+            for file_name in file_names:
+                if file_name.endswith('.tmp'):
+                    continue
+                try:
+                    _stat = os.stat(os.path.join(directory, file_name))
+                except FileNotFoundError:
+                    continue
+                _files.append((_stat.st_mtime, _stat.st_size, os.path.join(directory, file_name)))
+
+        _total = sum(size for mtime, size, path in _files)
+        for mtime, size, path in sorted(_files):
+            if _total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                self.count('evictions')
+            except FileNotFoundError:
+                pass
+            _total -= size
+
+    def count(self, name):
+        try:
+            cache.incr('export_cache:' + name)
+        except ValueError:
+            cache.add('export_cache:' + name, 0)
+            cache.incr('export_cache:' + name)
+
+    def usage(self):
+        _files, _bytes = 0, 0
+        for directory, sub_directories, file_names in os.walk(self.directory):
+            for file_name in file_names:
+                if file_name.endswith('.tmp'):
+                    continue
+                try:
+                    _bytes += os.path.getsize(os.path.join(directory, file_name))
+                    _files += 1
+                except FileNotFoundError:
+                    pass
+        return {'files': _files, 'bytes': _bytes}
+
+    def stats(self):
+        _stats = {name: cache.get('export_cache:' + name, 0) for name in self.counters}
+        _lookups = _stats['hits'] + _stats['misses']
+        _stats['hit_ratio'] = round(_stats['hits'] / _lookups, 3) if _lookups else None
+        _stats.update(self.usage())
+        _stats['max_bytes'] = self.max_bytes
+        return _stats
+
+    def reset_counters(self):
+        for name in self.counters:
+            cache.delete('export_cache:' + name)
+
+
+_config = getattr(settings, 'EXPORT_CACHE', {})
+export_cache = ExportCache(
+    directory=_config.get('DIRECTORY', 'exports'), max_bytes=_config.get('MAX_BYTES', 2 * 1024 ** 3),
+    enabled=_config.get('ENABLED', True)
+)
@@ -0,0 +1,70 @@
+import threading
+import time
+from django.conf import settings
+from django.db.models import Max
+from mbtb.models import AuthRevocation
+from .principal_cache import principal_cache
+from .revocation_set import revocation_set
+
+
+# This class polls the append-only `auth_revocations` table written by users api with an increasing cursor
+# Only principals present in new changes are evicted, so cached authorization can use a long ttl
+# change_id is AUTO_INCREMENT, a transaction can commit a lower id after a higher one was read, so every poll
+# reads again the last `lookback` ids before the cursor and applies changes not seen yet
+class RevocationFeed(object):
+
+    def __init__(self, **kwargs):
+        self.poll_interval = kwargs.get('poll_interval', 5)
+        self.batch_size = kwargs.get('batch_size', 500)
+        self.lookback = kwargs.get('lookback', 100)
+        self.cursor = None
+        self._seen = set()
+        self._polled_at = None
+        self._lock = threading.Lock()
+
+    def poll_if_due(self):
+        if self._polled_at is not None and time.monotonic() - self._polled_at < self.poll_interval:
+            return
+
+        # one thread polls for the worker, others continue with current state
+        if self._lock.acquire(blocking=False):
+            try:
+                self.poll()
+            finally:
+                self._lock.release()
+
+    # One indexed range query on change_id per interval, applying changes in order
+    def poll(self):
+        # start from the latest change, state before it is loaded by full refresh of revocation set
+        if self.cursor is None:
+            self.cursor = AuthRevocation.objects.aggregate(cursor=Max('change_id'))['cursor'] or 0
+            self._seen = set()
+
+        _last = max(self.cursor - self.lookback, 0)
+        while True:
+            _changes = list(AuthRevocation.objects.filter(change_id__gt=_last).order_by('change_id').values(
+                'change_id', 'principal_id', 'role', 'suspend', 'token_version'
+            )[:self.batch_size])
+
+            for change in _changes:
+                _last = change['change_id']
+                if change['change_id'] in self._seen:
+                    continue
+                principal_cache.evict(id=change['principal_id'], role=change['role'])
+                revocation_set.apply(**change)
+                self._seen.add(change['change_id'])
+                self.cursor = max(self.cursor, change['change_id'])
+
+            if len(_changes) < self.batch_size:
+                break
+
+        # ids below the window are not read again
+        self._seen = set(change_id for change_id in self._seen if change_id > self.cursor - self.lookback)
+        self._polled_at = time.monotonic()
+
+
+_config = getattr(settings, 'REVOCATION_FEED', {})
+revocation_feed = RevocationFeed(
+    poll_interval=_config.get('POLL_INTERVAL', 5), batch_size=_config.get('BATCH_SIZE', 500),
+    lookback=_config.get('LOOKBACK', 100)
+)
@@ -0,0 +1,124 @@
+import bisect
+import threading
+import time
+from array import array
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+from mbtb.models import AdminAccount, AuthRevocation, UserAccount
+
+
+# This class keeps a compact revocation set for role-bearing tokens, refreshed periodically from the database
+# Suspended user ids and (id, token_version) of principals whose version was bumped are kept as sorted arrays
+# Deleted principals are only left in `auth_revocations`, so changes younger than a token are loaded as well
+class RevocationSet(object):
+
+    def __init__(self, **kwargs):
+        self.enabled = kwargs.get('enabled', True)
+        self.refresh_interval = kwargs.get('refresh_interval', 60)
+        self.token_ttl = kwargs.get('token_ttl', 24 * 60 * 60)
+        self.models = {
+            'User': UserAccount,
+            'Admin': AdminAccount
+        }
+        self._suspended = array('L')
+        self._versions = dict((role, (array('L'), array('L'))) for role in self.models)
+        self._refreshed_at = None
+        self._lock = threading.Lock()
+
+    # Return true if token claims belong to a suspended user or carry an outdated token version
+    def is_revoked(self, **kwargs):
+        if not self.enabled:
+            return False
+
+        self.refresh_if_stale()
+        _id = kwargs.get('id', None)
+        _role = kwargs.get('role', None)
+        if _role == 'User' and self._find(self._suspended, _id) is not None:
+            return True
+
+        _ids, _versions = self._versions[_role]
+        _index = self._find(_ids, _id)
+        return _index is not None and kwargs.get('ver', 0) < _versions[_index]
+
+    def refresh_if_stale(self):
+        if self._refreshed_at is not None and time.monotonic() - self._refreshed_at < self.refresh_interval:
+            return
+
+        # Only one thread refreshes, others keep answering from current arrays unless nothing is loaded yet
+        if self._lock.acquire(blocking=self._refreshed_at is None):
+            try:
+                if self._refreshed_at is None or time.monotonic() - self._refreshed_at >= self.refresh_interval:
+                    self.refresh()
+            finally:
+                self._lock.release()
+
+    def refresh(self):
+        _suspended = set(UserAccount.objects.filter(suspend='Y').values_list('id', flat=True))
+        _versions = dict((role, dict(model.objects.filter(token_version__gt=0).values_list('id', 'token_version')))
+                         for role, model in self.models.items())
+
+        # latest change per principal of tokens still valid, e.g. a deleted user is no longer in users table
+        for (principal_id, role), (suspend, token_version) in self.recent_changes().items():
+            if role == 'User' and suspend == 'Y':
+                _suspended.add(principal_id)
+            if token_version > _versions[role].get(principal_id, 0):
+                _versions[role][principal_id] = token_version
+
+        for role, versions in _versions.items():
+            _ids = sorted(versions)
+            _versions[role] = (array('L', _ids), array('L', [versions[principal_id] for principal_id in _ids]))
+
+        self._suspended, self._versions = array('L', sorted(_suspended)), _versions
+        self._refreshed_at = time.monotonic()
+
+    # {(principal_id, role): (suspend, token_version)} of latest feed changes made within token lifetime
+    def recent_changes(self):
+        _changes = {}
+        for principal_id, role, suspend, token_version in AuthRevocation.objects.filter(
+            created_at__gte=timezone.now() - timedelta(seconds=self.token_ttl), role__in=self.models
+        ).order_by('change_id').values_list('principal_id', 'role', 'suspend', 'token_version'):
+            _changes[(principal_id, role)] = (suspend, token_version)
+        return _changes
+
+    # Apply a single change from the revocation feed without reloading the whole set
+    def apply(self, **kwargs):
+        _id = kwargs.get('principal_id', None)
+        _role = kwargs.get('role', None)
+        with self._lock:
+            _suspended = array('L', self._suspended)
+            if _role == 'User':
+                self._remove(_suspended, _id)
+                if kwargs.get('suspend', None) == 'Y':
+                    bisect.insort(_suspended, _id)
+
+            _ids, _versions = array('L', self._versions[_role][0]), array('L', self._versions[_role][1])
+            _index = self._find(_ids, _id)
+            if _index is not None:
+                _versions[_index] = max(_versions[_index], kwargs.get('token_version', 0))
+            elif kwargs.get('token_version', 0) > 0:
+                _index = bisect.bisect_left(_ids, _id)
+                _ids.insert(_index, _id)
+                _versions.insert(_index, kwargs.get('token_version', 0))
+
+            _all_versions = dict(self._versions)
+            _all_versions[_role] = (_ids, _versions)
+            self._suspended, self._versions = _suspended, _all_versions
+
+    def _remove(self, ids, _id):
+        _index = self._find(ids, _id)
+        if _index is not None:
+            del ids[_index]
+
+    def _find(self, ids, _id):
+        _index = bisect.bisect_left(ids, _id)
+        if _index < len(ids) and ids[_index] == _id:
+            return _index
+        return None
+
+
+_config = getattr(settings, 'REVOCATION_SET', {})
+revocation_set = RevocationSet(
+    enabled=_config.get('ENABLED', True), refresh_interval=_config.get('REFRESH', 60),
+    token_ttl=_config.get('TOKEN_TTL', 24 * 60 * 60)
+)
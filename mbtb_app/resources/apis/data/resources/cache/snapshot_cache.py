@@ -0,0 +1,118 @@
+import gzip
+import threading
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from rest_framework.settings import api_settings
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# This class keeps full-dataset responses rendered to bytes once per data version, in identity, gzip and brotli
+# Requests are answered with the variant matching Accept-Encoding, without query or serialization
+class SnapshotCache(object):
+
+    def __init__(self, **kwargs):
+        self.gzip_level = kwargs.get('gzip_level', 6)
+        self.brotli_quality = kwargs.get('brotli_quality', 5)
+        self.background = kwargs.get('background', True)
+        self.builders = {}
+        self._snapshots = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    # `build` returns data of the response, e.g. list of dict, it is called again when data version changes
+    def register(self, name, build):
+        self.builders[name] = build
+        self._locks[name] = threading.Lock()
+
+    # Return snapshot of given data version, only one thread builds a missing snapshot
+    def get(self, name, version):
+        _snapshot = self._snapshots.get(name, None)
+        if _snapshot is not None and _snapshot['version'] == version:
+            return _snapshot
+
+        with self._locks[name]:
+            _snapshot = self._snapshots.get(name, None)
+            if _snapshot is None or _snapshot['version'] != version:
+                _snapshot = self.build(name, version)
+                self._snapshots[name] = _snapshot
+        return _snapshot
+
+    def build(self, name, version):
+        _data = self.builders[name]()
+        _content = api_settings.DEFAULT_RENDERER_CLASSES[0]().render(_data)
+        _variants = {'identity': _content, 'gzip': gzip.compress(_content, compresslevel=self.gzip_level)}
+        if brotli is not None:
+            _variants['br'] = brotli.compress(_content, quality=self.brotli_quality)
+
+        return {'version': version, 'count': len(_data), 'variants': _variants}
+
+    def response(self, request, snapshot, status=200):
+        _encoding = self.select_encoding(request, snapshot['variants'])
+        _response = HttpResponse(snapshot['variants'][_encoding], status=status, content_type='application/json')
+        if _encoding != 'identity':
+            _response['Content-Encoding'] = _encoding
+        patch_vary_headers(_response, ['Accept-Encoding'])
+        return _response
+
+    # Pick brotli, then gzip, when client accepts them (q=0 excludes an encoding)
+    def select_encoding(self, request, variants):
+        _accepted = {}
+        for elem in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+            _params = elem.strip().split(';')
+            _quality = 1.0
+            for param in _params[1:]:
+                if param.strip().startswith('q='):
+                    try:
+                        _quality = float(param.strip()[2:])
+                    except ValueError:
+                        _quality = 0.0
+            _accepted[_params[0].strip().lower()] = _quality
+
+        for encoding in ['br', 'gzip']:
+            if encoding in variants and _accepted.get(encoding, _accepted.get('*', 0)) > 0:
+                return encoding
+        return 'identity'
+
+    # Rebuild snapshots that this worker holds for a new data version, in a background thread after a write
+    def refresh(self, version):
+        _names = [name for name in self._snapshots if self._snapshots[name]['version'] != version]
+        if not _names:
+            return
+
+        if not self.background:
+            for name in _names:
+                self.get(name, version)
+            return
+
+        threading.Thread(target=self._refresh, args=(_names, version), daemon=True).start()
+
+    def _refresh(self, names, version):
+        try:
+            for name in names:
+                self.get(name, version)
+        finally:
+            connection.close()
+
+    def clear(self):
+        with self._lock:
+            self._snapshots.clear()
+
+    def stats(self):
+        return {
+            name: {'version': snapshot['version'], 'count': snapshot['count'],
+                   'size': {encoding: len(content) for encoding, content in snapshot['variants'].items()}}
+            for name, snapshot in self._snapshots.items()
+        }
+
+
+_config = getattr(settings, 'SNAPSHOT_CACHE', {})
+snapshot_cache = SnapshotCache(
+    gzip_level=_config.get('GZIP_LEVEL', 6), brotli_quality=_config.get('BROTLI_QUALITY', 5),
+    background=_config.get('BACKGROUND_REBUILD', True)
+)
@@ -0,0 +1,87 @@
+import time
+from django.db import transaction
+from mbtb.models import PrimeDetails, OtherDetails
+from resources.db_operations.bulk_ingest import BulkIngest
+from resources.db_operations.catalog_sync import CatalogSync
+
+
+# This class is to apply rows of an edit csv file (list of dict) to prime_details, other_details of their mbtb_code.
+# Cases are read with one query per table and batch of codes, whole file is validated before the first update,
+# then only changed columns of changed rows are written with bulk_update, rows grouped by their changed columns.
+# Unknown codes don't stop the upload, they are returned as `missing` next to `updated` and `unchanged` codes.
+class BulkEdit(BulkIngest):
+
+    def run(self, **kwargs):
+        _csv_file = kwargs.get('csv_file', [])
+        _started = time.perf_counter()
+
+        with transaction.atomic():
+            _instances = self.instances([row['mbtb_code'] for row in _csv_file])
+            _found_rows = [row for row in _csv_file if row['mbtb_code'] in _instances]
+            _response = self.validate(csv_file=_found_rows)
+            if not _response['response']:
+                # lookup names added while validating are removed again
+                transaction.set_rollback(True)
+                return _response
+
+            _changed = self.apply(_instances, [row['mbtb_code'] for row in _found_rows], _response['data'])
+
+        _seconds = time.perf_counter() - _started
+        _missing = [row['mbtb_code'] for row in _csv_file if row['mbtb_code'] not in _instances]
+        return {'response': True, 'data': {
+            'updated': [code for code, changed in _changed.items() if changed],
+            'unchanged': [code for code, changed in _changed.items() if not changed],
+            'missing': list(dict.fromkeys(_missing)),
+            'rows': len(_csv_file), 'seconds': round(_seconds, 3),
+            'rows_per_second': round(len(_csv_file) / _seconds) if _seconds else None
+        }}
+
+    # {mbtb_code: (prime_details, other_details)} of given codes found in both tables
+    def instances(self, mbtb_codes):
+        _instances = {}
+        for start in range(0, len(mbtb_codes), self.batch_size):
+            _prime_details = PrimeDetails.objects.in_bulk(
+                mbtb_codes[start:start + self.batch_size], field_name='mbtb_code'
+            )
+            _other_details = {
+                elem.prime_details_id_id: elem for elem in OtherDetails.objects.filter(
+                    prime_details_id__in=[prime_details.pk for prime_details in _prime_details.values()]
+                )
+            }
+            for code, prime_details in _prime_details.items():
+                if prime_details.pk in _other_details:
+                    _instances[code] = (prime_details, _other_details[prime_details.pk])
+        return _instances
+
+    # Set validated values on instances, write changed columns and catalog rows of changed cases.
+    # Return {mbtb_code: True if anything changed}, in order of the file
+    def apply(self, instances, mbtb_codes, rows):
+        _groups = {}  # (model, changed columns): instances
+        _changed = {}
+        for code, (prime_details_data, other_details_data) in zip(mbtb_codes, rows):
+            _changed.setdefault(code, False)
+            for instance, data in zip(instances[code], (prime_details_data, other_details_data)):
+                _fields = self.changed_fields(instance, data)
+                if _fields:
+                    _groups.setdefault((type(instance), tuple(sorted(_fields))), {})[instance.pk] = instance
+                    _changed[code] = True
+
+        for (model, fields), group in _groups.items():
+            model.objects.bulk_update(list(group.values()), fields=list(fields), batch_size=self.batch_size)
+
+        _prime_details_ids = [instances[code][0].pk for code, changed in _changed.items() if changed]
+        for start in range(0, len(_prime_details_ids), self.batch_size):
+            CatalogSync().update(prime_details_ids=_prime_details_ids[start:start + self.batch_size])
+        return _changed
+
+    # Names of fields whose validated value differs from the instance, after setting them on the instance.
+    # An empty cell equals a null column, csv has no other way to write null text.
+    def changed_fields(self, instance, data):
+        _fields = set()
+        for name, value in data.items():
+            _current = getattr(instance, name)
+            if _current == value or (value == '' and _current is None):
+                continue
+            setattr(instance, name, value)
+            _fields.add(name)
+        return _fields
@@ -0,0 +1,156 @@
+import time
+from django.conf import settings
+from django.db import transaction
+from mbtb.models import PrimeDetails, OtherDetails
+from mbtb.serializers import BulkPrimeDetailsSerializer, BulkOtherDetailsSerializer
+from resources.data_templates.other_details import OtherDetailsTemplate
+from resources.data_templates.prime_details import PrimeDetailsTemplate
+from resources.db_operations.catalog_sync import CatalogSync
+from resources.db_operations.get_or_create import GetOrCreate
+from resources.validations.validate_data import ValidateData
+
+
+# This class is to add rows of an uploaded csv file (list of dict) to prime_details, other_details and catalog.
+# Whole file is validated before the first insert, rows are then inserted with bulk_create in batches of
+# FILE_UPLOAD['BATCH_SIZE'], all in one transaction: a file is uploaded completely or not at all.
+# Lookup names (tissue type, neuropathology diagnosis, autopsy type) are resolved once per file, not per row.
+class BulkIngest(object):
+    lookups = {
+        'tissue_type': ('TissueTypes', 'tissue_type'),
+        'neuropathology_diagnosis': ('NeuropathologicalDiagnosis', 'neuro_diagnosis_name'),
+        'autopsy_type': ('AutopsyTypes', 'autopsy_type')
+    }
+
+    def __init__(self, **kwargs):
+        self.batch_size = kwargs.get('batch_size', None) or settings.FILE_UPLOAD.get('BATCH_SIZE', 500)
+
+    def run(self, **kwargs):
+        _csv_file = kwargs.get('csv_file', [])
+        _started = time.perf_counter()
+
+        with transaction.atomic():
+            _response = self.validate(
+                csv_file=_csv_file, existing_codes=self.existing_codes([row['mbtb_code'] for row in _csv_file])
+            )
+            if not _response['response']:
+                # lookup names added while validating are removed again
+                transaction.set_rollback(True)
+                return _response
+
+            for start in range(0, len(_response['data']), self.batch_size):
+                self.insert(_response['data'][start:start + self.batch_size])
+
+        _seconds = time.perf_counter() - _started
+        return {'response': True, 'data': {
+            'rows': len(_csv_file), 'seconds': round(_seconds, 3),
+            'rows_per_second': round(len(_csv_file) / _seconds) if _seconds else None
+        }}
+
+    # Return (prime_details, other_details) validated data of every row, or error response of first invalid row
+    # Rows are validated with one list serializer per table, so serializer fields are built once per file.
+    # With `existing_codes` (a set), mbtb_code must not be in it nor repeated in the file.
+    def validate(self, **kwargs):
+        _csv_file = kwargs.get('csv_file', [])
+        _existing_codes = kwargs.get('existing_codes', None)
+        validate_data = ValidateData()
+        _lookup_ids = {
+            column: self.lookup_ids(model_name, field_name, [row[column] for row in _csv_file])
+            for column, (model_name, field_name) in self.lookups.items()
+        }
+
+        _prime_details, _numbers, _other_details = [], [], []
+        for row in _csv_file:
+            _prime_details.append(PrimeDetailsTemplate(
+                mbtb_code=row['mbtb_code'], sex=row['sex'], age=row['age'],
+                postmortem_interval=row['postmortem_interval'], time_in_fix=row['time_in_fix'],
+                clinical_diagnosis=row['clinical_diagnosis'],
+                tissue_type=_lookup_ids['tissue_type'][row['tissue_type']],
+                preservation_method=validate_data.check_preservation_method(
+                    formalin_fixed=row['formalin_fixed'], fresh_frozen=row['fresh_frozen']
+                ),
+                neuro_diagnosis_id=_lookup_ids['neuropathology_diagnosis'][row['neuropathology_diagnosis']],
+                storage_year=row['storage_year']
+            ).__dict__)
+
+            _duration = validate_data.check_is_number(value=row['duration'])
+            _brain_weight = validate_data.check_is_number(value=row['brain_weight'])
+            _numbers.append(_duration['Response'] and _brain_weight['Response'])
+
+            _other_details.append(OtherDetailsTemplate(
+                race=row['race'], duration=_duration.get('Value', None), clinical_details=row['clinical_details'],
+                cause_of_death=row['cause_of_death'], brain_weight=_brain_weight.get('Value', None),
+                neuropathology_summary=row['neuropathology_summary'],
+                neuropathology_gross=row['neuropathology_gross'],
+                neuropathology_microscopic=row['neuropathology_microscopic'], cerad=row['cerad'],
+                braak_stage=row['braak_stage'], khachaturian=row['khachaturian'], abc=row['abc'],
+                autopsy_type=_lookup_ids['autopsy_type'][row['autopsy_type']], formalin_fixed=row['formalin_fixed'],
+                fresh_frozen=row['fresh_frozen']
+            ).__dict__)
+
+        prime_details_serializer = BulkPrimeDetailsSerializer(data=_prime_details, many=True)
+        other_details_serializer = BulkOtherDetailsSerializer(data=_other_details, many=True)
+        _prime_details_errors = [] if prime_details_serializer.is_valid() else prime_details_serializer.errors
+        _other_details_errors = [] if other_details_serializer.is_valid() else other_details_serializer.errors
+
+        # checks of a row are reported in the same order as they were made row by row
+        for index, row in enumerate(_csv_file):
+            if _prime_details_errors and _prime_details_errors[index]:
+                return self.error('prime details', row, _prime_details_errors[index])
+
+            # mbtb_code is unique, in database and within the file
+            if _existing_codes is not None and row['mbtb_code'] in _existing_codes:
+                return self.error('prime details', row, {
+                    'mbtb_code': ['prime details with this mbtb code already exists.']
+                })
+            elif _existing_codes is not None:
+                _existing_codes.add(row['mbtb_code'])
+
+            if not _numbers[index]:
+                return {'response': False, 'data': {
+                    'Error': 'Expecting value, received text for duration and/or brain_weight at mbtb_code: {}.'
+                    .format(row['mbtb_code'])
+                }}
+
+            if _other_details_errors and _other_details_errors[index]:
+                return self.error('other details', row, _other_details_errors[index])
+
+        return {
+            'response': True,
+            'data': list(zip(prime_details_serializer.validated_data, other_details_serializer.validated_data))
+        }
+
+    # Insert a batch of validated rows: prime_details, their ids read back by mbtb_code, other_details, catalog
+    def insert(self, rows):
+        PrimeDetails.objects.bulk_create([PrimeDetails(**prime_details) for prime_details, _ in rows])
+        _ids = dict(PrimeDetails.objects.filter(
+            mbtb_code__in=[prime_details['mbtb_code'] for prime_details, _ in rows]
+        ).values_list('mbtb_code', 'prime_details_id'))
+
+        OtherDetails.objects.bulk_create([
+            OtherDetails(prime_details_id_id=_ids[prime_details['mbtb_code']], **other_details)
+            for prime_details, other_details in rows
+        ])
+        CatalogSync().insert(prime_details_ids=list(_ids.values()))
+
+    # {name: id} of a lookup table for given names, names not in the table are added with GetOrCreate
+    def lookup_ids(self, model_name, field_name, names):
+        _model = GetOrCreate(model_name=model_name).models[model_name]
+        _ids = dict(_model.objects.filter(**{field_name + '__in': set(names)}).values_list(field_name, 'pk'))
+        for name in set(names) - set(_ids):
+            _ids[name] = GetOrCreate(model_name=model_name).run(**{field_name: name}).pk
+        return _ids
+
+    def existing_codes(self, mbtb_codes):
+        _existing_codes = set()
+        for start in range(0, len(mbtb_codes), self.batch_size):
+            _existing_codes.update(PrimeDetails.objects.filter(
+                mbtb_code__in=mbtb_codes[start:start + self.batch_size]
+            ).values_list('mbtb_code', flat=True))
+        return _existing_codes
+
+    def error(self, table, row, errors):
+        return {'response': False, 'data': {
+            'Response': 'Failure',
+            'Message': 'Error in {}, Data uploading failed at mbtb_code: {}'.format(table, row['mbtb_code']),
+            'Error': errors
+        }}
@@ -0,0 +1,70 @@
+from datetime import datetime
+from django.db.models import F
+from mbtb.models import OtherDetails, Catalog
+from mbtb.serializers import OtherDetailsSerializer
+
+
+# This class rewrites `catalog` rows of given prime_details_id values from prime_details, other_details and lookups
+# Called by write views inside their transaction; rows without other_details (e.g. deleted) are removed
+class CatalogSync(object):
+
+    def __init__(self):
+        self.related = ['prime_details_id__neuro_diagnosis_id', 'prime_details_id__tissue_type', 'autopsy_type']
+
+    def run(self, **kwargs):
+        _prime_details_ids = set(kwargs.get('prime_details_ids', []))
+        _other_details = OtherDetails.objects.filter(prime_details_id__in=_prime_details_ids) \
+            .select_related(*self.related)
+
+        _synced = self.save(other_details=_other_details)
+        Catalog.objects.filter(prime_details_id__in=_prime_details_ids - _synced).delete()
+        return {'response': True, 'synced': len(_synced)}
+
+    # Rebuild whole catalog, e.g. after loading data with sql outside of api
+    def rebuild(self):
+        _synced = self.save(other_details=OtherDetails.objects.select_related(*self.related).iterator())
+        Catalog.objects.exclude(prime_details_id__in=_synced).delete()
+        return {'response': True, 'synced': len(_synced)}
+
+    # Add catalog rows of newly inserted prime_details_id values with one bulk insert, e.g. after csv upload
+    def insert(self, **kwargs):
+        _other_details = OtherDetails.objects.filter(prime_details_id__in=kwargs.get('prime_details_ids', [])) \
+            .select_related(*self.related)
+        _created = Catalog.objects.bulk_create([
+            Catalog(version=1, **row) for row in OtherDetailsSerializer(_other_details, many=True).data
+        ])
+        return {'response': True, 'synced': len(_created)}
+
+    # Rewrite catalog rows of given prime_details_id values in bulk, e.g. after csv edit: rows are deleted and
+    # inserted again with incremented version, far cheaper than a bulk_update of every catalog column
+    def update(self, **kwargs):
+        _prime_details_ids = list(kwargs.get('prime_details_ids', []))
+        _versions = dict(Catalog.objects.filter(prime_details_id__in=_prime_details_ids)
+                         .values_list('prime_details_id', 'version'))
+        _rows = OtherDetailsSerializer(
+            OtherDetails.objects.filter(prime_details_id__in=_prime_details_ids).select_related(*self.related),
+            many=True
+        ).data
+
+        _updated_at = datetime.now()
+        Catalog.objects.filter(prime_details_id__in=_prime_details_ids).delete()
+        _created = Catalog.objects.bulk_create([
+            Catalog(version=_versions.get(row['prime_details_id'], 0) + 1, updated_at=_updated_at, **row)
+            for row in _rows
+        ])
+        return {'response': True, 'synced': len(_created)}
+
+    # Save catalog row per other_details row, row is serialized with OtherDetailsSerializer to keep the same shape
+    # Record version is incremented on every save, it is used for ETag of single case responses
+    def save(self, **kwargs):
+        _synced = set()
+        for elem in kwargs.get('other_details', []):
+            _row = OtherDetailsSerializer(elem).data
+            _updated = Catalog.objects.filter(prime_details_id=_row['prime_details_id']).update(
+                version=F('version') + 1, updated_at=datetime.now(), **_row
+            )
+            if not _updated:
+                Catalog.objects.create(version=1, **_row)
+            _synced.add(elem.prime_details_id_id)
+
+        return _synced
@@ -1,5 +1,8 @@
-from mbtb.models import OtherDetails
-from mbtb.serializers import OtherDetailsSerializer
+from django.conf import settings
+from mbtb.models import Catalog
+from mbtb.serializers import CatalogSerializer
+from resources.db_operations.projection import catalog_projection
+from resources.db_operations.sparse_fields import SparseFields
 
 
 # This class is to download all mbtb data without prime_details_id, other_details_id as a list of dict
@@ -8,19 +11,25 @@ class DownloadAllData(object):
     def __init__(self):
         pass
 
-    def run(self):
-        _other_details_response = OtherDetails.objects.all().select_related()
-        _serializer_response = OtherDetailsSerializer(_other_details_response, many=True)
+    def run(self, **kwargs):
+        _sparse_fields = kwargs.get('sparse_fields', None) or SparseFields(serializer_class=CatalogSerializer)
 
-        # Converting OrderedDict to list of list
-        _serializer_response = [dict(elem) for elem in _serializer_response.data]
+        # Selecting columns without primary keys, rows are mapped to dict in one pass
+        _names = [name for name in _sparse_fields.names() if name not in ['prime_details_id', 'other_details_id']]
+        _catalog_response = catalog_projection.run(names=_names)
 
-        if (len(_serializer_response) is 0):
+        if len(_catalog_response) == 0:
             return {'response': False}
 
-        # Removing primary keys from data
-        for elem in _serializer_response:
-            del elem['prime_details_id']
-            del elem['other_details_id']
+        return {'response': True, 'data': _catalog_response}
 
-        return {'response': True, 'data': _serializer_response}
+    # Same rows as `run`, returned as a generator of chunks (lists of dict) read one query at a time
+    def stream(self, **kwargs):
+        _sparse_fields = kwargs.get('sparse_fields', None) or SparseFields(serializer_class=CatalogSerializer)
+        _chunk_size = kwargs.get('chunk_size', None) or settings.DOWNLOAD_STREAM['CHUNK_SIZE']
+
+        if not Catalog.objects.exists():
+            return {'response': False}
+
+        _names = [name for name in _sparse_fields.names() if name not in ['prime_details_id', 'other_details_id']]
+        return {'response': True, 'data': catalog_projection.chunks(names=_names, chunk_size=_chunk_size)}
@@ -1,29 +1,61 @@
-from mbtb.models import OtherDetails
-from mbtb.serializers import OtherDetailsSerializer
+from django.conf import settings
+from mbtb.models import Catalog
+from mbtb.serializers import CatalogSerializer
+from resources.db_operations.projection import catalog_projection
+from resources.db_operations.sparse_fields import SparseFields
 
 
 # This class is download filtered mbtb data based on given mbtb_code as a list of dict.
 # It doesn't include prime_details_id, other_details_id.
+# Codes are read in batches of DOWNLOAD_STREAM['CODES_PER_QUERY'], so a long list never builds one huge `IN (...)`.
+# Repeated codes are returned once, rows follow the order of given codes.
 class DownloadFilteredData(object):
 
     def __init__(self):
-        pass
+        self.codes_per_query = settings.DOWNLOAD_STREAM.get('CODES_PER_QUERY', 1000)
 
     def run(self, **kwargs):
-        _mbtb_code_list = kwargs.get('input_mbtb_codes', None)
-        _other_details_response = OtherDetails.objects.filter(
-            prime_details_id__mbtb_code__in=_mbtb_code_list).select_related()
-        _serializer_response = OtherDetailsSerializer(_other_details_response, many=True)
-
-        # Converting OrderedDict to list of Dict
-        _serializer_response = [dict(elem) for elem in _serializer_response.data]
-
-        if (len(_serializer_response) is 0) or not(len(_serializer_response) == len(_mbtb_code_list)):
-            return {'response': False}
-
-        # Removing primary keys from data
-        for elem in _serializer_response:
-            del elem['prime_details_id']
-            del elem['other_details_id']
-
-        return {'response': True, 'data': _serializer_response}
+        _response = self.stream(**kwargs)
+        if not _response['response']:
+            return _response
+
+        return {'response': True, 'data': [row for chunk in _response['data'] for row in chunk]}
+
+    # Same rows as `run`, returned as a generator of chunks (lists of dict), one query per batch of codes.
+    # All codes are checked first, so missing codes are returned before any row is sent.
+    def stream(self, **kwargs):
+        _mbtb_code_list = list(dict.fromkeys(kwargs.get('input_mbtb_codes', None) or []))
+        _sparse_fields = kwargs.get('sparse_fields', None) or SparseFields(serializer_class=CatalogSerializer)
+
+        _missing_codes = self.missing_codes(_mbtb_code_list)
+        if not _mbtb_code_list or _missing_codes:
+            return {'response': False, 'missing_codes': _missing_codes}
+
+        _names = [name for name in _sparse_fields.names() if name not in ['prime_details_id', 'other_details_id']]
+        return {'response': True, 'data': self.chunks(_mbtb_code_list, _names)}
+
+    def batches(self, mbtb_code_list):
+        for start in range(0, len(mbtb_code_list), self.codes_per_query):
+            yield mbtb_code_list[start:start + self.codes_per_query]
+
+    # Given codes not present in catalog, in given order
+    def missing_codes(self, mbtb_code_list):
+        _missing_codes = []
+        for batch in self.batches(mbtb_code_list):
+            _found = set(Catalog.objects.filter(mbtb_code__in=batch).values_list('mbtb_code', flat=True))
+            _missing_codes.extend(code for code in batch if code not in _found)
+        return _missing_codes
+
+    def chunks(self, mbtb_code_list, names):
+        # mbtb_code is read to order rows, dropped again when it is not a selected field
+        _names = names if 'mbtb_code' in names else names + ['mbtb_code']
+        for batch in self.batches(mbtb_code_list):
+            _rows = {
+                row['mbtb_code']: row for row in catalog_projection.iterate(
+                    queryset=Catalog.objects.filter(mbtb_code__in=batch), names=_names
+                )
+            }
+            if _names is not names:
+                for row in _rows.values():
+                    del row['mbtb_code']
+            yield [_rows[code] for code in batch if code in _rows]
@@ -0,0 +1,56 @@
+from django.conf import settings
+from mbtb.filters import CatalogFilter
+from mbtb.models import Catalog
+from mbtb.serializers import CatalogSerializer
+from resources.db_operations.projection import catalog_projection
+from resources.db_operations.sparse_fields import SparseFields
+
+
+# This class is to download mbtb data matching filter criteria, e.g. {'tissue_type': 'Brain', 'age_min': 60}
+# Criteria use the names of CatalogFilter and compile to one WHERE on `catalog`, rows are streamed in chunks.
+# It doesn't include prime_details_id, other_details_id.
+class DownloadQueryData(object):
+
+    def __init__(self):
+        pass
+
+    # Validate criteria; unknown names are rejected instead of silently ignored
+    def validate(self, **kwargs):
+        _query = kwargs.get('query', None)
+        if not isinstance(_query, dict):
+            return {'response': False, 'errors': {'download_query': ['Expected an object of filter criteria.']}}
+
+        _unknown = [name for name in _query if name not in CatalogFilter.base_filters]
+        if _unknown:
+            return {'response': False, 'errors': {
+                'download_query': ['Invalid filter names: {}, allowed filters are: {}'.format(
+                    _unknown, list(CatalogFilter.base_filters))]
+            }}
+
+        # a filter takes one value, a list or object would otherwise match nothing and look like an empty cohort
+        _not_single = [name for name, value in _query.items() if isinstance(value, (list, dict))]
+        if _not_single:
+            return {'response': False, 'errors': {
+                'download_query': ['Expected a single value for filters: {}'.format(_not_single)]
+            }}
+
+        _filter_set = CatalogFilter(_query, queryset=Catalog.objects.all())
+        if not _filter_set.is_valid():
+            return {'response': False, 'errors': _filter_set.errors}
+
+        return {'response': True, 'data': _filter_set.qs}
+
+    # Generator of chunks (lists of dict) of matching cases, an empty cohort is an empty result
+    def stream(self, **kwargs):
+        _sparse_fields = kwargs.get('sparse_fields', None) or SparseFields(serializer_class=CatalogSerializer)
+        _chunk_size = kwargs.get('chunk_size', None) or settings.DOWNLOAD_STREAM['CHUNK_SIZE']
+
+        _response = self.validate(query=kwargs.get('query', None))
+        if not _response['response']:
+            return _response
+
+        _names = [name for name in _sparse_fields.names() if name not in ['prime_details_id', 'other_details_id']]
+        return {
+            'response': True,
+            'data': catalog_projection.chunks(queryset=_response['data'], names=_names, chunk_size=_chunk_size)
+        }
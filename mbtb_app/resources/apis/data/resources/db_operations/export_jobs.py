@@ -0,0 +1,137 @@
+import json
+import os
+import uuid
+from datetime import datetime
+from mbtb.models import Catalog, ExportJob
+from mbtb.serializers import CatalogSerializer
+from resources.cache.data_version import dataset_version
+from resources.cache.export_cache import export_cache
+from resources.db_operations.download_all_data import DownloadAllData
+from resources.db_operations.download_filtered_data import DownloadFilteredData
+from resources.db_operations.download_query_data import DownloadQueryData
+from resources.db_operations.sparse_fields import SparseFields
+from resources.renderers.hdf5_export import HDF5Export
+from resources.renderers.streaming_csv import StreamingCSV
+from resources.renderers.streaming_json import StreamingJSON
+from resources.validations.validate_data import ValidateData
+
+
+# Encoder of a valid `download_format`, used by download_data responses and by export jobs
+def build_encoder(download_format):
+    if download_format in StreamingJSON.content_types:
+        return StreamingJSON(format=download_format)
+    elif download_format in StreamingCSV.content_types:
+        return StreamingCSV(format=download_format, column_names=ValidateData.column_names)
+    return HDF5Export()
+
+
+# Encoder of an export file, looked up by file extension, None for unknown extension
+def file_encoder(name):
+    for download_format in list(StreamingJSON.content_types) + list(StreamingCSV.content_types) + ['hdf5']:
+        _encoder = build_encoder(download_format)
+        if name.endswith('.' + _encoder.extension):
+            return _encoder
+    return None
+
+
+# This class is to queue download_data exports and run them in `run_export_worker` management command.
+# Jobs are rows of `export_jobs`, a worker claims a queued job with a conditional UPDATE so two workers never
+# run the same job. Identical requests on the same data version reuse a queued, running or finished job.
+# Result files are written to export cache, see resources/cache/export_cache.py
+class ExportJobs(object):
+
+    def __init__(self):
+        pass
+
+    # Same hash as export cache key of the request
+    def request_key(self, **kwargs):
+        return export_cache.key(**kwargs)
+
+    # Return existing job for identical request or create a queued one
+    def enqueue(self, **kwargs):
+        _parameters = {
+            'download_mode': kwargs.get('download_mode', None),
+            'download_format': kwargs.get('download_format', None),
+            'mbtb_codes': kwargs.get('mbtb_codes', None),
+            'query': kwargs.get('query', None),
+            'fields': kwargs.get('fields', None)
+        }
+        _data_version = dataset_version.current()
+        _request_key = self.request_key(data_version=_data_version, **_parameters)
+
+        for job in ExportJob.objects.filter(request_key=_request_key, status__in=['queued', 'running', 'done']) \
+                .order_by('-created_at'):
+            if job.status != 'done' or (job.file_path and os.path.exists(job.file_path)):
+                return {'response': True, 'data': job, 'reused': True}
+
+        _job = ExportJob.objects.create(
+            job_id=uuid.uuid4().hex, request_key=_request_key, data_version=_data_version,
+            download_mode=_parameters['download_mode'], download_format=_parameters['download_format'],
+            parameters=json.dumps(_parameters), requested_by=kwargs.get('requested_by', None)
+        )
+        return {'response': True, 'data': _job, 'reused': False}
+
+    # Claim oldest queued job, None if queue is empty
+    def claim(self):
+        for job_id in ExportJob.objects.filter(status='queued').order_by('created_at').values_list('job_id', flat=True):
+            if ExportJob.objects.filter(job_id=job_id, status='queued').update(
+                    status='running', started_at=datetime.now()):
+                return ExportJob.objects.get(job_id=job_id)
+        return None
+
+    # Put jobs of a stopped worker back in the queue
+    def requeue_running(self):
+        return ExportJob.objects.filter(status='running').update(status='queued', rows_done=0, started_at=None)
+
+    # Write result file of a claimed job, rows_done is updated after every chunk
+    def run(self, job):
+        _parameters = json.loads(job.parameters)
+        _sparse_fields = SparseFields(serializer_class=CatalogSerializer, fields=_parameters['fields'])
+
+        if job.download_mode == 'filtered':
+            _rows_total = len(set(_parameters['mbtb_codes']))
+            _response = DownloadFilteredData().stream(
+                input_mbtb_codes=_parameters['mbtb_codes'], sparse_fields=_sparse_fields
+            )
+        elif job.download_mode == 'query':
+            _response = DownloadQueryData().validate(query=_parameters['query'])
+            _rows_total = _response['data'].count() if _response['response'] else 0
+            _response = DownloadQueryData().stream(query=_parameters['query'], sparse_fields=_sparse_fields)
+        else:
+            _rows_total = Catalog.objects.count()
+            _response = DownloadAllData().stream(sparse_fields=_sparse_fields)
+
+        if not _response['response'] and _response.get('missing_codes', None):
+            return self.finish(job, status='failed', error='Data not found for mbtb_code: {}'.format(
+                ', '.join(_response['missing_codes'])))
+        elif not _response['response']:
+            return self.finish(job, status='failed', error='Data not found for this request.')
+
+        ExportJob.objects.filter(job_id=job.job_id).update(rows_total=_rows_total)
+        _encoder = build_encoder(job.download_format)
+
+        # result file is kept in export cache under the data version it is read at, so later identical
+        # download_data requests are served from it as well
+        _key = export_cache.key(data_version=dataset_version.current(), **_parameters)
+        _file_path = export_cache.get(_key, _encoder.extension)
+        if _file_path is None:
+            try:
+                _file_path = export_cache.put(
+                    _key, _encoder.extension,
+                    lambda file_obj: _encoder.write(self.track_progress(job, _response['data']), file_obj)
+                )
+            except Exception as error:
+                return self.finish(job, status='failed', error=str(error))
+
+        return self.finish(job, status='done', file_path=_file_path)
+
+    def track_progress(self, job, chunks):
+        _rows_done = 0
+        for chunk in chunks:
+            yield chunk
+            _rows_done += len(chunk)
+            ExportJob.objects.filter(job_id=job.job_id).update(rows_done=_rows_done)
+
+    def finish(self, job, **kwargs):
+        ExportJob.objects.filter(job_id=job.job_id).update(finished_at=datetime.now(), **kwargs)
+        return {'response': kwargs.get('status', None) == 'done', 'data': ExportJob.objects.get(job_id=job.job_id)}
@@ -0,0 +1,48 @@
+from django.core.cache import cache
+from django.db.models import Count
+from django.utils.http import urlencode
+from mbtb.filters import PrimeDetailsFilter
+from mbtb.models import PrimeDetails
+from resources.cache.data_version import dataset_version
+
+
+# This class counts distinct values of brain_dataset dropdown columns with GROUP BY queries
+# Counts of each column are conditioned on the active filters of other columns, result is cached per data version
+class Facets(object):
+
+    def __init__(self, **kwargs):
+        self.timeout = kwargs.get('timeout', None)
+        self.fields = {
+            'clinical_diagnosis': 'clinical_diagnosis',
+            'neuropathology_diagnosis': 'neuro_diagnosis_id__neuro_diagnosis_name',
+            'tissue_type': 'tissue_type__tissue_type',
+            'preservation_method': 'preservation_method',
+            'sex': 'sex'
+        }
+
+    def run(self, **kwargs):
+        _params = kwargs.get('params', {})
+        _filters = {name: _params[name] for name in PrimeDetailsFilter.base_filters
+                    if name != 'ordering' and name in _params}
+
+        _filter_set = PrimeDetailsFilter(_filters, queryset=PrimeDetails.objects.all())
+        if not _filter_set.is_valid():
+            return {'response': False, 'errors': _filter_set.errors}
+
+        _cache_key = 'facets:{}:{}'.format(dataset_version.current(), urlencode(sorted(_filters.items())))
+        _facets = cache.get(_cache_key, None)
+        if _facets is None:
+            _facets = {name: self.count(name=name, filters=_filters) for name in self.fields}
+            cache.set(_cache_key, _facets, self.timeout)
+
+        return {'response': True, 'data': _facets}
+
+    # Count values of one column, its own filter is left out so other options stay visible in dropdown
+    def count(self, **kwargs):
+        _name = kwargs.get('name', None)
+        _filters = {key: value for key, value in kwargs.get('filters', {}).items() if key != _name}
+        _field = self.fields[_name]
+
+        _queryset = PrimeDetailsFilter(_filters, queryset=PrimeDetails.objects.all()).qs
+        _counts = _queryset.order_by().values_list(_field).annotate(count=Count('prime_details_id')).order_by(_field)
+        return [{'value': value, 'count': count} for value, count in _counts]
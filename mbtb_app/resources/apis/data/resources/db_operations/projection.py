@@ -0,0 +1,131 @@
+from mbtb.models import Catalog, PrimeDetails
+
+
+# Converters matching DRF representation of values returned by `values_list()`
+def to_string(value):
+    return str(value)
+
+
+def to_iso_datetime(value):
+    value = value.isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+# This class maps `values_list()` tuples to output dicts in one pass, without model instances or DRF serializers
+# `fields` is a list of (output name, queryset lookup, converter or None); converters are skipped for None values
+class Projection(object):
+
+    def __init__(self, **kwargs):
+        self.model = kwargs.get('model', None)
+        self.fields = kwargs.get('fields', [])
+
+    def names(self):
+        return [field[0] for field in self.fields]
+
+    def run(self, **kwargs):
+        return list(self.iterate(**kwargs))
+
+    # Yield output dicts, `names` keeps only given output fields, `chunk_size` streams rows via server-side cursor
+    def iterate(self, **kwargs):
+        _queryset = kwargs.get('queryset', None)
+        _fields = self.select(kwargs.get('names', None))
+        _chunk_size = kwargs.get('chunk_size', None)
+
+        if _queryset is None:
+            _queryset = self.model.objects.all()
+        _rows = _queryset.values_list(*[field[1] for field in _fields])
+        if _chunk_size is not None:
+            _rows = _rows.iterator(chunk_size=_chunk_size)
+
+        return self.map_rows(_rows, _fields)
+
+    # Yield lists of at most `chunk_size` output dicts, each list read by its own query ordered by primary key.
+    # MySQLdb buffers the whole result of `.iterator()` client side, keyset queries keep memory bound by chunk size.
+    def chunks(self, **kwargs):
+        _queryset = kwargs.get('queryset', None)
+        _fields = self.select(kwargs.get('names', None))
+        _chunk_size = kwargs.get('chunk_size', 2000)
+
+        if _queryset is None:
+            _queryset = self.model.objects.all()
+        _pk = self.model._meta.pk.attname
+        _queryset = _queryset.order_by(_pk)
+
+        _last_pk = None
+        while True:
+            _chunk_queryset = _queryset if _last_pk is None else _queryset.filter(**{_pk + '__gt': _last_pk})
+            _rows = list(_chunk_queryset.values_list(_pk, *[field[1] for field in _fields])[:_chunk_size])
+            if not _rows:
+                return
+
+            _last_pk = _rows[-1][0]
+            yield list(self.map_rows((row[1:] for row in _rows), _fields))
+            if len(_rows) < _chunk_size:
+                return
+
+    def select(self, names):
+        return [field for field in self.fields if names is None or field[0] in names]
+
+    @staticmethod
+    def map_rows(rows, fields):
+        _output_names = [field[0] for field in fields]
+        _converters = [(index, field[2]) for index, field in enumerate(fields) if field[2] is not None]
+
+        for row in rows:
+            if _converters:
+                row = list(row)
+                for index, converter in _converters:
+                    if row[index] is not None:
+                        row[index] = converter(row[index])
+            yield dict(zip(_output_names, row))
+
+
+# Same output as CatalogSerializer / OtherDetailsSerializer
+catalog_projection = Projection(model=Catalog, fields=[
+    ('other_details_id', 'other_details_id', None),
+    ('mbtb_code', 'mbtb_code', None),
+    ('sex', 'sex', None),
+    ('age', 'age', None),
+    ('postmortem_interval', 'postmortem_interval', None),
+    ('time_in_fix', 'time_in_fix', None),
+    ('neuropathology_diagnosis', 'neuropathology_diagnosis', None),
+    ('tissue_type', 'tissue_type', None),
+    ('preservation_method', 'preservation_method', None),
+    ('storage_year', 'storage_year', to_string),
+    ('autopsy_type', 'autopsy_type', None),
+    ('clinical_diagnosis', 'clinical_diagnosis', None),
+    ('race', 'race', None),
+    ('duration', 'duration', None),
+    ('clinical_details', 'clinical_details', None),
+    ('cause_of_death', 'cause_of_death', None),
+    ('brain_weight', 'brain_weight', None),
+    ('neuropathology_summary', 'neuropathology_summary', None),
+    ('neuropathology_gross', 'neuropathology_gross', None),
+    ('neuropathology_microscopic', 'neuropathology_microscopic', None),
+    ('neouropathology_criteria', 'neouropathology_criteria', None),
+    ('cerad', 'cerad', None),
+    ('braak_stage', 'braak_stage', None),
+    ('khachaturian', 'khachaturian', None),
+    ('abc', 'abc', None),
+    ('formalin_fixed', 'formalin_fixed', None),
+    ('fresh_frozen', 'fresh_frozen', None),
+    ('prime_details_id', 'prime_details_id', None),
+])
+
+# Same output as PrimeDetailsSerializer, lookups are joined in the single values query
+prime_details_projection = Projection(model=PrimeDetails, fields=[
+    ('prime_details_id', 'prime_details_id', None),
+    ('neuro_diagnosis_id', 'neuro_diagnosis_id__neuro_diagnosis_name', None),
+    ('tissue_type', 'tissue_type__tissue_type', None),
+    ('mbtb_code', 'mbtb_code', None),
+    ('sex', 'sex', None),
+    ('age', 'age', None),
+    ('postmortem_interval', 'postmortem_interval', None),
+    ('time_in_fix', 'time_in_fix', None),
+    ('clinical_diagnosis', 'clinical_diagnosis', None),
+    ('preservation_method', 'preservation_method', None),
+    ('storage_year', 'storage_year', to_iso_datetime),
+    ('archive', 'archive', None),
+])
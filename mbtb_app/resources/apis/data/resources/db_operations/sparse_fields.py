@@ -0,0 +1,55 @@
+# This class selects a subset of serializer fields from `fields`/`exclude` values, e.g. ?fields=mbtb_code,sex
+# The same subset drives the serializer and `.only()` on the queryset, so unused columns are never read
+class SparseFields(object):
+
+    def __init__(self, **kwargs):
+        self.serializer_class = kwargs.get('serializer_class', None)
+        self.fields = self.split(kwargs.get('fields', None))
+        self.exclude = self.split(kwargs.get('exclude', None))
+        self.available = list(self.serializer_class().fields.keys())
+
+    # Accept comma separated string or list of names, None if parameter is not given
+    # Any other value (number, object) or list item that is not a string is kept as is, `validate` rejects it
+    def split(self, value):
+        if value is None:
+            return None
+        if isinstance(value, str):
+            value = value.split(',')
+        elif not isinstance(value, list):
+            return [value]
+        return [name.strip() if isinstance(name, str) else name
+                for name in value if not isinstance(name, str) or name.strip()]
+
+    def is_sparse(self):
+        return self.fields is not None or self.exclude is not None
+
+    def validate(self):
+        _invalid = [name for name in (self.fields or []) + (self.exclude or []) if name not in self.available]
+        if _invalid:
+            return {'Response': False, 'Message': 'Invalid field names: {}, allowed fields are: {}'.format(
+                _invalid, self.available)}
+        return {'Response': True}
+
+    # Names of serializer fields to keep, in serializer order
+    def names(self):
+        return [name for name in self.available
+                if (self.fields is None or name in self.fields) and name not in (self.exclude or [])]
+
+    def serializer_kwargs(self):
+        return {'fields': self.names()} if self.is_sparse() else {}
+
+    # Load only columns behind selected fields, join only relations they traverse
+    def apply(self, queryset):
+        if not self.is_sparse():
+            return queryset
+
+        _fields = self.serializer_class().fields
+        _columns = [queryset.model._meta.pk.name]
+        _related = []
+        for name in self.names():
+            _source_attrs = _fields[name].source.split('.')
+            _columns.append('__'.join(_source_attrs))
+            if len(_source_attrs) > 1:
+                _related.append('__'.join(_source_attrs[:-1]))
+
+        return queryset.select_related(None).select_related(*_related).only(*_columns)
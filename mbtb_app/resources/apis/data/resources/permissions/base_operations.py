@@ -1,11 +1,36 @@
+from django.conf import settings
 from rest_framework import exceptions
 from rest_framework.authentication import get_authorization_header
+from resources.cache.revocation_feed import revocation_feed
+from resources.cache.revocation_set import revocation_set
+from resources.db_operations.user_or_admin import UserOrAdmin
 import jwt
 
 
 # This class consists base operations: perform validations on request, at last decode jwt token
 class BaseOperations(object):
 
+    # Resolve principal of the request token once, later permission checks and views reuse `request.principal`
+    # User tokens are authorized from claims and the revocation set, without touching users or admins tables.
+    # Admin tokens must also belong to an existing admin, checked through the per worker principal cache
+    def get_principal(self, request):
+        if not hasattr(request, 'principal'):
+            response = self.validate_request(request)
+            revocation_feed.poll_if_due()
+
+            if response['role'] is not None and revocation_set.is_revoked(**response):
+                request.principal = None
+            elif response['role'] != 'User':
+                # admin tokens and tokens issued before role claims are looked up in users and admins tables
+                request.principal = UserOrAdmin().run(id=response['id'], email=response['email'])
+            else:
+                request.principal = {
+                    'id': response['id'], 'email': response['email'], 'role': response['role'],
+                    'suspend': 'N', 'pending_approval': 'N'
+                }
+
+        return request.principal
+
     # Check for auth_token length and pass it for decoding
     def validate_request(self, request):
         auth = get_authorization_header(request).split()
@@ -35,11 +60,15 @@ class BaseOperations(object):
     # Decode jwt token and return dict and raise decode error if any
     def decode_credentials(self, token):
         try:
-            payload = jwt.decode(token, "SECRET_KEY")
+            payload = jwt.decode(token, settings.JWT_SECRET, algorithms=['HS256'])
             response = {
                 'id': payload['id'],
-                'email': payload['email']
+                'email': payload['email'],
+                'role': payload.get('role', None),
+                'ver': payload.get('ver', 0)
             }
+            if response['role'] not in [None, 'User', 'Admin']:
+                raise jwt.InvalidTokenError('Invalid role')
             return response
         except BaseException as error_msg:
             error_msg = 'Token - ' + str(error_msg)
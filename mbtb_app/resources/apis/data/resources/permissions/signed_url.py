@@ -0,0 +1,43 @@
+import hashlib
+import hmac
+import time
+from urllib.parse import urlencode
+from django.conf import settings
+from django.urls import reverse
+
+
+# This class is to sign and verify short-lived export file urls, e.g. /exports/ab/ab12...ef.csv?expires=..&signature=..
+# Signature is HMAC-SHA256 of file name and expiry time with SECRET_KEY, so a url is checked without any db query.
+class SignedUrl(object):
+
+    def __init__(self, **kwargs):
+        self.secret = kwargs.get('secret', settings.SECRET_KEY)
+        self.max_age = kwargs.get('max_age', 900)
+        self.url_name = kwargs.get('url_name', 'export_file')
+
+    def signature(self, name, expires):
+        _message = '{}:{}'.format(name, expires).encode('utf-8')
+        return hmac.new(self.secret.encode('utf-8'), _message, hashlib.sha256).hexdigest()
+
+    # Return url of `name` valid for `max_age` seconds and its expiry time
+    def sign(self, name, **kwargs):
+        _expires = int(time.time()) + kwargs.get('max_age', self.max_age)
+        _url = reverse(self.url_name, kwargs={'name': name}) + '?' + urlencode(
+            {'expires': _expires, 'signature': self.signature(name, _expires)}
+        )
+        return {'url': _url, 'expires': _expires}
+
+    # True if signature matches name and expiry time and url is not expired
+    def verify(self, name, expires, signature):
+        try:
+            _expires = int(expires)
+        except (TypeError, ValueError):
+            return False
+
+        if _expires < time.time() or not isinstance(signature, str):
+            return False
+
+        return hmac.compare_digest(self.signature(name, _expires), signature)
+
+
+signed_url = SignedUrl(max_age=getattr(settings, 'EXPORT_FILES', {}).get('URL_MAX_AGE', 900))
@@ -0,0 +1,97 @@
+import os
+import re
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+
+
+# This class is to send export files. With SERVE 'x-accel-redirect' (nginx) or 'x-sendfile' (apache, lighttpd) the
+# response only names the file and web server sends it, so no worker is busy during the transfer and web server
+# answers Range requests. With 'django' the file is read here, a single `Range: bytes=..` is answered with 206.
+# Export files never change under the same name, so name is the ETag and a stale `If-Range` gets the whole file.
+class FileTransfer(object):
+    range_pattern = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+    def __init__(self, **kwargs):
+        self.serve = kwargs.get('serve', 'django')
+        self.accel_redirect_prefix = kwargs.get('accel_redirect_prefix', '/protected_exports/')
+        self.block_size = kwargs.get('block_size', 64 * 1024)
+
+    # Response for file `name` under `directory`, FileNotFoundError if it doesn't exist
+    def response(self, request, directory, name, **kwargs):
+        _path = os.path.join(directory, name)
+        _size = os.path.getsize(_path)
+        _etag = '"{}"'.format(os.path.basename(name))
+
+        if self.serve == 'x-accel-redirect':
+            _response = HttpResponse(content_type=kwargs.get('content_type', None))
+            _response['X-Accel-Redirect'] = self.accel_redirect_prefix + name
+        elif self.serve == 'x-sendfile':
+            _response = HttpResponse(content_type=kwargs.get('content_type', None))
+            _response['X-Sendfile'] = os.path.abspath(_path)
+        else:
+            _response = self.file_response(request, _path, _size, _etag, **kwargs)
+
+        _response['Accept-Ranges'] = 'bytes'
+        _response['ETag'] = _etag
+        if kwargs.get('filename', None):
+            _response['Content-Disposition'] = 'attachment; filename="{}"'.format(kwargs['filename'])
+        return _response
+
+    def file_response(self, request, path, size, etag, **kwargs):
+        _range = self.requested_range(request, size, etag)
+        if _range is False:
+            _response = HttpResponse(status=416)
+            _response['Content-Range'] = 'bytes */{}'.format(size)
+            return _response
+
+        _start, _end = _range or (0, size - 1)
+        _response = StreamingHttpResponse(
+            self.read(path, _start, _end - _start + 1), status=206 if _range else 200,
+            content_type=kwargs.get('content_type', None)
+        )
+        _response['Content-Length'] = str(_end - _start + 1)
+        if _range:
+            _response['Content-Range'] = 'bytes {}-{}/{}'.format(_start, _end, size)
+        return _response
+
+    # (first, last) byte of a satisfiable single range, False if it can't be satisfied, None to send whole file:
+    # no Range header, If-Range of another file, several ranges or a malformed header
+    def requested_range(self, request, size, etag):
+        _header = request.META.get('HTTP_RANGE', '').strip()
+        _if_range = request.META.get('HTTP_IF_RANGE', None)
+        if not _header or (_if_range is not None and _if_range != etag):
+            return None
+
+        _match = self.range_pattern.match(_header)
+        if _match is None or _match.groups() == ('', ''):
+            return None
+
+        _first, _last = _match.groups()
+        if not _first:
+            # suffix range, last N bytes
+            if int(_last) == 0 or size == 0:
+                return False
+            return max(size - int(_last), 0), size - 1
+
+        if _last and int(_last) < int(_first):
+            return None
+        if int(_first) >= size:
+            return False
+        return int(_first), min(int(_last), size - 1) if _last else size - 1
+
+    def read(self, path, start, length):
+        with open(path, 'rb') as file_obj:
+            file_obj.seek(start)
+            while length > 0:
+                _block = file_obj.read(min(self.block_size, length))
+                if not _block:
+                    break
+                length -= len(_block)
+                yield _block
+
+
+_config = getattr(settings, 'EXPORT_FILES', {})
+file_transfer = FileTransfer(
+    serve=_config.get('SERVE', 'django'), block_size=_config.get('BLOCK_SIZE', 64 * 1024),
+    accel_redirect_prefix=_config.get('ACCEL_REDIRECT_PREFIX', '/protected_exports/')
+)
@@ -0,0 +1,117 @@
+import re
+import tempfile
+from django.conf import settings
+from django.http import FileResponse
+
+try:
+    import h5py
+    import numpy
+except ImportError:
+    h5py = None
+    numpy = None
+
+_leading_number = re.compile(r'^\s*(-?\d+(?:\.\d+)?)')
+
+
+# Numeric value of stored text like '70', '12 hours' or 1080; NaN when missing or not a number
+def to_number(value):
+    if value is None:
+        return float('nan')
+    if isinstance(value, (int, float)):
+        return float(value)
+    _match = _leading_number.match(str(value))
+    return float(_match.group(1)) if _match else float('nan')
+
+
+# This class is to write chunks (lists of dict) to an HDF5 file, one chunked and compressed dataset per column.
+# Numeric columns are float64 (NaN for missing), categorical columns are int32 codes (-1 for missing) into
+# `/categories/<column>`, remaining columns are utf-8 strings. Only one chunk is held in memory at a time.
+class HDF5Export(object):
+    streaming = False
+    content_type = 'application/x-hdf5'
+    extension = 'h5'
+    numeric_columns = ['age', 'postmortem_interval', 'duration', 'brain_weight']
+    categorical_columns = [
+        'sex', 'tissue_type', 'preservation_method', 'neuropathology_diagnosis', 'clinical_diagnosis',
+        'autopsy_type', 'race', 'cerad', 'braak_stage', 'khachaturian', 'abc', 'formalin_fixed', 'fresh_frozen'
+    ]
+
+    def __init__(self, **kwargs):
+        _config = getattr(settings, 'HDF5_EXPORT', {})
+        self.filename = kwargs.get('filename', 'mbtb_data')
+        self.chunk_rows = _config.get('CHUNK_ROWS', 4096)
+        self.compression = _config.get('COMPRESSION', 'gzip')
+        self.compression_level = _config.get('COMPRESSION_LEVEL', 4)
+
+    @staticmethod
+    def is_available():
+        return h5py is not None
+
+    def write(self, chunks, file_obj):
+        with h5py.File(file_obj, 'w') as h5_file:
+            _datasets = None
+            _categories = {}
+            _size = 0
+
+            for chunk in chunks:
+                if not chunk:
+                    continue
+
+                # datasets are created from columns of the first chunk and grow with each chunk
+                if _datasets is None:
+                    _datasets = [(name, self.create_dataset(h5_file, name)) for name in chunk[0]]
+                    _categories = {name: {} for name, dataset in _datasets if name in self.categorical_columns}
+
+                _start, _size = _size, _size + len(chunk)
+                for name, dataset in _datasets:
+                    dataset.resize((_size,))
+                    dataset[_start:_size] = self.encode(name, [row[name] for row in chunk], _categories)
+
+            for name, codes in _categories.items():
+                h5_file.create_dataset(
+                    'categories/' + name, data=numpy.array(list(codes), dtype=object), dtype=h5py.string_dtype()
+                )
+            h5_file.attrs['rows'] = _size
+
+        return file_obj
+
+    def create_dataset(self, h5_file, name):
+        if name in self.numeric_columns:
+            _dtype, _fillvalue, _kind = 'float64', float('nan'), 'numeric'
+        elif name in self.categorical_columns:
+            _dtype, _fillvalue, _kind = 'int32', -1, 'categorical'
+        else:
+            _dtype, _fillvalue, _kind = h5py.string_dtype(), None, 'text'
+
+        _dataset = h5_file.create_dataset(
+            name, shape=(0,), maxshape=(None,), dtype=_dtype, fillvalue=_fillvalue, chunks=(self.chunk_rows,),
+            compression=self.compression, compression_opts=self.compression_level, shuffle=_kind != 'text'
+        )
+        _dataset.attrs['kind'] = _kind
+        if _kind == 'categorical':
+            _dataset.attrs['categories'] = 'categories/' + name
+        return _dataset
+
+    def encode(self, name, values, categories):
+        if name in self.numeric_columns:
+            return numpy.array([to_number(value) for value in values], dtype='float64')
+        elif name in self.categorical_columns:
+            _codes = categories[name]
+            return numpy.array(
+                [-1 if value is None else _codes.setdefault(value, len(_codes)) for value in values], dtype='int32'
+            )
+        return numpy.array(['' if value is None else str(value) for value in values], dtype=object)
+
+    # HDF5 needs a seekable file, so it is written to a temporary file first and then sent from disk
+    def response(self, chunks, status=200):
+        _file = tempfile.TemporaryFile()
+        self.write(chunks, _file)
+        _file.seek(0)
+        return self.file_response(_file, status=status)
+
+    def file_response(self, file_obj, status=200):
+        _response = FileResponse(
+            file_obj, as_attachment=True, filename=self.filename + '.' + self.extension, status=status
+        )
+        _response['Content-Type'] = self.content_type
+        return _response
@@ -0,0 +1,61 @@
+import csv
+from django.http import FileResponse, StreamingHttpResponse
+
+
+# File like object for csv.writer: `write` returns the line instead of storing it
+class LineBuffer(object):
+
+    def write(self, value):
+        return value
+
+
+# This class is to encode chunks (lists of dict) incrementally as CSV or TSV rows, with given column order.
+# Only one chunk is encoded at a time, so memory doesn't grow with the number of rows
+class StreamingCSV(object):
+    streaming = True
+    content_types = {
+        'csv': 'text/csv',
+        'tsv': 'text/tab-separated-values'
+    }
+    delimiters = {
+        'csv': ',',
+        'tsv': '\t'
+    }
+
+    def __init__(self, **kwargs):
+        self.format = kwargs.get('format', 'csv')
+        self.column_names = kwargs.get('column_names', [])
+        self.filename = kwargs.get('filename', 'mbtb_data')
+        self.extension = self.format
+        self.content_type = self.content_types[self.format] + '; charset=utf-8'
+
+    def run(self, chunks):
+        _writer = csv.writer(LineBuffer(), delimiter=self.delimiters[self.format], lineterminator='\r\n')
+
+        # header goes out before the first query
+        yield _writer.writerow(self.column_names).encode('utf-8')
+        for chunk in chunks:
+            if chunk:
+                yield ''.join(
+                    _writer.writerow([row.get(name) for name in self.column_names]) for row in chunk
+                ).encode('utf-8')
+
+    def write(self, chunks, file_obj):
+        for content in self.run(chunks):
+            file_obj.write(content)
+        return file_obj
+
+    def response(self, chunks, status=200):
+        return self.content_response(self.run(chunks), status=status)
+
+    # Response for already encoded contents, e.g. `run` output passing through export cache
+    def content_response(self, contents, status=200):
+        _response = StreamingHttpResponse(contents, status=status, content_type=self.content_type)
+        _response['Content-Disposition'] = 'attachment; filename="{}.{}"'.format(self.filename, self.extension)
+        return _response
+
+    # Response for a file written by `write`
+    def file_response(self, file_obj, status=200):
+        _response = FileResponse(file_obj, status=status, content_type=self.content_type)
+        _response['Content-Disposition'] = 'attachment; filename="{}.{}"'.format(self.filename, self.extension)
+        return _response
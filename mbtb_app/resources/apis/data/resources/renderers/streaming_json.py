@@ -0,0 +1,49 @@
+from django.http import FileResponse, StreamingHttpResponse
+from resources.renderers.fast_json import dumps
+
+
+# This class is to encode chunks (lists of dict) incrementally, as one JSON array or as NDJSON (one object per line)
+# Only one chunk is encoded at a time, so memory doesn't grow with the number of rows
+class StreamingJSON(object):
+    streaming = True
+    content_types = {
+        'json': 'application/json',
+        'ndjson': 'application/x-ndjson'
+    }
+
+    def __init__(self, **kwargs):
+        self.format = kwargs.get('format', 'json')
+        self.extension = self.format
+        self.content_type = self.content_types[self.format]
+
+    def run(self, chunks):
+        if self.format == 'ndjson':
+            for chunk in chunks:
+                if chunk:
+                    yield b'\n'.join(dumps(row) for row in chunk) + b'\n'
+            return
+
+        # opening bracket goes out before the first query, chunks are joined without their own brackets
+        yield b'['
+        _separator = b''
+        for chunk in chunks:
+            if chunk:
+                yield _separator + dumps(chunk)[1:-1]
+                _separator = b','
+        yield b']'
+
+    def write(self, chunks, file_obj):
+        for content in self.run(chunks):
+            file_obj.write(content)
+        return file_obj
+
+    def response(self, chunks, status=200):
+        return self.content_response(self.run(chunks), status=status)
+
+    # Response for already encoded contents, e.g. `run` output passing through export cache
+    def content_response(self, contents, status=200):
+        return StreamingHttpResponse(contents, status=status, content_type=self.content_type)
+
+    # Response for a file written by `write`
+    def file_response(self, file_obj, status=200):
+        return FileResponse(file_obj, status=status, content_type=self.content_type)
@@ -0,0 +1,54 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase, APIClient
+
+
+# This class asserts that an endpoint stays within its declared number of queries
+# Requests are repeated while test data grows, so queries issued per row (N+1) exceed the budget
+class QueryBudget(APITestCase):
+
+    def __init__(self, **kwargs):
+        super().__init__()
+        self.budget_client = APIClient(enforce_csrf_checks=True)
+        self.token = kwargs.get('token', None)
+        self.url = kwargs.get('url', None)
+        self.budget = kwargs.get('budget', None)
+
+    # Perform request and fail if it issues more queries than budget, return response and captured queries
+    def run(self, **kwargs):
+        _request_type = kwargs.get('request_type', 'get')
+        _data = kwargs.get('data', None)
+        _url = kwargs.get('url', self.url)
+        _budget = kwargs.get('budget', self.budget)
+
+        self.budget_client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.decode('utf-8'))
+
+        # warm up request: token principal and revocation feed are resolved once per worker, not per request
+        self.budget_client.generic(method=_request_type, path=_url, data=_data, content_type='json')
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.budget_client.generic(method=_request_type, path=_url, data=_data, content_type='json')
+
+        self.budget_client.credentials()
+        self.assertLessEqual(
+            len(queries), _budget,
+            '{} {} issued {} queries, budget is {}:\n{}'.format(
+                _request_type.upper(), _url, len(queries), _budget,
+                '\n'.join(query['sql'] for query in queries.captured_queries)
+            )
+        )
+        return response, queries
+
+    # Grow test data through `grow(size)` callable and check budget after each step, query count must stay flat
+    def run_with_growth(self, **kwargs):
+        _grow = kwargs.get('grow', None)
+        _sizes = kwargs.get('sizes', [1, 10, 50])
+
+        counts = []
+        for size in _sizes:
+            _grow(size)
+            response, queries = self.run(**kwargs)
+            counts.append(len(queries))
+
+        self.assertEqual(len(set(counts)), 1, 'Query count grows with data: {}'.format(counts))
+        return True
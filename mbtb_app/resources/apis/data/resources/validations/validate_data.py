@@ -2,6 +2,17 @@ import json
 
 
 class ValidateData(object):
+    # Columns of the upload CSV file, in order; CSV export writes the same columns
+    column_names = [
+        'mbtb_code', 'sex', 'age', 'postmortem_interval', 'time_in_fix', 'clinical_diagnosis',
+        'storage_year', 'tissue_type', 'neuropathology_diagnosis', 'race', 'duration',
+        'clinical_details', 'cause_of_death', 'brain_weight', 'neuropathology_summary', 'neuropathology_gross',
+        'neuropathology_microscopic', 'cerad', 'braak_stage', 'khachaturian', 'abc', 'formalin_fixed',
+        'fresh_frozen', 'autopsy_type'
+    ]
+
+    # formalin_fixed / fresh_frozen values read as unchecked, any other non empty value is checked
+    unchecked_values = ['false', '0', 'no', 'n']
 
     # Check if received file is of type CSV; return true if it is else false
     def check_file_type(self, **kwargs):
@@ -33,13 +44,7 @@ class ValidateData(object):
     # Compare column names with actual ones; return true if it matches else false
     def check_column_names(self, **kwargs):
         _received_column_names = kwargs.get('column_names', None)
-        _actual_column_names = [
-            'mbtb_code', 'sex', 'age', 'postmortem_interval', 'time_in_fix', 'clinical_diagnosis',
-            'storage_year', 'tissue_type', 'neuropathology_diagnosis', 'race', 'duration',
-            'clinical_details', 'cause_of_death', 'brain_weight', 'neuropathology_summary', 'neuropathology_gross',
-            'neuropathology_microscopic', 'cerad', 'braak_stage', 'khachaturian', 'abc', 'formalin_fixed',
-            'fresh_frozen', 'autopsy_type'
-        ]
+        _actual_column_names = self.column_names
         difference = list(set(_actual_column_names) - set(_received_column_names))
 
         # TODO: Once `storage_year` added in insert single row, need to rewrite below logic.
@@ -58,8 +63,8 @@ class ValidateData(object):
         return {'Response': True}
 
     def check_preservation_method(self, **kwargs):
-        _formalin_fixed = kwargs.get('formalin_fixed', None)
-        _fresh_frozen = kwargs.get('fresh_frozen', None)
+        _formalin_fixed = self.is_checked(value=kwargs.get('formalin_fixed', None))
+        _fresh_frozen = self.is_checked(value=kwargs.get('fresh_frozen', None))
 
         if _formalin_fixed and _fresh_frozen:
             return 'Both'
@@ -70,8 +75,21 @@ class ValidateData(object):
         else:
             return None
 
+    # Check if formalin_fixed / fresh_frozen is set, 'False' (as exported from stored value) is unchecked
+    def is_checked(self, **kwargs):
+        _value = kwargs.get('value', None)
+        if isinstance(_value, str):
+            return _value.strip().lower() not in [''] + self.unchecked_values
+        return bool(_value)
+
+    # Check if value is a number; empty value is read as null
     def check_is_number(self, **kwargs):
         _value = kwargs.get('value', None)
+        if _value is None or _value == '':
+            return {
+                'Response': True,
+                'Value': None
+            }
 
         try:
             _value = json.loads(_value)
@@ -4,6 +4,7 @@ from .models import TissueRequests
 from mbtb.models import AdminAccount, UserAccount
 from .serializers import TissueRequestsSerializer
 from resources.tests.common_tests import CommonTests
+from django.conf import settings
 import jwt
 
 
@@ -39,7 +40,7 @@ class SetUpTestData(APITestCase):
             'id': admin.id,
             'email': admin.email,
         }
-        cls.admin_token = jwt.encode(admin_payload, "SECRET_KEY", algorithm='HS256')  # generating jwt admin_token
+        cls.admin_token = jwt.encode(admin_payload, settings.JWT_SECRET, algorithm='HS256')  # jwt admin_token
         cls.admin_client = APIClient(enforce_csrf_checks=True)  # enforcing csrf checks
 
         # User Account: for adding new tissue request, generating temp account and user token
@@ -51,7 +52,7 @@ class SetUpTestData(APITestCase):
             'id': user.id,
             'email': user.email,
         }
-        cls.user_token = jwt.encode(user_payload, "SECRET_KEY", algorithm='HS256')  # generating jwt admin_token
+        cls.user_token = jwt.encode(user_payload, settings.JWT_SECRET, algorithm='HS256')  # generating jwt admin_token
         cls.user_client = APIClient(enforce_csrf_checks=True)  # enforcing csrf checks
 
     @classmethod
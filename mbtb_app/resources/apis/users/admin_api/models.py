@@ -4,7 +4,23 @@ from django.db import models
 class AdminAccount(models.Model):
     email = models.CharField(max_length=50)
     password_hash = models.CharField(max_length=50)
+    token_version = models.IntegerField(default=0)
 
     class Meta:
         #managed = False
         db_table = 'admins'
+
+
+# Append-only feed of authorization changes, data API workers poll it by `change_id` to evict cached principals
+class AuthRevocation(models.Model):
+    change_id = models.BigAutoField(primary_key=True)
+    principal_id = models.IntegerField()
+    role = models.CharField(max_length=5, default='User')
+    suspend = models.CharField(max_length=1, default='N')
+    pending_approval = models.CharField(max_length=1, default='Y')
+    token_version = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        #managed = False
+        db_table = 'auth_revocations'
@@ -1,9 +1,10 @@
 from rest_framework import status
 from rest_framework.test import APITestCase, APIClient
-from .models import AdminAccount
+from .models import AdminAccount, AuthRevocation
 from users_api.models import Users
 from users_api.serializers import UsersSerializer
 from resources.tests.common_tests import CommonTests
+from django.conf import settings
 import jwt
 
 
@@ -19,7 +20,7 @@ class SetUpTestData(APITestCase):
             'id': admin.id,
             'email': admin.email
         }
-        cls.token = jwt.encode(admin_auth_payload, "SECRET_KEY", algorithm='HS256')  # generating jwt token
+        cls.token = jwt.encode(admin_auth_payload, settings.JWT_SECRET, algorithm='HS256')  # generating jwt token
         cls.client = APIClient(enforce_csrf_checks=True)  # Enforcing csrf checks
 
     @classmethod
@@ -50,10 +51,13 @@ class AdminAccountGetTokenViewTest(SetUpTestData):
         )
         self.assertEquals(response.status_code, status.HTTP_200_OK)
         _received_token = response._container[0].decode('utf-8')
-        _decoded_token = jwt.decode(_received_token, "SECRET_KEY")
+        _decoded_token = jwt.decode(_received_token, settings.JWT_SECRET, algorithms=['HS256'])
         _model_response = AdminAccount.objects.get(id=_decoded_token['id'], email=_decoded_token['email'])
         self.assertEqual(_model_response.email, self.admin_email)
         self.assertEqual(_model_response.password_hash, self.admin_password)
+        self.assertEqual(_decoded_token['role'], 'Admin')
+        self.assertEqual(_decoded_token['ver'], _model_response.token_version)
+        self.assertGreater(_decoded_token['exp'], _decoded_token['iat'])
 
     # post request with invalid credentials
     def test_invalid_admin_login(self):
@@ -261,7 +265,7 @@ class CurrentUsersViewSetTest(SetUpTestData):
         )
         self.assertEquals(before_suspension_response.status_code, status.HTTP_200_OK)
         _received_token = before_suspension_response._container[0].decode('utf-8')
-        _decoded_token = jwt.decode(_received_token, "SECRET_KEY")
+        _decoded_token = jwt.decode(_received_token, settings.JWT_SECRET, algorithms=['HS256'])
         _model_response = Users.objects.get(id=_decoded_token['id'], email=_decoded_token['email'])
         self.assertEqual(_model_response.email, self.current_user.email)
         self.assertEqual(_model_response.password_hash, self.current_user.password_hash)
@@ -294,6 +298,20 @@ class CurrentUsersViewSetTest(SetUpTestData):
         self.assertEquals(after_suspension_response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertEquals(after_suspension_response.data['Error'], _suspended_msg)
 
+    # Suspension is appended to revocation feed and bumps token version
+    def test_revocation_feed(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.decode('utf-8'))
+        response = self.client.patch(
+            '/current_users/{}/'.format(self.current_user.id), self.suspend_user_payload, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['token_version'], self.current_user.token_version + 1)
+        _change = AuthRevocation.objects.get(principal_id=self.current_user.id)
+        self.assertEqual(_change.suspend, 'Y')
+        self.assertEqual(_change.token_version, response.data['token_version'])
+        self.client.credentials()
+        AuthRevocation.objects.all().delete()
+
     # Invalid suspend user test: unknown user id
     def test_invalid_suspend_user(self):
         _predicted_msg = 'Not found.'
@@ -433,7 +451,7 @@ class SuspendedUsersViewSetTest(SetUpTestData):
         )
         self.assertEquals(before_suspension_response.status_code, status.HTTP_200_OK)
         _received_token = before_suspension_response._container[0].decode('utf-8')
-        _decoded_token = jwt.decode(_received_token, "SECRET_KEY")
+        _decoded_token = jwt.decode(_received_token, settings.JWT_SECRET, algorithms=['HS256'])
         _model_response = Users.objects.get(id=_decoded_token['id'], email=_decoded_token['email'])
         self.assertEqual(_model_response.email, self.current_user.email)
         self.assertEqual(_model_response.password_hash, self.current_user.password_hash)
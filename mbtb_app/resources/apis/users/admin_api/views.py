@@ -1,12 +1,13 @@
+from django.db import transaction
 from django.http import HttpResponse
 from rest_framework import views, response, viewsets
 from rest_framework.permissions import AllowAny
-from .models import AdminAccount
+from .models import AdminAccount, AuthRevocation
+from resources.permissions.auth_token import AuthToken
 from resources.permissions.is_admin import IsAdmin
 from resources.permissions.is_post_allowed import IsPostAllowed
 from users_api.models import Users
 from users_api.serializers import UsersSerializer
-import jwt
 
 
 # Authenticate credentials for admin and return auth token
@@ -27,11 +28,7 @@ class AdminAccountGetTokenView(views.APIView):
             return response.Response({'Error': "Invalid username/password"}, status="400")
 
         if admin:
-            payload = {
-                'id': admin.id,
-                'email': admin.email,
-            }
-            jwt_token = jwt.encode(payload, "SECRET_KEY", algorithm='HS256')
+            jwt_token = AuthToken(role='Admin').issue(admin)
 
             return HttpResponse(
                 jwt_token,
@@ -40,15 +37,45 @@ class AdminAccountGetTokenView(views.APIView):
             )
 
 
+# This mixin appends to the revocation feed whenever admin changes `suspend` or `pending_approval` of a user
+# or deletes a user. Suspension also bumps token_version so that previously issued tokens stay revoked.
+class RevocationFeedMixin(object):
+
+    def perform_update(self, serializer):
+        _suspend = serializer.validated_data.get('suspend', serializer.instance.suspend)
+        _pending_approval = serializer.validated_data.get('pending_approval', serializer.instance.pending_approval)
+        if (_suspend, _pending_approval) == (serializer.instance.suspend, serializer.instance.pending_approval):
+            serializer.save()
+            return
+
+        with transaction.atomic():
+            if _suspend == 'Y' and serializer.instance.suspend != 'Y':
+                user = serializer.save(token_version=serializer.instance.token_version + 1)
+            else:
+                user = serializer.save()
+            AuthRevocation.objects.create(
+                principal_id=user.id, role='User', suspend=user.suspend, pending_approval=user.pending_approval,
+                token_version=user.token_version
+            )
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            AuthRevocation.objects.create(
+                principal_id=instance.id, role='User', suspend='Y', pending_approval=instance.pending_approval,
+                token_version=instance.token_version + 1
+            )
+            instance.delete()
+
+
 # This view gets new registration requests and allow admin to approve their status.
-class NewUsersViewSet(viewsets.ModelViewSet):
+class NewUsersViewSet(RevocationFeedMixin, viewsets.ModelViewSet):
     permission_classes = [IsAdmin]
     queryset = Users.objects.filter(pending_approval='Y')  # filtering to fetch only pending requests
     serializer_class = UsersSerializer
 
 
 # This view gets current users list and allow admin to suspend their account.
-class CurrentUsersViewSet(viewsets.ModelViewSet):
+class CurrentUsersViewSet(RevocationFeedMixin, viewsets.ModelViewSet):
     permission_classes = [IsAdmin]
     # filtering to fetch non-pending and active accounts
     queryset = Users.objects.filter(pending_approval='N', suspend='N')
@@ -56,7 +83,7 @@ class CurrentUsersViewSet(viewsets.ModelViewSet):
 
 
 # This view gets suspended users list and allow admin to revert user's account status to normal.
-class SuspendedUsersViewSet(viewsets.ModelViewSet):
+class SuspendedUsersViewSet(RevocationFeedMixin, viewsets.ModelViewSet):
     permission_classes = [IsAdmin]
     # filtering to fetch non-pending and suspended accounts
     queryset = Users.objects.filter(pending_approval='N', suspend='Y')
@@ -0,0 +1,68 @@
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+
+
+# This class keeps authenticated principals in worker memory, keyed on (id, email, role)
+# Entries expire after `ttl` seconds, least recently used entries are dropped once `max_size` is reached
+class PrincipalCache(object):
+
+    def __init__(self, **kwargs):
+        self.max_size = kwargs.get('max_size', 1024)
+        self.ttl = kwargs.get('ttl', 300)
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    # Return cached value for key or `default` if it is missing or expired
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key, None)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        if self.max_size <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    # Remove every cached entry of a principal, optionally for a single role only
+    def evict(self, **kwargs):
+        _id = kwargs.get('id', None)
+        _role = kwargs.get('role', None)
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == _id and (_role is None or key[2] == _role)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'ttl': self.ttl
+        }
+
+
+_config = getattr(settings, 'PRINCIPAL_CACHE', {})
+principal_cache = PrincipalCache(max_size=_config.get('MAX_SIZE', 1024), ttl=_config.get('TTL', 300))
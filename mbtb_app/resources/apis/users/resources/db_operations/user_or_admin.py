@@ -1,22 +1,40 @@
+from django.db.models import CharField, Value
 from admin_api.models import AdminAccount
 from users_api.models import Users
+from resources.cache.principal_cache import principal_cache
 
 
-# This class is to fetch rows from admin and user tables
-# If found, return true else false
+# This class is to resolve the principal of a token from admin and user tables in a single query
+# Return dict with id, email, role, suspend and pending_approval, admin row is preferred; None if not found
+# Results are cached per worker and role, see `PrincipalCache`
 class UserOrAdmin(object):
 
-    def __init__(self, **kwargs):
-        self.model_name = kwargs.get('model_name', None)
-        self.models = {
-            'User': Users,
-            'Admin': AdminAccount
-        }
+    def __init__(self):
+        self.roles = ['Admin', 'User']
 
     def run(self, **kwargs):
-        try:
-            model_object = self.models[self.model_name].objects.get(**kwargs)  # model_object is for future reference
-            return True
+        _id = kwargs.get('id', None)
+        _email = kwargs.get('email', None)
 
-        except self.models[self.model_name].DoesNotExist:
-            return False
+        # Cached value is a principal dict if found, False if the role is known to be absent
+        _cached = [principal_cache.get((_id, _email, role)) for role in self.roles]
+        if None not in _cached:
+            return next((principal for principal in _cached if principal), None)
+
+        _principals = dict((row[4], dict(zip(['id', 'email', 'suspend', 'pending_approval', 'role'], row)))
+                           for row in self.query(id=_id, email=_email))
+        for role in self.roles:
+            principal_cache.set((_id, _email, role), _principals.get(role, False))
+
+        return next((_principals[role] for role in self.roles if role in _principals), None)
+
+    # UNION over users and admins, selecting only the columns needed for authorization
+    def query(self, **kwargs):
+        _users = Users.objects.filter(**kwargs).annotate(
+            role=Value('User', output_field=CharField())
+        ).values_list('id', 'email', 'suspend', 'pending_approval', 'role')
+        _admins = AdminAccount.objects.filter(**kwargs).annotate(
+            suspend=Value('N', output_field=CharField()), pending_approval=Value('N', output_field=CharField()),
+            role=Value('Admin', output_field=CharField())
+        ).values_list('id', 'email', 'suspend', 'pending_approval', 'role')
+        return _users.union(_admins, all=True)
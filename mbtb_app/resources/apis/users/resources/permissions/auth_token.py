@@ -0,0 +1,24 @@
+import time
+from django.conf import settings
+import jwt
+
+
+# This class issues auth tokens carrying role, expiry and token version claims
+# Data API authorizes user requests from these claims without looking up users or admins tables
+class AuthToken(object):
+
+    def __init__(self, **kwargs):
+        self.role = kwargs.get('role', None)
+        self.ttl = getattr(settings, 'AUTH_TOKEN', {}).get('TTL', 24 * 60 * 60)
+
+    def issue(self, principal):
+        _issued_at = int(time.time())
+        payload = {
+            'id': principal.id,
+            'email': principal.email,
+            'role': self.role,
+            'ver': principal.token_version,
+            'iat': _issued_at,
+            'exp': _issued_at + self.ttl
+        }
+        return jwt.encode(payload, settings.JWT_SECRET, algorithm='HS256')
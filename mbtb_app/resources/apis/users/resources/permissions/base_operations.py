@@ -1,11 +1,21 @@
+from django.conf import settings
 from rest_framework import exceptions
 from rest_framework.authentication import get_authorization_header
+from resources.db_operations.user_or_admin import UserOrAdmin
 import jwt
 
 
 # This class consists base operations: perform validations on request, at last decode jwt token
 class BaseOperations(object):
 
+    # Resolve principal of the request token once, later permission checks and views reuse `request.principal`
+    def get_principal(self, request):
+        if not hasattr(request, 'principal'):
+            response = self.validate_request(request)
+            request.principal = UserOrAdmin().run(id=response['id'], email=response['email'])
+
+        return request.principal
+
     # Check for auth_token length and pass it for decoding
     def validate_request(self, request):
         auth = get_authorization_header(request).split()
@@ -35,7 +45,7 @@ class BaseOperations(object):
     # Decode jwt token and return dict and raise decode error if any
     def decode_credentials(self, token):
         try:
-            payload = jwt.decode(token, "SECRET_KEY")
+            payload = jwt.decode(token, settings.JWT_SECRET, algorithms=['HS256'])
             response = {
                 'id': payload['id'],
                 'email': payload['email']
@@ -1,19 +1,15 @@
 from rest_framework import permissions, exceptions
+from .registry import permission_registry
 
 
 # This class allows post request i.e. for new user registration
 class IsPostAllowed(permissions.BasePermission):
+    role = 'Public'
+    methods = ['POST']
 
     def has_permission(self, request, view):
-        # allow all POST requests, no authentication
-        if request.method == 'POST':
-            valid_url = ['admin_auth', 'add_new_users', 'user_auth']
+        if request.method not in self.methods:
+            raise exceptions.MethodNotAllowed(method=request.method)
 
-            url_path = request.path.split('/')
-
-            if max(url_path) in valid_url:
-                return True
-
-            return False
-
-        raise exceptions.MethodNotAllowed(method=request.method)
+        # allow POST requests registered as public, no authentication
+        return permission_registry.required_role(request) == self.role
@@ -0,0 +1,28 @@
+from django.conf import settings
+
+
+# This class maps (url name, http method) to the role allowed to make that request
+# Built once per worker from settings, permission classes look requests up by `request.resolver_match.url_name`
+class PermissionRegistry(object):
+
+    def __init__(self, **kwargs):
+        registry = kwargs.get('registry', {})
+        self._roles = {
+            (url_name, method.upper()): role
+            for url_name, methods in registry.items()
+            for method, role in methods.items()
+        }
+
+    # Return role required for the request, None if url name and method are not registered
+    def required_role(self, request):
+        resolver_match = getattr(request, 'resolver_match', None)
+        if resolver_match is None:
+            return None
+
+        return self._roles.get((resolver_match.url_name, request.method), None)
+
+    def is_registered(self, url_name, method):
+        return (url_name, method.upper()) in self._roles
+
+
+permission_registry = PermissionRegistry(registry=getattr(settings, 'PERMISSION_REGISTRY', {}))
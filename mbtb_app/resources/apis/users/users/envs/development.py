@@ -23,6 +23,14 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 with open('resources/config/development/secret_key.cnf') as sk:
     SECRET_KEY = sk.read().strip()
 
+# Key of auth tokens, signed by users api and verified by data api, so both apis must use the same value.
+# It is not SECRET_KEY: MBTB_JWT_SECRET if set, else jwt_secret.cnf, a file with the same content in both apis
+if os.environ.get('MBTB_JWT_SECRET', None):
+    JWT_SECRET = os.environ['MBTB_JWT_SECRET']
+else:
+    with open('resources/config/development/jwt_secret.cnf') as jwt_sk:
+        JWT_SECRET = jwt_sk.read().strip()
+
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
 
@@ -105,14 +113,51 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Role required per (url name, http method), looked up by permission classes via `request.resolver_match`
+# Admin: IsAdmin, Authenticated: IsAuthenticated (user or admin), Public: IsPostAllowed. Unlisted requests are denied.
+PERMISSION_REGISTRY = {
+    'list_new_users-list': {'GET': 'Admin', 'PATCH': 'Admin', 'DELETE': 'Admin'},
+    'list_new_users-detail': {'GET': 'Admin', 'PATCH': 'Admin', 'DELETE': 'Admin'},
+    'current_users-list': {'GET': 'Admin', 'PATCH': 'Admin'},
+    'current_users-detail': {'GET': 'Admin', 'PATCH': 'Admin'},
+    'suspended_users-list': {'GET': 'Admin', 'PATCH': 'Admin'},
+    'suspended_users-detail': {'GET': 'Admin', 'PATCH': 'Admin'},
+    'add_new_users-list': {'POST': 'Public'},
+    'add_new_users-detail': {'POST': 'Public'},
+    'admin_auth': {'POST': 'Public'},
+    'user_auth': {'POST': 'Public'}
+}
+
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'resources.permissions.is_admin.IsAdmin',
         'resources.permissions.is_authenticated.IsAuthenticated',
         'resources.permissions.is_post_allowed.IsPostAllowed'
+    ),
+    # orjson backed JSON, stdlib json is used when orjson is not installed
+    'DEFAULT_RENDERER_CLASSES': (
+        'resources.renderers.fast_json.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'resources.renderers.fast_json.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     )
 }
 
+# In-process cache of authenticated principals used by the permission classes
+# MAX_SIZE: number of (id, email, role) entries kept per worker, TTL: seconds before an entry is re-checked
+PRINCIPAL_CACHE = {
+    'MAX_SIZE': 1024,
+    'TTL': 300
+}
+
+# Auth tokens issued on login, TTL: seconds until the `exp` claim
+AUTH_TOKEN = {
+    'TTL': 24 * 60 * 60
+}
+
 # Internationalization
 # https://docs.djangoproject.com/en/2.2/topics/i18n/
 
@@ -23,6 +23,7 @@ class Users(models.Model):
     suspend = models.CharField(max_length=1, default='N')
     suspend_reason = models.TextField(blank=True)
     revert_reason = models.TextField(blank=True)
+    token_version = models.IntegerField(default=0)
 
     class Meta:
         #managed = False
@@ -7,3 +7,4 @@ class UsersSerializer(serializers.ModelSerializer):
     class Meta:
         model = Users
         fields = '__all__'
+        read_only_fields = ['token_version']
@@ -2,6 +2,7 @@ from rest_framework import status
 from rest_framework.test import APITestCase, APIClient
 from .models import Users
 from .serializers import UsersSerializer
+from django.conf import settings
 import jwt
 
 
@@ -17,7 +18,7 @@ class SetUpTestData(APITestCase):
             'id': cls.user.id,
             'email': cls.user.email
         }
-        cls.token = jwt.encode(user_auth_payload, "SECRET_KEY", algorithm='HS256')  # generating jwt token
+        cls.token = jwt.encode(user_auth_payload, settings.JWT_SECRET, algorithm='HS256')  # generating jwt token
         cls.client = APIClient(enforce_csrf_checks=True)  # Enforcing csrf checks
 
     @classmethod
@@ -48,10 +49,13 @@ class UsersAuthenticationTestCase(SetUpTestData):
         )
         self.assertEquals(response.status_code, status.HTTP_200_OK)
         _received_token = response._container[0].decode('utf-8')
-        _decoded_token = jwt.decode(_received_token, "SECRET_KEY")
+        _decoded_token = jwt.decode(_received_token, settings.JWT_SECRET, algorithms=['HS256'])
         _model_response = Users.objects.get(id=_decoded_token['id'], email=_decoded_token['email'])
         self.assertEqual(_model_response.email, self.user_email)
         self.assertEqual(_model_response.password_hash, self.user_password)
+        self.assertEqual(_decoded_token['role'], 'User')
+        self.assertEqual(_decoded_token['ver'], _model_response.token_version)
+        self.assertNotIn('password_hash', _decoded_token)
 
     # post request with invalid credentials
     def test_invalid_user_login(self):
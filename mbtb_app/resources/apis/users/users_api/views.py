@@ -2,8 +2,8 @@ from django.http import HttpResponse
 from rest_framework import views, response, viewsets
 from .models import Users
 from .serializers import UsersSerializer
+from resources.permissions.auth_token import AuthToken
 from resources.permissions.is_post_allowed import IsPostAllowed
-import jwt
 
 
 # This view authenticate users and return auth_token, allowed request: post only
@@ -25,12 +25,7 @@ class UsersAccountView(views.APIView):
             return response.Response({'Error': 'Your account is suspended. Please contact admin.'}, status="400")
 
         else:
-            payload = {
-                'id': user[0].id,
-                'email': user[0].email,
-                'password_hash': user[0].password_hash
-            }
-            jwt_token = jwt.encode(payload, "SECRET_KEY", algorithm='HS256')
+            jwt_token = AuthToken(role='User').issue(user[0])
 
             return HttpResponse(
                 jwt_token,
@@ -25,65 +25,79 @@ module.exports = {
 
 
   fn: async function (inputs, exits) {
-    let url = sails.config.custom.data_api_url + 'brain_dataset/';
+    let url = sails.config.custom.data_api_url + 'brain_dataset/?page_size=1000';
 
     let clinical_diagnosis = [];
     let neuropathology_diagnosis = [];
     let tissue_type = [];
     let preservation_method = [];
 
-    // get request to retrieve mbtb data from api with user auth token
-    request.get(url, {
-        'headers': {
-          'Authorization': 'Token ' + this.req.session.auth_token,
-        }},
-      function optionalCallback(err, httpResponse, body) {
-        if (err) {
-          console.log({'error_msg': err}); // log error to server console
-        }
-        else {
-          var response = JSON.parse(body);
-
-          // To Do: rewrite below logic (storage year, select options unique values) in API, for now written to save API calls
-
-          // splitting storage_year and discarding time
-          for (var i=0; i < response.length; i++){
-            var time_date = response[i].storage_year.split("T");
-            response[i].storage_year = time_date[0];
+    let auth_token = this.req.session.auth_token;
+    let rows = [];
+
+    // get request to retrieve a page of mbtb data from api with user auth token, `next` is url of the following page
+    function get_page(page_url) {
+      request.get(page_url, {
+          'headers': {
+            'Authorization': 'Token ' + auth_token,
+          }},
+        function optionalCallback(err, httpResponse, body) {
+          if (err) {
+            console.log({'error_msg': err}); // log error to server console
           }
+          else {
+            var page = JSON.parse(body);
+            rows = rows.concat(page.results);
 
-          // Function: for finding unique values, for dro-down lists
-          function get_values(parameter_name) {
-            let local_array = [];
+            // brain_dataset is paged, read following pages before rendering the whole table
+            if (page.next) {
+              return get_page(page.next);
+            }
+            var response = rows;
+
+            // To Do: rewrite below logic (storage year, select options unique values) in API, for now written to save API calls
+
+            // splitting storage_year and discarding time
+            for (var i=0; i < response.length; i++){
+              var time_date = response[i].storage_year.split("T");
+              response[i].storage_year = time_date[0];
+            }
+
+            // Function: for finding unique values, for dro-down lists
+            function get_values(parameter_name) {
+              let local_array = [];
 
-            // for finding unique elemenets in array
-            let unique = (value, index, self) => {
-              return self.indexOf(value) === index
-            };
+              // for finding unique elemenets in array
+              let unique = (value, index, self) => {
+                return self.indexOf(value) === index
+              };
 
-            for (item=0; item < response.length; item++){
-              if (response[item][parameter_name] !== ''){
-                local_array.push(response[item][parameter_name]);
+              for (item=0; item < response.length; item++){
+                if (response[item][parameter_name] !== ''){
+                  local_array.push(response[item][parameter_name]);
+                }
               }
+
+              local_array = local_array.filter(unique);
+              return local_array;
             }
 
-            local_array = local_array.filter(unique);
-            return local_array;
+            // filtering unique items
+            clinical_diagnosis = get_values('clinical_diagnosis');
+            neuropathology_diagnosis = get_values('neuro_diagnosis_id');
+            tissue_type = get_values('tissue_type');
+            preservation_method = get_values('preservation_method');
+
+            // return retrieved data to template in form of dictionary with key: `data`
+            return exits.success({
+              data: response, clinical_diagnosis: clinical_diagnosis, neuropathology_diagnosis: neuropathology_diagnosis,
+              tissue_type: tissue_type, preservation_method: preservation_method
+            });
           }
+        });
+    }
 
-          // filtering unique items
-          clinical_diagnosis = get_values('clinical_diagnosis');
-          neuropathology_diagnosis = get_values('neuro_diagnosis_id');
-          tissue_type = get_values('tissue_type');
-          preservation_method = get_values('preservation_method');
-
-          // return retrieved data to template in form of dictionary with key: `data`
-          return exits.success({
-            data: response, clinical_diagnosis: clinical_diagnosis, neuropathology_diagnosis: neuropathology_diagnosis,
-            tissue_type: tissue_type, preservation_method: preservation_method
-          });
-        }
-      });
+    get_page(url);
   }
 
 };